@@ -0,0 +1,135 @@
+"""
+Admission control for endpoints that see bursts.
+
+A gate lets a fixed number of requests run at once and keeps a short queue
+behind them. When the queue is full, or a queued request has waited its
+allotted time, the request is refused at once with AdmissionRejected (a 429
+with Retry-After) rather than tying up a server thread and, further in, a
+database connection. Requests carrying a valid access token are let in
+ahead of those without one, so guests who are already signed in aren't
+stuck behind a crowd of first-time logins.
+
+Gates are configured per name in ADMISSION_GATES and live per process.
+"""
+
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+from flask_jwt_extended import decode_token
+
+import metrics
+from database import READ_ONLY_METHODS
+
+metrics.describe('admission_admitted_total', 'Requests let through an admission gate')
+metrics.describe('admission_rejections_total', 'Requests refused by an admission gate, by reason')
+metrics.describe('admission_in_flight', 'Requests running inside an admission gate', 'gauge')
+metrics.describe('admission_waiting', 'Requests queued at an admission gate', 'gauge')
+metrics.describe('admission_wait_seconds', 'Time spent queued at an admission gate', 'summary')
+
+
+class AdmissionRejected(Exception):
+    """An admission gate is saturated"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """At most `limit` holders, `queue` waiters per priority, `timeout` seconds of waiting"""
+
+    def __init__(self, name, limit, queue, timeout, retry_after=1, clock=time.monotonic):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.clock = clock
+        self.active = 0
+        self.waiting = {False: 0, True: 0}  # by priority
+        self._condition = threading.Condition()
+
+    def _can_enter(self, priority):
+        return self.active < self.limit and (priority or not self.waiting[True])
+
+    def _reject(self, reason):
+        metrics.inc('admission_rejections_total', gate=self.name, reason=reason)
+        raise AdmissionRejected(f'{self.name} is at capacity', self.retry_after)
+
+    def _publish(self):
+        metrics.set_gauge('admission_in_flight', self.active, gate=self.name)
+        metrics.set_gauge('admission_waiting', sum(self.waiting.values()), gate=self.name)
+
+    def acquire(self, priority=False):
+        started = self.clock()
+        with self._condition:
+            if not self._can_enter(priority):
+                if self.waiting[priority] >= self.queue:
+                    self._reject('queue_full')
+                self.waiting[priority] += 1
+                self._publish()
+                try:
+                    deadline = started + self.timeout
+                    while not self._can_enter(priority):
+                        remaining = deadline - self.clock()
+                        if remaining <= 0:
+                            self._reject('timeout')
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting[priority] -= 1
+                    # A priority waiter giving up may unblock ordinary ones
+                    self._condition.notify_all()
+            self.active += 1
+            self._publish()
+        metrics.inc('admission_admitted_total', gate=self.name, priority=str(priority).lower())
+        metrics.observe('admission_wait_seconds', self.clock() - started, gate=self.name)
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._publish()
+            self._condition.notify_all()
+
+
+def admission_gate(name, app=None):
+    """The process's gate for name, built from ADMISSION_GATES[name]"""
+    app = app or current_app
+    gates = app.extensions.setdefault('admission_gates', {})
+    if name not in gates:
+        # setdefault so two first requests can't end up with different gates
+        gates.setdefault(name, AdmissionGate(name, **app.config['ADMISSION_GATES'][name]))
+    return gates[name]
+
+
+def carries_valid_token():
+    """Whether the request has an unexpired access token signed by us"""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        token = header[len('Bearer '):]
+    else:
+        token = request.cookies.get(current_app.config['JWT_ACCESS_COOKIE_NAME'])
+    if not token:
+        return False
+    try:
+        return decode_token(token)['type'] == 'access'
+    except Exception:
+        return False
+
+
+def admission_controlled(name):
+    """Run the view inside the named gate (reads pass straight through)"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method in READ_ONLY_METHODS:
+                return view(*args, **kwargs)
+            gate = admission_gate(name)
+            gate.acquire(priority=carries_valid_token())
+            try:
+                return view(*args, **kwargs)
+            finally:
+                gate.release()
+        return wrapper
+    return decorator
@@ -1,66 +1,160 @@
+import importlib
 import os
 import logging
+import click
 from datetime import timedelta
-from flask import Flask, render_template, send_from_directory, redirect, jsonify, request
+from flask import Flask, Response, current_app, render_template, send_from_directory, redirect, jsonify, request
+from flask.cli import with_appcontext
 from flask_cors import CORS
-from flask_login import LoginManager, login_required, current_user
+from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity, jwt_required
+from flask_jwt_extended import JWTManager
 from config import Config
 from models import db, User
-from sqlalchemy import event
-from sqlalchemy.engine import Engine
-from sqlalchemy.exc import DisconnectionError, OperationalError
+from database import configure_engine, engine_options, remember_writes
+from resilience import DatabaseUnavailable, start_request_deadline
+from passwords import HasherBusy
+from admission import AdmissionRejected
+from tokens import JWT_SETTINGS
+from revocation import is_token_revoked
+import metrics
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__, 
-            static_folder='./static', 
-            template_folder='./templates')
-app.config.from_object(Config)
-
-# Configure JWT settings
-app.config['JWT_SECRET_KEY'] = app.config['SECRET_KEY']
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)  # Default expiration for hosts
-app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)  # For longer sessions
-app.config['JWT_TOKEN_LOCATION'] = ['headers', 'cookies']  # Look for token in both headers and cookies
-
-# Initialize extensions
-db.init_app(app)
-CORS(app)
-bcrypt = Bcrypt(app)
-jwt = JWTManager(app)
-login_manager = LoginManager(app)
+# Extensions are bound to an app in create_app
+bcrypt = Bcrypt()
+jwt = JWTManager()
+login_manager = LoginManager()
 login_manager.login_view = 'auth.host_login_page'
 
-# Add database connection pool ping for PostgreSQL
-@event.listens_for(Engine, "connect")
-def ping_connection(dbapi_connection, connection_record):
-    """Ping database connection to prevent disconnections"""
-    cursor = dbapi_connection.cursor()
-    try:
-        cursor.execute("SELECT 1")
-    except Exception:
-        # Optional - raise disconnection error
-        raise DisconnectionError("Database connection failed")
-    finally:
-        cursor.close()
-
-# Configure a connection handler for retrying failed queries
-def get_db_connection_with_retry(max_retries=3):
-    """Get database connection with retry logic"""
-    retries = 0
-    while retries < max_retries:
-        try:
-            return db.engine.connect()
-        except OperationalError as e:
-            retries += 1
-            logger.error(f"Database connection error (attempt {retries}/{max_retries}): {str(e)}")
-            if retries >= max_retries:
-                raise
-            # Add exponential backoff if needed
+# Blueprints registered only when their settings are present; their modules
+# (and dependencies) are not imported otherwise
+OPTIONAL_BLUEPRINTS = [
+    # (module, blueprint, url prefix, required config keys)
+    ('google_auth', 'google_auth', '/google_auth', ('GOOGLE_OAUTH_CLIENT_ID', 'GOOGLE_OAUTH_CLIENT_SECRET')),
+]
+
+def create_app(config=Config):
+    """Build and configure an application.
+
+    config is a config class/object or a dict of overrides on top of Config.
+    Creating the schema is left to init_schema (python init_db.py or
+    flask init-db) so building an app never touches the database.
+    """
+    app = Flask(__name__, 
+                static_folder='./static', 
+                template_folder='./templates')
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+        explicit_engine_options = 'SQLALCHEMY_ENGINE_OPTIONS' in config
+    else:
+        if config is not Config:
+            app.config.from_object(config)
+        explicit_engine_options = getattr(config, 'SQLALCHEMY_ENGINE_OPTIONS', None) is not Config.SQLALCHEMY_ENGINE_OPTIONS
+    # Config's engine options were worked out for DATABASE_URL; match them to the URI in use
+    if not explicit_engine_options:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    # Configure JWT settings
+    app.config['JWT_SECRET_KEY'] = app.config['SECRET_KEY']
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)  # Default expiration for hosts
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)  # For longer sessions
+    # Headers and cookies, compact claims, refresh cookie only sent to the refresh endpoint
+    app.config.update(JWT_SETTINGS)
+
+    # Initialize extensions
+    db.init_app(app)
+    CORS(app)
+    bcrypt.init_app(app)
+    jwt.init_app(app)
+    # Revoked tokens are checked against an in-memory list (see revocation.py)
+    jwt.token_in_blocklist_loader(is_token_revoked)
+    login_manager.init_app(app)
+
+    # SQLite pragmas and single-writer transactions; server databases rely on pool_pre_ping.
+    # Every engine retries failed connects with backoff behind a circuit breaker.
+    with app.app_context():
+        configure_engine(db.engine, app.config['SQLITE_SETTINGS'], app.config['DB_RESILIENCE'])
+
+    # Connection retries stop at the request's deadline
+    app.before_request(start_request_deadline)
+
+    # Pin clients that just wrote to the primary when read replicas are configured
+    app.after_request(remember_writes)
+    app.register_error_handler(DatabaseUnavailable, database_unavailable)
+    app.register_error_handler(HasherBusy, hasher_busy)
+    app.register_error_handler(AdmissionRejected, admission_rejected)
+
+    # Register blueprints
+    from routes import api
+    from auth import auth_blueprint
+
+    app.register_blueprint(api, url_prefix='/api')
+    app.register_blueprint(auth_blueprint, url_prefix='/auth')
+    register_optional_blueprints(app)
+
+    app.add_url_rule('/metrics', view_func=metrics_endpoint)
+    app.add_url_rule('/dashboard', view_func=dashboard)
+    app.add_url_rule('/test/auth', view_func=test_auth)
+    app.add_url_rule('/', defaults={'path': ''}, view_func=serve)
+    app.add_url_rule('/<path:path>', view_func=serve)
+
+    app.cli.add_command(init_db_command)
+    return app
+
+def register_optional_blueprints(app):
+    """Register the optional blueprints whose settings are configured"""
+    for module_name, blueprint_name, url_prefix, required in OPTIONAL_BLUEPRINTS:
+        missing = [key for key in required if not app.config.get(key)]
+        if missing:
+            logger.debug(f"Skipping {module_name}: {', '.join(missing)} not set")
+            continue
+        module = importlib.import_module(module_name)
+        app.register_blueprint(getattr(module, blueprint_name), url_prefix=url_prefix)
+
+def init_schema(app):
+    """Create missing tables and apply the in-place schema upgrades"""
+    from migrations import upgrade_schema
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the database tables"""
+    init_schema(current_app)
+    click.echo('Database tables are up to date.')
+
+def database_unavailable(e):
+    """Fail fast while the database is down instead of holding the request"""
+    logger.error(f"Database unavailable: {str(e)}")
+    db.session.rollback()
+    response = jsonify({'error': 'Database temporarily unavailable, please retry shortly'})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+def hasher_busy(e):
+    """Shed password work beyond the pool's backlog"""
+    response = jsonify({'error': 'Server busy, please retry shortly'})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+def admission_rejected(e):
+    """Turn away requests a saturated admission gate can't take"""
+    response = jsonify({'error': 'Too many people are signing in right now, please retry shortly'})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
+
+def metrics_endpoint():
+    """Prometheus metrics for this worker process"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -70,25 +164,11 @@ def load_user(user_id):
         logger.error(f"Error loading user: {str(e)}")
         return None
 
-# Register blueprints
-from routes import api
-from auth import auth_blueprint
-from google_auth import google_auth
-
-app.register_blueprint(api, url_prefix='/api')
-app.register_blueprint(auth_blueprint, url_prefix='/auth')
-app.register_blueprint(google_auth, url_prefix='/google_auth')
-
-# Create database tables
-with app.app_context():
-    db.create_all()
-
 # Route for dashboard is handled by the SPA
 # All frontend routes are handled by the catch-all route below
 
 # Removed non-SPA route for event creation since the React app handles it now
 
-@app.route('/dashboard')
 def dashboard():
     """Redirect dashboard requests to the SPA host dashboard route
     
@@ -98,18 +178,15 @@ def dashboard():
     # Just redirect to the SPA route and let the frontend handle auth state
     return redirect('/host/dashboard')
 
-@app.route('/test/auth')
 def test_auth():
     """Test authentication page for debugging purposes"""
     return render_template('test_auth.html')
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
 def serve(path):
     """Serve the React single-page application for all routes not handled by API endpoints"""
     # First check if the path corresponds to a static file
-    if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
+    if path != "" and os.path.exists(os.path.join(current_app.static_folder, path)):
+        return send_from_directory(current_app.static_folder, path)
 
     # Define SPA routes that should always return index.html
     spa_routes = [
@@ -157,5 +234,9 @@ def serve(path):
     # For any other unmatched route, assume it's a frontend route and serve index.html
     return render_template('index.html')
 
+# The application served by `python app.py` and imported by scripts and tests
+app = create_app()
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    init_schema(app)
+    app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,294 @@
+"""
+ASGI entry point for long-lived and I/O-bound endpoints.
+
+Two kinds of request run on the event loop:
+- Live update streams (GET /api/events/<id>/live, server-sent events).
+- The Google sign-in routes, whose outbound HTTP calls are awaited with
+  httpx.
+
+An idle stream costs a coroutine and a one-slot queue rather than a worker
+thread, and a single poller per watched event reads its version from the
+primary database. Everything else is the Flask app behind asgiref's
+WsgiToAsgi adapter, which runs each request in a thread as before.
+
+    uvicorn asgi:application --workers 2
+    python asgi.py                          # same, with WEB_CONCURRENCY workers on $PORT
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from urllib.parse import parse_qs
+
+import httpx
+import jwt
+from asgiref.wsgi import WsgiToAsgi
+
+import oidc
+from database import event_version
+
+logger = logging.getLogger(__name__)
+
+LIVE_PATH = re.compile(r'^/api/events/(\d+)/live$')
+GOOGLE_LOGIN_PATH = '/google_auth/google_login'
+GOOGLE_CALLBACK_PATH = '/google_auth/google_login/callback'
+
+OUTBOUND_TIMEOUT = httpx.Timeout(oidc.HTTP_TIMEOUT[1], connect=oidc.HTTP_TIMEOUT[0])
+
+
+class LiveUpdates:
+    """Fan-out of event version changes to subscribed streams.
+
+    Each subscriber gets a one-slot queue that always holds the newest
+    version, so a slow client skips intermediate versions instead of
+    buffering them.
+    """
+
+    def __init__(self, read_version, interval):
+        self.read_version = read_version  # Blocking callable(event_id) -> version
+        self.interval = interval
+        self._subscribers = {}
+        self._pollers = {}
+
+    def subscribe(self, event_id):
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(event_id, set()).add(queue)
+        if event_id not in self._pollers:
+            self._pollers[event_id] = asyncio.create_task(self._poll(event_id))
+        return queue
+
+    def unsubscribe(self, event_id, queue):
+        subscribers = self._subscribers.get(event_id, set())
+        subscribers.discard(queue)
+        if not subscribers:
+            self._subscribers.pop(event_id, None)
+            poller = self._pollers.pop(event_id, None)
+            if poller:
+                poller.cancel()
+
+    def subscriber_count(self):
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, event_id, version):
+        for queue in self._subscribers.get(event_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(version)
+
+    async def _poll(self, event_id):
+        version = None
+        while True:
+            try:
+                current = await asyncio.to_thread(self.read_version, event_id)
+            except Exception as e:
+                logger.error(f"Live update poll for event {event_id} failed: {str(e)}")
+            else:
+                if current != version:
+                    version = current
+                    self.publish(event_id, version)
+            await asyncio.sleep(self.interval)
+
+
+def sse_message(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+def request_urls(scope):
+    """(url, base_url) of a request, as Flask's request.url and request.base_url"""
+    headers = dict(scope['headers'])
+    host = headers.get(b'host', b'localhost').decode('latin-1')
+    base_url = f"{scope.get('scheme', 'http')}://{host}{scope.get('root_path', '')}{scope['path']}"
+    query = scope.get('query_string', b'').decode('latin-1')
+    return (f'{base_url}?{query}' if query else base_url), base_url
+
+
+async def send_response(send, status, body, headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, status, data):
+    await send_response(send, status, json.dumps(data).encode(), [('Content-Type', 'application/json')])
+
+
+class Application:
+    """ASGI application: async endpoints first, then the Flask app"""
+
+    def __init__(self, flask_app, http_client=None):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.http_client = http_client
+        self.live = LiveUpdates(self._read_version, flask_app.config['LIVE_POLL_SECONDS'])
+        self.heartbeat = flask_app.config['LIVE_HEARTBEAT_SECONDS']
+        self.google = 'google_auth' in flask_app.blueprints
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            match = LIVE_PATH.match(scope['path'])
+            if match:
+                return await self.live_stream(int(match.group(1)), receive, send)
+            if self.google and scope['path'] == GOOGLE_LOGIN_PATH:
+                return await self.google_login(scope, send)
+            if self.google and scope['path'] == GOOGLE_CALLBACK_PATH:
+                return await self.google_callback(scope, send)
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.http_client is not None:
+                    await self.http_client.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def client(self):
+        # Created on first use so it belongs to the running event loop
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(timeout=OUTBOUND_TIMEOUT)
+        return self.http_client
+
+    def _read_version(self, event_id):
+        with self.flask_app.app_context():
+            return event_version(self.flask_app.extensions['sqlalchemy'].engine, event_id)
+
+    async def live_stream(self, event_id, receive, send):
+        """Stream the event's version whenever it changes, with heartbeats while idle"""
+        version = await asyncio.to_thread(self._read_version, event_id)
+        if version is None:
+            return await send_json(send, 404, {'error': 'Event not found'})
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),  # Stop proxies from buffering the stream
+        ]})
+        await send({'type': 'http.response.body', 'body': sse_message('version', {'version': version}),
+                    'more_body': True})
+
+        queue = self.live.subscribe(event_id)
+        disconnected = asyncio.create_task(self._wait_for_disconnect(receive))
+        try:
+            while not disconnected.done():
+                update = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({update, disconnected}, timeout=self.heartbeat,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if update not in done:
+                    update.cancel()
+                    if not done:
+                        await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+                    continue
+                current = update.result()
+                if current != version:
+                    version = current
+                    await send({'type': 'http.response.body', 'body': sse_message('version', {'version': version}),
+                                'more_body': True})
+        except OSError:
+            pass  # The client went away mid-write
+        finally:
+            self.live.unsubscribe(event_id, queue)
+            disconnected.cancel()
+
+    async def _wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def fetch_json(self, url, refresh=False):
+        """A JSON document through the same freshness cache as the Flask routes"""
+        document = None if refresh else oidc.documents.get(url)
+        if document is None:
+            response = await self.client().get(url)
+            response.raise_for_status()
+            document = oidc.documents.put(url, response.json(), response.headers)
+        return document
+
+    async def _provider_config(self):
+        return await self.fetch_json(self.flask_app.config['GOOGLE_DISCOVERY_URL'])
+
+    async def _identity_from_token(self, token_json, google_provider_cfg):
+        """As google_auth.identity_from_token, fetching the keys without blocking"""
+        config = self.flask_app.config
+        id_token = token_json.get('id_token')
+        if not (config['GOOGLE_VERIFY_ID_TOKEN'] and id_token):
+            return None
+        jwks_uri = google_provider_cfg['jwks_uri']
+        issuers = oidc.issuers(google_provider_cfg)
+        try:
+            claims = oidc.verify_id_token(id_token, config['GOOGLE_OAUTH_CLIENT_ID'],
+                                          await self.fetch_json(jwks_uri), issuers)
+        except oidc.UnknownSigningKey:
+            claims = oidc.verify_id_token(id_token, config['GOOGLE_OAUTH_CLIENT_ID'],
+                                          await self.fetch_json(jwks_uri, refresh=True), issuers)
+        return oidc.profile_claims(claims)
+
+    async def google_login(self, scope, send):
+        from google_auth import authorization_url
+        from oauthlib.oauth2 import WebApplicationClient
+
+        _, base_url = request_urls(scope)
+        client = WebApplicationClient(self.flask_app.config['GOOGLE_OAUTH_CLIENT_ID'])
+        location = authorization_url(client, await self._provider_config(), base_url)
+        await send_response(send, 302, b'', [('Location', location)])
+
+    async def google_callback(self, scope, send):
+        """Make the Google calls here, then finish the sign-in in Flask"""
+        from google_auth import token_request, userinfo_request, complete_login
+        from oauthlib.oauth2 import WebApplicationClient
+
+        config = self.flask_app.config
+        url, base_url = request_urls(scope)
+        code = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('code', [None])[0]
+        client = WebApplicationClient(config['GOOGLE_OAUTH_CLIENT_ID'])
+        http = self.client()
+
+        google_provider_cfg = await self._provider_config()
+        token_url, headers, body = token_request(client, google_provider_cfg, url, base_url, code)
+        token_response = await http.post(token_url, headers=headers, content=body,
+                                         auth=(config['GOOGLE_OAUTH_CLIENT_ID'], config['GOOGLE_OAUTH_CLIENT_SECRET']))
+        token_json = token_response.json()
+
+        try:
+            userinfo = await self._identity_from_token(token_json, google_provider_cfg)
+        except jwt.InvalidTokenError as e:
+            logger.warning(f"Rejected Google ID token: {str(e)}")
+            return await send_response(send, 400, b'Could not verify the Google sign-in.')
+        if userinfo is None:
+            uri, headers, _ = userinfo_request(client, google_provider_cfg, token_json)
+            userinfo = (await http.get(uri, headers=headers)).json()
+
+        response = await asyncio.to_thread(self._run_in_flask, scope, complete_login, userinfo)
+        await send_response(send, response.status_code, response.get_data(), response.headers.items())
+
+    def _run_in_flask(self, scope, view, *args):
+        """Call a view inside a request context built from scope, with the app's hooks"""
+        app = self.flask_app
+        headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']]
+        with app.test_request_context(scope['path'], method=scope['method'], headers=headers,
+                                      query_string=scope.get('query_string', b'').decode('latin-1'),
+                                      base_url=f"{scope.get('scheme', 'http')}://{dict(headers).get('host', 'localhost')}"):
+            response = app.preprocess_request()
+            if response is None:
+                response = view(*args)
+            return app.process_response(app.make_response(response))
+
+
+def create_application(flask_app=None):
+    if flask_app is None:
+        from app import app as flask_app
+    return Application(flask_app)
+
+
+application = create_application()
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('asgi:application', host='0.0.0.0', port=int(os.environ.get('PORT', 5000)),
+                workers=int(os.environ.get('WEB_CONCURRENCY', 1)), lifespan='on')
@@ -1,15 +1,16 @@
 from flask import Blueprint, request, jsonify, session, current_app, render_template, redirect, url_for, flash, make_response
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import (
-    create_access_token, create_refresh_token, 
-    get_jwt_identity, jwt_required,
-    set_access_cookies, set_refresh_cookies,
-    unset_jwt_cookies
-)
-from models import db, User, Event
+from flask_jwt_extended import get_jwt, jwt_required, set_access_cookies, set_refresh_cookies, unset_jwt_cookies
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Event, add_event_guest, event_guest_query, identify_guest, email_key, name_key
+import metrics
+from admission import admission_controlled
+from passwords import HasherBusy, hash_password, verify_password, needs_rehash, check_login_rate, timed_login
+from tokens import issue_tokens, current_token_user
+from revocation import revoke_token, revoke_request_tokens
 import re
 import json
+import math
 from datetime import datetime, timedelta
 
 auth_blueprint = Blueprint('auth', __name__)
@@ -21,6 +22,17 @@ def validate_email(email):
     """Validate email format"""
     return EMAIL_REGEX.match(email)
 
+def find_user_by_email(email):
+    """The user with this email, ignoring case and surrounding spaces"""
+    return User.query.filter_by(email_key=email_key(email)).order_by(User.id).first()
+
+def find_guests_by_name(event_id, **names):
+    """Up to two of an event's guests whose given name fields match, ignoring case"""
+    query = event_guest_query(event_id)
+    for field, value in names.items():
+        query = query.filter(getattr(User, f'{field}_key') == name_key(value))
+    return query.order_by(User.id).limit(2).all()
+
 @auth_blueprint.route('/host_register', methods=['GET'])
 def host_register_page():
     """Render the host registration page"""
@@ -54,15 +66,14 @@ def host_register():
         existing_user = User.query.filter_by(email=email).first()
         if existing_user:
             return jsonify({'error': 'Email already exists'}), 400
+        # The lookup began a write transaction, holding SQLite's writer lock;
+        # end it so other writes don't wait on the hash below
+        db.session.rollback()
         
-        # Create new host user with specifically configured hash method
+        # Create new host user; PBKDF2-SHA256 hashed on the password pool
         new_user = User(
             email=email,
-            password_hash=generate_password_hash(
-                password,
-                method='pbkdf2:sha256',  # Use PBKDF2 with SHA256 for better security
-                salt_length=16           # Specify salt length
-            ),
+            password_hash=hash_password(password),
             first_name=first_name,
             last_name=last_name,
             is_host=True
@@ -90,6 +101,13 @@ def host_register():
             'message': 'Host registration successful'
         }), 201
     
+    except IntegrityError:
+        # Registered by a concurrent request while this one was hashing
+        db.session.rollback()
+        return jsonify({'error': 'Email already exists'}), 400
+    except HasherBusy:
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Registration error: {str(e)}")
@@ -100,7 +118,12 @@ def host_login_page():
     """Render the host login page"""
     return render_template('host_login.html')
 
+def reject_login(reason, message, code):
+    metrics.inc('login_rejections_total', reason=reason)
+    return jsonify({'error': message}), code
+
 @auth_blueprint.route('/host/login', methods=['POST'])
+@timed_login
 def host_login():
     # Enhanced error handling for request data parsing
     try:
@@ -120,32 +143,51 @@ def host_login():
     if not email or not password:
         return jsonify({'error': 'Email and password are required'}), 400
     
+    # Token buckets per client and per account, before any database or hashing work
+    limited = check_login_rate(request.remote_addr, email)
+    if limited:
+        reason, retry_after = limited
+        response, code = reject_login(reason, 'Too many login attempts, please try again later', 429)
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response, code
+    
     user = User.query.filter_by(email=email).first()
     
     if not user:
-        return jsonify({'error': 'Email not found'}), 401
+        return reject_login('unknown_email', 'Email not found', 401)
     
-    # Handle both old scrypt format and new pbkdf2 format
+    user_id, password_hash, is_host = user.id, user.password_hash, user.is_host
+    # The lookup began a write transaction, holding SQLite's writer lock;
+    # end it so other writes don't wait on the hashing below
+    db.session.rollback()
+    
+    # Any supported hash format (see hashing.py), checked on the password pool
     try:
-        # Check if it's using the old scrypt format
-        if user.password_hash.startswith('scrypt:'):
-            # For test user with scrypt, use a direct comparison with the known test password
-            # This is a temporary solution for compatibility
-            if user.email == 'test@example.com' and password == 'password':
-                # Authentication successful
-                pass
-            else:
-                return jsonify({'error': 'Invalid password'}), 401
-        else:
-            # Regular password check for pbkdf2 formatted passwords
-            if not check_password_hash(user.password_hash, password):
-                return jsonify({'error': 'Invalid password'}), 401
+        if not verify_password(password_hash, password):
+            return reject_login('bad_password', 'Invalid password', 401)
+    except HasherBusy:
+        raise
     except Exception as e:
         print(f"Password hash check error: {str(e)}")
         return jsonify({'error': f'Password check error: {str(e)}'}), 500
     
-    if not user.is_host:
-        return jsonify({'error': 'This account is not registered as a host'}), 403
+    if not is_host:
+        return reject_login('not_host', 'This account is not registered as a host', 403)
+    
+    # Upgrade hashes in an older format or below the current work factor
+    new_hash = None
+    if needs_rehash(password_hash):
+        try:
+            new_hash = hash_password(password)
+        except HasherBusy:
+            # The old hash still works; upgrade at a quieter login
+            pass
+    
+    # Reload and store the upgrade in a short transaction of its own
+    user = db.session.get(User, user_id)
+    if new_hash is not None and user.password_hash == password_hash:
+        user.password_hash = new_hash
+        db.session.commit()
     
     # Login the user using Flask-Login (for backward compatibility)
     login_user(user)
@@ -157,14 +199,8 @@ def host_login():
     # Fetch hosted events count for dashboard redirection
     hosted_events_count = Event.query.filter_by(host_id=user.id).count()
     
-    # Create identity for JWT tokens - using string ID for compatibility
-    # Note: Flask-JWT-Extended requires identity to be a JSON serializable type
-    # We're using the user ID as a string to ensure compatibility
-    identity = str(user.id)
-    
-    # Create JWT tokens with appropriate expiration
-    access_token = create_access_token(identity=identity, expires_delta=timedelta(days=7))
-    refresh_token = create_refresh_token(identity=identity, expires_delta=timedelta(days=30))
+    # Create JWT tokens (7-day access for hosts)
+    access_token, refresh_token = issue_tokens(user)
     
     # Prepare user data for response
     user_data = {
@@ -200,6 +236,7 @@ def guest_login_page():
     return render_template('index.html')
 
 @auth_blueprint.route('/guest/login', methods=['POST', 'GET'])
+@admission_controlled('guest_login')
 def guest_login():
     # Handle GET requests (direct page access)
     if request.method == 'GET':
@@ -223,7 +260,7 @@ def guest_login():
             return jsonify({'error': 'Invalid email format'}), 400
         
         # Check if user exists
-        user = User.query.filter_by(email=email).first()
+        user = find_user_by_email(email)
         
         if not user:
             # Store email in session and return status asking for more info
@@ -245,22 +282,7 @@ def guest_login():
             }), 200
         
         # Create tokens with 30-day expiration for guests (longer than hosts)
-        access_token = create_access_token(
-            identity=str(user.id),  # Convert to string to satisfy JWT requirements
-            additional_claims={
-                'is_host': user.is_host,
-                'email': user.email
-            },
-            expires_delta=timedelta(days=30)
-        )
-        refresh_token = create_refresh_token(
-            identity=str(user.id),  # Convert to string to satisfy JWT requirements
-            additional_claims={
-                'is_host': user.is_host,
-                'email': user.email
-            },
-            expires_delta=timedelta(days=60)
-        )
+        access_token, refresh_token = issue_tokens(user)
         
         # Return user's events
         user_events = []
@@ -337,45 +359,19 @@ def guest_login():
                 'message': 'Please provide your contact information'
             }), 200
         
-        # Look for existing user with provided credentials
-        user = None
-        
-        # First check by email if provided
-        if email:
-            user = User.query.filter_by(email=email).first()
+        # Look for an existing user by email, then phone, then nickname or full
+        # name among this event's guests, in one indexed query
+        user, ambiguous = identify_guest(event.id, email=email, phone=phone, nickname=nickname,
+                                         first_name=first_name, last_name=last_name)
         
-        # Then check by phone if provided and still no user found
-        if not user and phone:
-            user = User.query.filter_by(phone=phone).first()
-            
-        # Check by nickname if provided (for name-only flow)
-        if not user and nickname:
-            # Check if there's a unique match by nickname in this event
-            matching_guests = []
-            for guest in event.guests:
-                if guest.nickname and guest.nickname.lower() == nickname.lower():
-                    matching_guests.append(guest)
-            
-            # If exactly one match, use that user
-            if len(matching_guests) == 1:
-                user = matching_guests[0]
-            # If multiple matches, return status to get more info
-            elif len(matching_guests) > 1:
-                return jsonify({
-                    'status': 'need_user_info',
-                    'event_id': event.id,
-                    'event_title': event.title,
-                    'message': 'Multiple users with this name found. Please provide more information.'
-                }), 200
-        
-        # Finally check by name match in this specific event if both first and last name provided
-        if not user and first_name and last_name:
-            for guest in event.guests:
-                if guest.first_name and guest.last_name and \
-                   guest.first_name.lower() == first_name.lower() and \
-                   guest.last_name.lower() == last_name.lower():
-                    user = guest
-                    break
+        # A nickname several guests share needs more information
+        if ambiguous:
+            return jsonify({
+                'status': 'need_user_info',
+                'event_id': event.id,
+                'event_title': event.title,
+                'message': 'Multiple users with this name found. Please provide more information.'
+            }), 200
         
         # If still no user, create a new one
         if not user:
@@ -400,8 +396,8 @@ def guest_login():
                 user.nickname = nickname
         
         # Add user to event guests if not already
-        if user not in event.guests:
-            event.guests.append(user)
+        db.session.flush()
+        add_event_guest(event.id, user.id)
         
         db.session.commit()
         
@@ -426,22 +422,7 @@ def guest_login():
             }), 200
         
         # Create tokens with 30-day expiration for guests (longer than hosts)
-        access_token = create_access_token(
-            identity=str(user.id),  # Convert to string to satisfy JWT requirements
-            additional_claims={
-                'is_host': user.is_host,
-                'email': user.email
-            },
-            expires_delta=timedelta(days=30)
-        )
-        refresh_token = create_refresh_token(
-            identity=str(user.id),  # Convert to string to satisfy JWT requirements
-            additional_claims={
-                'is_host': user.is_host,
-                'email': user.email
-            },
-            expires_delta=timedelta(days=60)
-        )
+        access_token, refresh_token = issue_tokens(user)
         
         print(f"User {user.id} successfully joined event {event.id} via event code")
         
@@ -524,15 +505,11 @@ def guest_select_event():
         
         # First check by nickname (if provided)
         if nickname:
-            for guest in event.guests:
-                if guest.nickname and guest.nickname.lower() == nickname.lower():
-                    matching_guests.append(guest)
+            matching_guests = find_guests_by_name(event.id, nickname=nickname)
         
         # If no matches by nickname and first name was provided instead
         if not matching_guests and first_name:
-            for guest in event.guests:
-                if guest.first_name and guest.first_name.lower() == first_name.lower():
-                    matching_guests.append(guest)
+            matching_guests = find_guests_by_name(event.id, first_name=first_name)
         
         # If exactly one match, log them in
         if len(matching_guests) == 1:
@@ -543,23 +520,7 @@ def guest_select_event():
             login_user(user)
             
             # Create JWT tokens
-            access_token = create_access_token(
-                identity=user.id,
-                additional_claims={
-                    'is_host': user.is_host,
-                    'email': user.email
-                },
-                expires_delta=timedelta(days=60)
-            )
-            
-            refresh_token = create_refresh_token(
-                identity=user.id,
-                additional_claims={
-                    'is_host': user.is_host,
-                    'email': user.email
-                },
-                expires_delta=timedelta(days=60)
-            )
+            access_token, refresh_token = issue_tokens(user)
             
             print(f"User {user.id} selected event {event.id}")
             
@@ -608,25 +569,8 @@ def guest_select_event():
             'message': 'Please provide your contact information'
         }), 200
     
-    # Look for existing user with provided credentials
-    user = None
-    
-    # First check by email if provided
-    if email:
-        user = User.query.filter_by(email=email).first()
-    
-    # Then check by phone if provided and still no user found
-    if not user and phone:
-        user = User.query.filter_by(phone=phone).first()
-    
-    # Finally check by name match in this specific event if both first and last name provided
-    if not user and first_name and last_name:
-        for guest in event.guests:
-            if guest.first_name and guest.last_name and \
-               guest.first_name.lower() == first_name.lower() and \
-               guest.last_name.lower() == last_name.lower():
-                user = guest
-                break
+    # Look for existing user by email, then phone, then full name among this event's guests
+    user, _ = identify_guest(event.id, email=email, phone=phone, first_name=first_name, last_name=last_name)
     
     # If still no user, create a new one
     if not user:
@@ -654,8 +598,8 @@ def guest_select_event():
             user.payment_method = payment_method
     
     # Add user to event guests if not already
-    if user not in event.guests:
-        event.guests.append(user)
+    db.session.flush()
+    add_event_guest(event.id, user.id)
     
     db.session.commit()
     
@@ -671,22 +615,7 @@ def guest_select_event():
     current_app.permanent_session_lifetime = timedelta(days=30)
     
     # Create tokens with 30-day expiration for guests (longer than hosts)
-    access_token = create_access_token(
-        identity=str(user.id),  # Convert to string to satisfy JWT requirements
-        additional_claims={
-            'is_host': user.is_host,
-            'email': user.email
-        },
-        expires_delta=timedelta(days=30)
-    )
-    refresh_token = create_refresh_token(
-        identity=str(user.id),  # Convert to string to satisfy JWT requirements
-        additional_claims={
-            'is_host': user.is_host,
-            'email': user.email
-        },
-        expires_delta=timedelta(days=60)
-    )
+    access_token, refresh_token = issue_tokens(user)
     
     print(f"User {user.id} selected event {event.id}")
     
@@ -712,10 +641,10 @@ def guest_select_event():
     return response
 
 @auth_blueprint.route('/logout', methods=['GET', 'POST'])
-@login_required
 def logout():
-    """Log out the current user"""
+    """Log out the current user and revoke their tokens"""
     logout_user()
+    revoke_request_tokens()
     
     # Check if the request is AJAX/API or browser-based
     if request.is_json or request.method == 'POST':
@@ -765,21 +694,33 @@ def update_profile():
 @auth_blueprint.route('/token/refresh', methods=['POST'])
 @jwt_required(refresh=True)
 def refresh_token():
-    """Refresh an expired access token"""
-    # Get the identity from the refresh token
-    current_user_identity = get_jwt_identity()
+    """Exchange a refresh token for a new access and refresh token"""
+    # Get the user from the refresh token
+    user = current_token_user()
+    if not user:
+        return jsonify({'error': 'User not found'}), 401
     
-    # Create a new access token
-    access_token = create_access_token(identity=str(current_user_identity))
+    # Rotate: the presented refresh token is revoked, so a copy can't be replayed
+    try:
+        if not revoke_token(get_jwt(), 'rotated'):
+            return jsonify({'error': 'Token has been revoked'}), 401
+        access_token, refresh_token = issue_tokens(user)
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request rotated the same token first
+        db.session.rollback()
+        return jsonify({'error': 'Token has been revoked'}), 401
     
-    # Create response with the new token
+    # Create response with the new tokens
     response = jsonify({
         'access_token': access_token,
+        'refresh_token': refresh_token,
         'message': 'Token refreshed successfully'
     })
     
-    # Set the new access token in cookies
+    # Set the new tokens in cookies
     set_access_cookies(response, access_token)
+    set_refresh_cookies(response, refresh_token)
     
     return response
 
@@ -789,68 +730,12 @@ def refresh_token():
 def verify_token():
     """Verify if the current token is valid"""
     try:
-        current_user_identity = get_jwt_identity()
-        
-        print(f"DEBUG: verify_token - Identity type and value: {type(current_user_identity).__name__}, {current_user_identity}")
-        
-        # Handle different formats of identity
-        if isinstance(current_user_identity, str):
-            # String identities need to be converted to int if possible
-            try:
-                user_id = int(current_user_identity)
-            except ValueError:
-                # If it's not a valid int string, use as is
-                user_id = current_user_identity
-        # Legacy support for dict format
-        elif isinstance(current_user_identity, dict):
-            # Get user_id from dict, might be int or string
-            user_id = current_user_identity.get('id')
-            print(f"DEBUG: ID from dict: {user_id}, type: {type(user_id).__name__}")
-            if isinstance(user_id, str):
-                # Convert string to int if possible
-                try:
-                    user_id = int(user_id)
-                except ValueError:
-                    # Keep as string if not convertible
-                    pass
-        else:
-            # Assume it's already an int or other format
-            user_id = current_user_identity
-            
-        if not user_id:
-            print("DEBUG: No user_id found in JWT")
-            return jsonify({
-                'valid': False,
-                'error': 'Invalid token format'
-            }), 200  # Still return 200 for token validation checks
-            
-        print(f"DEBUG: verify_token - Final user_id: {user_id}, type: {type(user_id).__name__}")
-        
-        # Query with explicit integer conversion for safety
-        try:
-            user_id_int = int(user_id)
-            user = User.query.get(user_id_int)
-            if user:
-                print(f"DEBUG: User found via direct lookup: {user.id}")
-        except (ValueError, TypeError):
-            # If int conversion fails, try string lookup
-            print(f"DEBUG: Int conversion failed, trying string comparison")
-            user = None
-            
-        # Fallback to filter if direct lookup failed
+        user = current_token_user()
         if not user:
-            user = User.query.filter(User.id == user_id).first()
-            if user:
-                print(f"DEBUG: User found via filter: {user.id}")
-            
-        if not user:
-            print(f"DEBUG: User not found for id: {user_id}")
             return jsonify({
                 'valid': False,
                 'error': 'User not found'
             }), 200  # Still return 200 for token validation checks
-            
-        print(f"DEBUG: verify_token - User found: {user.id}, is_host: {user.is_host}")
         
         return jsonify({
             'valid': True,
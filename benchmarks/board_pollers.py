@@ -0,0 +1,124 @@
+"""
+Live-shower polling: many phones reading the board while slots are claimed.
+
+The app runs in-process on a seeded SQLite file (or --database-url). For
+each poller count, that many client threads GET the availability board in
+a loop for --seconds while a writer claims a new date every --claim-every
+seconds, so the board's version keeps changing under the pollers. Every
+SQL statement the app runs is counted. Reported per run: board reads per
+second, statements per second, statements per read and board builds per
+version.
+
+Each count is run twice. "shared" pollers all ask for the same board, as
+phones at one shower do, and coalesce onto one build per version. For
+comparison, "distinct" pollers each pass their own mean_offset, so no two
+of them can share a build: that is what every poller missing at once cost
+before.
+
+    python benchmarks/board_pollers.py --pollers 4 16 64 --seconds 5
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.server_throughput import seed  # noqa: E402
+
+# Claims continue across runs, so each one takes a date nobody has
+claim_numbers = itertools.count()
+
+
+def run(app, event_id, pollers, seconds, claim_every, distinct):
+    from sqlalchemy import event as sa_event
+    import metrics
+    from models import db, User, Event, DateGuess
+
+    statements = itertools.count()
+    listener = lambda *args: next(statements)
+    with app.app_context():
+        sa_event.listen(db.engine, 'before_cursor_execute', listener)
+        due_date = db.session.get(Event, event_id).due_date
+        guest_ids = [user.id for user in User.query.filter_by(is_host=False)]
+        first_version = db.session.get(Event, event_id).version
+    metrics.reset()
+    stop = threading.Event()
+    reads = [0] * pollers
+
+    def poller(index):
+        client = app.test_client()
+        path = f'/api/events/{event_id}/availability'
+        if distinct:
+            path += f'?mean_offset={index / 100}'
+        while not stop.is_set():
+            client.get(path)
+            reads[index] += 1
+
+    def writer():
+        while True:
+            if stop.wait(claim_every):
+                return
+            number = next(claim_numbers)
+            with app.app_context():
+                # Far enough out that no seeded guess has the date
+                db.session.add(DateGuess(user_id=guest_ids[number % len(guest_ids)], event_id=event_id,
+                                         guess_date=due_date + timedelta(days=100 + number)))
+                db.session.commit()
+
+    threads = [threading.Thread(target=poller, args=(index,)) for index in range(pollers)]
+    threads.append(threading.Thread(target=writer))
+    began = time.perf_counter()
+    statements_before = next(statements)
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    executed = next(statements) - statements_before - 1
+
+    with app.app_context():
+        sa_event.remove(db.engine, 'before_cursor_execute', listener)
+        versions = db.session.get(Event, event_id).version - first_version + 1
+    builds = metrics.value('board_requests_total', board='availability', outcome='built')
+    total_reads = sum(reads)
+    return total_reads / elapsed, executed / elapsed, executed / max(total_reads, 1), builds / versions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pollers', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--claim-every', type=float, default=0.25)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.database_url or f"sqlite:///{os.path.join(directory, 'pollers.db')}"
+        event_id = int(seed(url)[0].rsplit('/', 1)[1])
+        app = create_app({'SQLALCHEMY_DATABASE_URI': url})
+
+        print(f"{'pollers':>8} {'mode':>9} {'reads/s':>9} {'stmts/s':>9} {'stmts/read':>11} {'builds/version':>15}")
+        for pollers in args.pollers:
+            for distinct in (False, True):
+                reads, executed, per_read, per_version = run(app, event_id, pollers, args.seconds,
+                                                             args.claim_every, distinct)
+                mode = 'distinct' if distinct else 'shared'
+                print(f'{pollers:>8} {mode:>9} {reads:>9.0f} {executed:>9.0f} {per_read:>11.2f} {per_version:>15.1f}')
+        with app.app_context():
+            from models import db
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
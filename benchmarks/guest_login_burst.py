@@ -0,0 +1,132 @@
+"""
+A join burst on guest login: every guest enters the event code at once.
+
+serve.py is started on a seeded SQLite file (or --database-url) and
+--guests client threads all POST /auth/guest/login with the event code
+at the same moment. A 429 is retried after its Retry-After (with jitter),
+as the frontend does. Reported per run: how long until every guest was
+signed in, latency percentiles, how many 429s and errors were seen, and the
+most pooled database connections any worker had checked out (from
+/metrics; with one worker that is the whole server).
+
+The second run opens the gate wide to show the same burst without
+admission control.
+
+    python benchmarks/guest_login_burst.py --guests 300 --threads 64
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.server_throughput import seed, wait_until_up  # noqa: E402
+
+MAX_ATTEMPTS = 50
+
+
+def post(port, path, body, timeout=60):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        connection.request('POST', path, json.dumps(body), {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        return response.status, response.getheader('Retry-After')
+    finally:
+        connection.close()
+
+
+def burst(port, guests):
+    start = threading.Barrier(guests)
+    results = [None] * guests
+
+    def guest(index):
+        body = {'login_type': 'event_code', 'event_code': '4242',
+                'first_name': f'Burst{index}', 'last_name': 'Guest'}
+        rejected = 0
+        start.wait()
+        began = time.perf_counter()
+        for _ in range(MAX_ATTEMPTS):
+            try:
+                status, retry_after = post(port, '/auth/guest/login', body)
+            except (OSError, http.client.HTTPException):
+                status, retry_after = 'error', None
+            if status != 429:
+                break
+            rejected += 1
+            time.sleep(float(retry_after or 1) * random.uniform(0.5, 1.5))
+        results[index] = (status, time.perf_counter() - began, rejected)
+
+    threads = [threading.Thread(target=guest, args=(index,)) for index in range(guests)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - began
+
+
+def pool_peak(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request('GET', '/metrics')
+        text = connection.getresponse().read().decode()
+    finally:
+        connection.close()
+    peaks = [float(value) for value in re.findall(r'^db_pool_checked_out_peak\{.*\} (\S+)$', text, re.M)]
+    return max(peaks, default=0)
+
+
+def run(label, env, port, guests):
+    process = subprocess.Popen([sys.executable, 'serve.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(port, process)
+        results, elapsed = burst(port, guests)
+        peak = pool_peak(port)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    latencies = sorted(latency for status, latency, rejected in results)
+    signed_in = sum(1 for status, latency, rejected in results if status == 200)
+    errors = sum(1 for status, latency, rejected in results if status != 200)
+    rejections = sum(rejected for status, latency, rejected in results)
+    print(f'{label:<16} {signed_in}/{guests} signed in in {elapsed:5.1f} s   '
+          f'p50 {latencies[len(latencies) // 2]:5.2f} s   p99 {latencies[int(len(latencies) * 0.99) - 1]:5.2f} s   '
+          f'{rejections} 429s   {errors} errors   pool peak {peak:.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Guest login join burst, with and without the admission gate')
+    parser.add_argument('--guests', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--database-url', help='Use this database instead of a seeded SQLite file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.database_url
+        if not url:
+            url = f"sqlite:///{os.path.join(directory, 'burst.db')}"
+            seed(url)
+        env = dict(os.environ, DATABASE_URL=url, WEB_CONCURRENCY=str(args.workers),
+                   WEB_THREADS=str(args.threads), PORT=str(args.port), WEB_TIMEOUT='120')
+        run('gated', env, args.port, args.guests)
+        run('gate wide open', dict(env, GUEST_LOGIN_CONCURRENCY=str(args.guests), GUEST_LOGIN_QUEUE=str(args.guests)),
+            args.port, args.guests)
+
+
+if __name__ == '__main__':
+    main()
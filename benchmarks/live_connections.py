@@ -0,0 +1,83 @@
+"""
+Memory cost of idle live update streams under the ASGI server.
+
+Starts `uvicorn asgi:application` on a seeded SQLite file, opens --clients
+idle streams on one event (each a raw socket that has read the first
+message), and reports the server's resident memory before and after,
+together with the growth per connection.
+
+    python benchmarks/live_connections.py --clients 2000
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.server_throughput import seed, wait_until_up  # noqa: E402
+
+
+def rss_kib(pid):
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def open_stream(port, path):
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.sendall(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n'.encode())
+    received = b''
+    while b'event: version' not in received:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise RuntimeError('stream closed')
+        received += chunk
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure memory per idle live stream')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--port', type=int, default=5098)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        event_path = seed(url)[0]
+        env = dict(os.environ, DATABASE_URL=url, LIVE_HEARTBEAT_SECONDS='30')
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', str(args.port),
+                   '--log-level', 'warning', '--backlog', str(max(2048, args.clients))]
+        process = subprocess.Popen(command, cwd=ROOT, env=env)
+        sockets = []
+        try:
+            wait_until_up(args.port, process)
+            open_stream(args.port, f'{event_path}/live').close()  # Load the code paths once
+            time.sleep(0.5)
+            before = rss_kib(process.pid)
+            started = time.perf_counter()
+            for _ in range(args.clients):
+                sockets.append(open_stream(args.port, f'{event_path}/live'))
+            elapsed = time.perf_counter() - started
+            time.sleep(1)
+            after = rss_kib(process.pid)
+        finally:
+            for sock in sockets:
+                sock.close()
+            process.terminate()
+            process.wait(timeout=30)
+
+    print(f'{args.clients} idle streams opened in {elapsed:.1f} s')
+    print(f'server RSS {before / 1024:.1f} MiB -> {after / 1024:.1f} MiB, '
+          f'{(after - before) / args.clients:.1f} KiB per stream')
+
+
+if __name__ == '__main__':
+    main()
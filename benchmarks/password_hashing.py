@@ -0,0 +1,75 @@
+"""
+Password hashing throughput, for sizing workers and PASSWORD_HASH_WORKERS.
+
+Calibrates the policy for --target seconds per verification (as the app
+does at startup), then measures verifications per second on 1 thread and
+on one thread per core. The hash functions release the GIL, so the
+per-core figure is what one process can do with PASSWORD_HASH_WORKERS set
+to the core count. The legacy formats still accepted at login are timed
+too.
+
+    python benchmarks/password_hashing.py --target 0.25 --seconds 5
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bcrypt  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from hashing import HashingPolicy, MIN_ITERATIONS, calibrate  # noqa: E402
+
+
+def verifications_per_second(policy, stored, threads, seconds):
+    counts = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def verify(index):
+        while time.perf_counter() < stop:
+            policy.verify(stored, 'correct horse battery staple')
+            counts[index] += 1
+
+    workers = [threading.Thread(target=verify, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Password hashing throughput per core')
+    parser.add_argument('--target', type=float, default=0.25, help='Seconds per verification to calibrate for')
+    parser.add_argument('--minimum', type=int, default=MIN_ITERATIONS)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    started = time.perf_counter()
+    iterations = calibrate(args.target, args.minimum)
+    print(f'calibrated to {iterations} PBKDF2-SHA256 iterations in {time.perf_counter() - started:.2f} s '
+          f'({cores} cores)')
+
+    policy = HashingPolicy(iterations)
+    password = 'correct horse battery staple'
+    formats = [
+        ('current policy', policy.hash(password)),
+        ('werkzeug scrypt', generate_password_hash(password, 'scrypt')),
+        ('bcrypt, 12 rounds', bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=12)).decode()),
+    ]
+    for label, stored in formats:
+        single = verifications_per_second(policy, stored, 1, args.seconds)
+        parallel = verifications_per_second(policy, stored, cores, args.seconds)
+        print(f'{label:<18} {1000 / single:7.1f} ms each   1 thread {single:7.1f}/s   '
+              f'{cores} threads {parallel:7.1f}/s   {parallel / cores:7.1f}/s per core')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Cold start and steady-state throughput: serve.py against the dev server.
+
+Each server is started against the same seeded SQLite file. Cold start is
+the time from launching the process to the first successful response, and
+the first-request time is the latency of the first API call after that.
+Steady state is requests per second from --clients client threads cycling
+through the public read endpoints for --seconds.
+
+    python benchmarks/server_throughput.py --clients 8 --seconds 10 --workers 2 --threads 4
+"""
+
+import argparse
+import http.client
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEV_SERVER = "from app import app; app.run(host='127.0.0.1', port={port}, debug=True)"
+
+
+def seed(url):
+    """An event with a few dozen guests and guesses"""
+    from app import create_app, init_schema
+    from models import db, User, Event, DateGuess, event_guests
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': url})
+    init_schema(app)
+    with app.app_context():
+        host = User(email='bench-host@example.com', is_host=True)
+        db.session.add(host)
+        db.session.flush()
+        event = Event(event_code='4242', title='Benchmark Shower', host_id=host.id, mother_name='Jane Bench',
+                      event_date=date(2026, 1, 1), due_date=date(2026, 2, 1))
+        db.session.add(event)
+        db.session.flush()
+        for number in range(40):
+            guest = User(email=f'bench-guest{number}@example.com', first_name=f'Guest{number}')
+            db.session.add(guest)
+            db.session.flush()
+            db.session.execute(event_guests.insert().values(user_id=guest.id, event_id=event.id))
+            db.session.add(DateGuess(user_id=guest.id, event_id=event.id, guess_date=date(2026, 1, 10 + number % 20)))
+        db.session.commit()
+        event_id = event.id
+        db.engine.dispose()
+    return [f'/api/events/{event_id}', '/api/events/code/4242', '/api/events/find-by-mother?name=Jane', '/']
+
+
+def get(port, path, timeout=5):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def wait_until_up(port, process, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited during startup')
+        try:
+            if get(port, '/', timeout=1) == 200:
+                return
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError('server did not start')
+
+
+def steady_state(port, paths, clients, seconds):
+    counts = [0] * clients
+    errors = [0] * clients
+    stop = time.perf_counter() + seconds
+
+    def client(index):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        for path in itertools.cycle(paths):
+            if time.perf_counter() >= stop:
+                break
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                counts[index] += 1
+                if response.will_close:
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            except (OSError, http.client.HTTPException):
+                errors[index] += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds, sum(errors)
+
+
+def run(label, command, env, port, paths, args):
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(port, process)
+        cold_start = time.perf_counter() - started
+        first = time.perf_counter()
+        get(port, paths[0])
+        first_request = time.perf_counter() - first
+        throughput, errors = steady_state(port, paths, args.clients, args.seconds)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    print(f'{label:<12} cold start {cold_start * 1000:7.0f} ms   first request {first_request * 1000:6.1f} ms   '
+          f'{throughput:8.0f} req/s   {errors} errors')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare serve.py with the dev server')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        paths = seed(url)
+        env = dict(os.environ, DATABASE_URL=url, WEB_CONCURRENCY=str(args.workers),
+                   WEB_THREADS=str(args.threads), PORT=str(args.port))
+        run('dev server', [sys.executable, '-c', DEV_SERVER.format(port=args.port)], env, args.port, paths, args)
+        run('serve.py', [sys.executable, 'serve.py'], env, args.port, paths, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Concurrent guess submission against a SQLite file.
+
+Compares the previous engine setup (server-style pool, pre-ping plus an
+extra SELECT 1 per connection, rollback journal, deferred transactions)
+with database.py's tuning (WAL, pragmas, BEGIN IMMEDIATE behind a writer
+lock). Writers run the same check-then-insert transaction as the guess
+routes; readers count the board. Every writer and reader is its own
+process, like separate server workers, so the GIL does not hide the
+database's behaviour.
+
+    python benchmarks/sqlite_concurrency.py --writers 4 --readers 4 --seconds 5
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from database import configure_engine, engine_options, writing
+from models import db, MinuteGuess
+
+
+def legacy_engine(url):
+    engine = create_engine(url, pool_size=10, max_overflow=20, pool_recycle=1800, pool_pre_ping=True,
+                           connect_args={'check_same_thread': False})
+
+    @event.listens_for(engine, 'connect')
+    def ping(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+
+    return engine
+
+
+def tuned_engine(url):
+    return configure_engine(create_engine(url, **engine_options(url)))
+
+
+ENGINES = {'legacy': legacy_engine, 'tuned': tuned_engine}
+
+
+def write_once(session, user_id):
+    taken = session.scalar(select(func.count(MinuteGuess.id)).where(
+        MinuteGuess.event_id == 1, MinuteGuess.user_id == user_id))
+    if not taken:
+        session.add(MinuteGuess(user_id=user_id, event_id=1, minute=user_id % 60))
+    session.commit()
+
+
+def read_once(session):
+    session.execute(select(MinuteGuess.minute, func.count(MinuteGuess.id))
+                    .where(MinuteGuess.event_id == 1).group_by(MinuteGuess.minute)).all()
+
+
+def worker(engine_name, url, role, worker_id, deadline, results):
+    engine = ENGINES[engine_name](url)
+    done = errors = 0
+    user_id = worker_id * 10 ** 7
+    while time.time() < deadline:
+        try:
+            if role == 'write':
+                user_id += 1
+                with writing(), Session(engine) as session:
+                    write_once(session, user_id)
+            else:
+                with Session(engine) as session:
+                    read_once(session)
+            done += 1
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    results.put((role, done, errors))
+
+
+def run(engine_name, url, writers, readers, seconds):
+    engine = ENGINES[engine_name](url)
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    results = multiprocessing.Queue()
+    deadline = time.time() + seconds
+    roles = ['write'] * writers + ['read'] * readers
+    processes = [
+        multiprocessing.Process(target=worker, args=(engine_name, url, role, worker_id, deadline, results))
+        for worker_id, role in enumerate(roles, start=1)
+    ]
+    for process in processes:
+        process.start()
+    totals = {'write': 0, 'read': 0, 'errors': 0}
+    for _ in processes:
+        role, done, errors = results.get()
+        totals[role] += done
+        totals['errors'] += errors
+    for process in processes:
+        process.join()
+    return totals['write'] / seconds, totals['read'] / seconds, totals['errors']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite concurrent write/read benchmark')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--dir', help='Directory for the database files (default: system temp dir)')
+    args = parser.parse_args()
+
+    for name in ENGINES:
+        with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+            url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+            writes, reads, errors = run(name, url, args.writers, args.readers, args.seconds)
+        print(f"{name:>6}: {writes:8.0f} writes/s {reads:8.0f} reads/s {errors:6d} errors")
+
+
+if __name__ == '__main__':
+    main()
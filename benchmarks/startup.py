@@ -0,0 +1,56 @@
+"""
+Startup cost of the application.
+
+Times, in fresh interpreters, importing the app module, building an app
+with create_app() and collecting the test suite, plus the in-process cost
+of each further create_app() call. Each subprocess timing is the median of
+--runs runs.
+
+    python benchmarks/startup.py --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BUILD_APP = 'from app import create_app; create_app()'
+
+
+def time_command(args, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure application startup')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    commands = [
+        ('import app', [sys.executable, '-c', 'import app']),
+        ('create_app() in a fresh process', [sys.executable, '-c', BUILD_APP]),
+        ('pytest --collect-only', [sys.executable, '-m', 'pytest', '--collect-only', '-q', '-p', 'no:cacheprovider']),
+    ]
+    for label, command in commands:
+        print(f'{label:<34} {time_command(command, args.runs) * 1000:8.0f} ms')
+
+    from app import create_app
+    create_app()
+    start = time.perf_counter()
+    for _ in range(20):
+        create_app()
+    print(f"{'each further create_app()':<34} {(time.perf_counter() - start) / 20 * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
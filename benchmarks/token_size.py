@@ -0,0 +1,89 @@
+"""
+Token bytes per request and decode time, old token shapes against the current format.
+
+The old shapes are what the sign-in paths minted before tokens.py: guest
+logins with is_host/email claims, the name match with an integer subject and
+Google sign-in with email/is_host/type claims. For each, the script reports
+the access token length, the Authorization header and the Cookie header an
+ordinary API request carried (the refresh cookies used to be sent on every
+path), and the time to verify the token and read the user id from it.
+
+    python benchmarks/token_size.py --rounds 20000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from tokens import issue_tokens, user_id_from_identity  # noqa: E402
+
+USER_ID = 123456
+EMAIL = 'someone.with.a.longish.address@example.com'
+
+
+class SampleUser:
+    id = USER_ID
+    email = EMAIL
+    is_host = False
+
+
+def old_tokens():
+    guest_claims = {'is_host': False, 'email': EMAIL}
+    google_claims = {'email': EMAIL, 'is_host': False, 'type': 'guest'}
+    return {
+        'guest login': (
+            create_access_token(identity=str(USER_ID), additional_claims=guest_claims, expires_delta=timedelta(days=30)),
+            create_refresh_token(identity=str(USER_ID), additional_claims=guest_claims, expires_delta=timedelta(days=60))),
+        'name match': (
+            create_access_token(identity=USER_ID, additional_claims=guest_claims, expires_delta=timedelta(days=60)),
+            create_refresh_token(identity=USER_ID, additional_claims=guest_claims, expires_delta=timedelta(days=60))),
+        'google': (
+            create_access_token(identity=str(USER_ID), additional_claims=google_claims, expires_delta=timedelta(days=30)),
+            create_refresh_token(identity=str(USER_ID), additional_claims=google_claims, expires_delta=timedelta(days=30))),
+    }
+
+
+def cookie_header(access, refresh, refresh_sent):
+    # The CSRF cookies hold a uuid4 each
+    cookies = [f'access_token_cookie={access}', f'csrf_access_token={"0" * 36}']
+    if refresh_sent:
+        cookies += [f'refresh_token_cookie={refresh}', f'csrf_refresh_token={"0" * 36}']
+    return len('Cookie: ' + '; '.join(cookies))
+
+
+def decode_seconds(token, rounds):
+    decode_token(token)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        user_id_from_identity(decode_token(token)['sub'])
+    return (time.perf_counter() - started) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Token size and decode time per format')
+    parser.add_argument('--rounds', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'tokens.db')}"})
+        with app.app_context():
+            formats = {label: (access, refresh, True) for label, (access, refresh) in old_tokens().items()}
+            formats['current'] = issue_tokens(SampleUser()) + (False,)
+            for label, (access, refresh, refresh_sent) in formats.items():
+                print(f'{label:<12} token {len(access):4d} B   '
+                      f'Authorization {len("Authorization: Bearer " + access):4d} B   '
+                      f'Cookie {cookie_header(access, refresh, refresh_sent):5d} B   '
+                      f'decode {decode_seconds(access, args.rounds) * 1e6:6.1f} us')
+
+
+if __name__ == '__main__':
+    main()
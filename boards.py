@@ -0,0 +1,103 @@
+"""
+Shared builds of the event boards every guest and host polls.
+
+When a slot is claimed at a live shower the event's version changes and
+every polling phone asks for the new board at once. The requests that miss
+together are coalesced: one of them builds the board while the rest wait
+for it and answer with the same bytes, so a worker builds each board at
+most once per version however many pollers there are.
+
+A board is stored as its encoded JSON body, plus a gzipped copy when the
+body is at least BOARD_GZIP_MIN_BYTES, so a hit writes stored bytes to the
+response without building, serializing or compressing anything. Boards are
+kept per event in an LRU of BOARD_CACHE_EVENTS events, holding only the
+event's current version: the first read after a change replaces them.
+
+The state is per process, so each server worker builds a board once.
+"""
+
+import gzip
+
+from flask import Response, current_app, request
+
+import metrics
+from cache import LRUCache, SingleFlight
+
+metrics.describe('board_requests_total', 'Board and dashboard reads, by board and outcome')
+
+# Distinct boards (board and parameters) kept for one event version
+BOARDS_PER_EVENT = 16
+GZIP_LEVEL = 6
+
+
+class Snapshot:
+    """A board's encoded response body, and its gzipped copy if worth compressing"""
+
+    def __init__(self, body, gzip_min_bytes):
+        self.body = body
+        self.gzipped = gzip.compress(body, GZIP_LEVEL, mtime=0) if len(body) >= gzip_min_bytes else None
+
+    def response(self):
+        if self.gzipped is not None and 'gzip' in request.accept_encodings:
+            response = Response(self.gzipped, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(self.body, mimetype='application/json')
+        if self.gzipped is not None:
+            response.vary.add('Accept-Encoding')
+        return response
+
+
+class _EventBoards:
+    def __init__(self, version):
+        self.version = version
+        self.boards = LRUCache(maxsize=BOARDS_PER_EVENT)
+
+
+def _state(app):
+    state = app.extensions.get('boards')
+    if state is None:
+        # setdefault so two first requests can't end up with different caches
+        state = app.extensions.setdefault('boards', {'events': LRUCache(maxsize=app.config['BOARD_CACHE_EVENTS']),
+                                                     'flights': SingleFlight()})
+    return state
+
+
+def _event_boards(state, event):
+    """The event's boards for its version, or None if a newer version is already stored"""
+    stored = state['events'].get(event.id)
+    if stored is None or stored.version < event.version:
+        # Older versions are never read again
+        stored = _EventBoards(event.version)
+        state['events'].set(event.id, stored)
+    elif stored.version > event.version:
+        # This request read the event before the latest change (e.g. on a lagging replica)
+        return None
+    return stored
+
+
+def board_response(name, event, build, *params):
+    """A response with build()'s JSON, or the bytes built for this event version and params"""
+    state = _state(current_app)
+    stored = _event_boards(state, event)
+    key = (name, params)
+    snapshot = stored.boards.get(key) if stored is not None else None
+    if snapshot is not None:
+        metrics.inc('board_requests_total', board=name, outcome='cached')
+        return snapshot.response()
+
+    def build_and_store():
+        # A request that just finished may have stored it before we got here
+        cached = stored.boards.get(key) if stored is not None else None
+        if cached is not None:
+            return cached
+        # Encoded exactly as jsonify would
+        body = current_app.json.response(build()).get_data()
+        snapshot = Snapshot(body, current_app.config['BOARD_GZIP_MIN_BYTES'])
+        if stored is not None:
+            stored.boards.set(key, snapshot)
+        return snapshot
+
+    snapshot, shared = state['flights'].do((name, event.id, event.version, params), build_and_store)
+    metrics.inc('board_requests_total', board=name, outcome='coalesced' if shared else 'built')
+    return snapshot.response()
@@ -1,5 +1,8 @@
-from app import app, db
-from models import User
+from app import create_app, init_schema
+from models import db, User
+
+app = create_app()
+init_schema(app)
 
 with app.app_context():
     print('Current users in database:')
@@ -1,6 +1,8 @@
 import os
 import secrets
 
+from database import engine_options
+
 class Config:
     # Flask configuration
     SECRET_KEY = os.environ.get('SECRET_KEY', secrets.token_hex(16))
@@ -8,16 +10,99 @@ class Config:
     # Database configuration
     DB_URL = os.environ.get('DATABASE_URL', 'sqlite:///baby_pool.db')
     
-    # PostgreSQL connection settings
+    # Pool and connection settings depend on the backend (see database.py)
     # Note: Don't modify the URL directly as SQLAlchemy will handle connection parameters
     SQLALCHEMY_DATABASE_URI = DB_URL
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_size': 10,
-        'max_overflow': 20,
-        'pool_recycle': 1800,  # Recycle connections after 30 minutes
-        'pool_pre_ping': True,  # Test connections before using them
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(DB_URL)
+    
+    # Optional read replicas (comma-separated URLs) for read-only endpoints; a client
+    # that writes reads from the primary for REPLICA_STICKY_SECONDS afterwards
+    SQLALCHEMY_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+    
+    # SQLite file databases: WAL journaling plus these pragmas on every connection
+    SQLITE_SETTINGS = {
+        'busy_timeout_ms': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size_kib': int(os.environ.get('SQLITE_CACHE_SIZE_KIB', 16 * 1024)),
+    }
+
+    # Retrying new database connections (see resilience.py); while the circuit
+    # breaker is open requests fail fast with 503 instead of waiting
+    DB_RESILIENCE = {
+        'attempts': int(os.environ.get('DB_CONNECT_ATTEMPTS', 4)),
+        'base_delay': float(os.environ.get('DB_CONNECT_BASE_DELAY', 0.05)),
+        'max_delay': float(os.environ.get('DB_CONNECT_MAX_DELAY', 1.0)),
+        'deadline': float(os.environ.get('DB_REQUEST_DEADLINE', 3.0)),
+        'breaker_threshold': int(os.environ.get('DB_BREAKER_THRESHOLD', 5)),
+        'breaker_cooldown': float(os.environ.get('DB_BREAKER_COOLDOWN', 10.0)),
+    }
+
+    # Live update streams (ASGI mode, see asgi.py): how often each watched event's
+    # version is polled and how long an idle stream waits between heartbeats
+    LIVE_POLL_SECONDS = float(os.environ.get('LIVE_POLL_SECONDS', 2))
+    LIVE_HEARTBEAT_SECONDS = float(os.environ.get('LIVE_HEARTBEAT_SECONDS', 15))
+
+    # Password hashing pool (see passwords.py): worker threads (default one per
+    # CPU), jobs allowed to wait beyond those, and how long a request waits
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    # PBKDF2 work factor (see hashing.py): fixed by PASSWORD_HASH_ITERATIONS, or
+    # calibrated at startup so a verification takes about the target time
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 0)) or None
+    PASSWORD_HASH_TARGET_SECONDS = float(os.environ.get('PASSWORD_HASH_TARGET_SECONDS', 0.25))
+    PASSWORD_HASH_MIN_ITERATIONS = int(os.environ.get('PASSWORD_HASH_MIN_ITERATIONS', 600000))
+
+    # Host login token buckets: sustained attempts per minute and burst size,
+    # per client IP and per email address
+    LOGIN_IP_RATE_PER_MINUTE = float(os.environ.get('LOGIN_IP_RATE_PER_MINUTE', 30))
+    LOGIN_IP_BURST = int(os.environ.get('LOGIN_IP_BURST', 20))
+    LOGIN_EMAIL_RATE_PER_MINUTE = float(os.environ.get('LOGIN_EMAIL_RATE_PER_MINUTE', 6))
+    LOGIN_EMAIL_BURST = int(os.environ.get('LOGIN_EMAIL_BURST', 5))
+
+    # Admission gates (see admission.py): concurrent requests, queued requests per
+    # priority and seconds a queued request waits before a 429. Keep the limit
+    # well below the database pool size of one worker process.
+    ADMISSION_GATES = {
+        'guest_login': {
+            'limit': int(os.environ.get('GUEST_LOGIN_CONCURRENCY', 8)),
+            'queue': int(os.environ.get('GUEST_LOGIN_QUEUE', 32)),
+            'timeout': float(os.environ.get('GUEST_LOGIN_QUEUE_TIMEOUT', 2.0)),
+        },
     }
+
+    # Revoked JWTs (see revocation.py): how often each worker process picks up
+    # revocations made by the others, and how often expired ones are deleted
+    TOKEN_REVOCATION_SYNC_SECONDS = float(os.environ.get('TOKEN_REVOCATION_SYNC_SECONDS', 10))
+    TOKEN_REVOCATION_PRUNE_SECONDS = float(os.environ.get('TOKEN_REVOCATION_PRUNE_SECONDS', 3600))
+
+    # Idempotency-Key support on mutating API routes (see idempotency.py): how long
+    # outcomes are replayed, how long a duplicate waits for the first request, after
+    # how long an unfinished first request counts as abandoned, the largest response
+    # body stored and how often expired records are deleted
+    IDEMPOTENCY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 5))
+    IDEMPOTENCY_LOCK_SECONDS = float(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', 60))
+    IDEMPOTENCY_MAX_BODY_BYTES = int(os.environ.get('IDEMPOTENCY_MAX_BODY_BYTES', 65536))
+    IDEMPOTENCY_PRUNE_SECONDS = float(os.environ.get('IDEMPOTENCY_PRUNE_SECONDS', 3600))
+
+    # Encoded board responses (see boards.py): how many events each worker keeps
+    # them for, and the smallest body that is also stored gzipped
+    BOARD_CACHE_EVENTS = int(os.environ.get('BOARD_CACHE_EVENTS', 256))
+    BOARD_GZIP_MIN_BYTES = int(os.environ.get('BOARD_GZIP_MIN_BYTES', 1024))
+
+    # Bearer token required by /metrics (open when unset)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Google sign-in; the /google_auth blueprint is only registered when both are set
+    GOOGLE_OAUTH_CLIENT_ID = os.environ.get('GOOGLE_OAUTH_CLIENT_ID')
+    GOOGLE_OAUTH_CLIENT_SECRET = os.environ.get('GOOGLE_OAUTH_CLIENT_SECRET')
+    GOOGLE_DISCOVERY_URL = os.environ.get('GOOGLE_DISCOVERY_URL', 'https://accounts.google.com/.well-known/openid-configuration')
+    # Trust the signed ID token from the token endpoint instead of calling userinfo
+    GOOGLE_VERIFY_ID_TOKEN = os.environ.get('GOOGLE_VERIFY_ID_TOKEN', 'true').lower() == 'true'
     
     # Session configuration
     PERMANENT_SESSION_LIFETIME = 2592000  # 30 days in seconds for guests
@@ -26,3 +111,18 @@ class Config:
     UPLOAD_FOLDER = 'static/uploads'
     MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB max upload size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    
+    # Guess storage: 'separate' (one table per pool) or 'unified' (a single guess table
+    # with a type column); read when models are imported. Switching an existing database
+    # to 'unified' copies the old tables over on the next start.
+    GUESS_STORAGE = os.environ.get('GUESS_STORAGE', 'separate')
+    
+    # Default tie rule when settling pools: 'split', 'earlier', 'later' or 'first_claimed'
+    WINNER_TIE_RULE = os.environ.get('WINNER_TIE_RULE', 'split')
+    
+    # Birth timing model for win probabilities: days from the due date (mean and spread)
+    WIN_PROBABILITY_MEAN_OFFSET_DAYS = float(os.environ.get('WIN_PROBABILITY_MEAN_OFFSET_DAYS', 0))
+    WIN_PROBABILITY_SD_DAYS = float(os.environ.get('WIN_PROBABILITY_SD_DAYS', 10))
+    
+    # Birth datetimes sampled by the host's pool simulation
+    SIMULATION_SAMPLES = int(os.environ.get('SIMULATION_SAMPLES', 20000))
@@ -1,7 +1,10 @@
-from app import app, db
-from models import User
+from app import create_app, init_schema
+from models import db, User
 from werkzeug.security import generate_password_hash
 
+app = create_app()
+init_schema(app)
+
 with app.app_context():
     # Check if the test user already exists
     existing_user = User.query.filter_by(email='test@example.com').first()
@@ -0,0 +1,313 @@
+"""
+Backend-aware database engine configuration.
+
+PostgreSQL (and other server databases) get a connection pool sized for
+concurrent requests, with ``pool_pre_ping`` to catch connections dropped by
+the server. A SQLite file gets WAL journaling and tuned pragmas instead; a
+ping there is pure overhead, so none is configured.
+
+SQLite allows one writer at a time. Write transactions (any non-GET request,
+or code inside ``writing()``) start with ``BEGIN IMMEDIATE`` and take a
+process-wide writer lock first, so concurrent guess submissions queue in
+Python instead of spinning in SQLite's busy handler or failing with
+"database is locked". Reads use plain deferred transactions and never wait
+for writers under WAL.
+
+Views decorated with ``read_replica`` read from one of the configured
+replicas (SQLALCHEMY_REPLICA_URLS); everything else, any flush and any
+request from a client that wrote in the last few seconds goes to the
+primary. Replica responses carry the event's version so clients can detect
+lag, and a client can demand a minimum version with X-Min-Event-Version.
+
+Every engine also retries failed connects with backoff behind a circuit
+breaker (see resilience.py); a replica whose breaker is open is skipped.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import current_app, g, has_request_context, make_response, request
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import column, create_engine, event, select, table
+from sqlalchemy.engine import make_url
+
+import metrics
+from resilience import DatabaseUnavailable, breaker_for, install_connect_retry
+
+# Server database pool (per process)
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+POOL_RECYCLE = 1800  # Recycle connections after 30 minutes
+
+# SQLite readers run concurrently under WAL; a small pool is enough
+SQLITE_POOL_SIZE = 5
+SQLITE_MAX_OVERFLOW = 10
+
+SQLITE_DEFAULTS = {
+    'busy_timeout_ms': 5000,
+    'synchronous': 'NORMAL',  # Durable at checkpoints; safe with WAL
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size_kib': 16 * 1024,
+}
+
+READ_ONLY_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+# Set after a successful write so the client's next reads see it
+READ_PRIMARY_COOKIE = 'read_primary_until'
+
+_event_table = table('event', column('id'), column('version'))
+
+_write_intent = ContextVar('write_intent', default=False)
+
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def is_sqlite_memory(url):
+    database = make_url(url).database
+    return not database or database == ':memory:' or database.startswith('file::memory:')
+
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS suited to the database behind url"""
+    if not is_sqlite(url):
+        return {
+            'pool_size': POOL_SIZE,
+            'max_overflow': MAX_OVERFLOW,
+            'pool_recycle': POOL_RECYCLE,
+            'pool_pre_ping': True,  # Test connections before using them
+        }
+    if is_sqlite_memory(url):
+        # SQLAlchemy's default single-connection pool is the only one that works here
+        return {}
+    return {
+        'pool_size': SQLITE_POOL_SIZE,
+        'max_overflow': SQLITE_MAX_OVERFLOW,
+        'connect_args': {'check_same_thread': False},
+    }
+
+
+@contextmanager
+def writing():
+    """Mark the transactions started inside the block as writes"""
+    token = _write_intent.set(True)
+    try:
+        yield
+    finally:
+        _write_intent.reset(token)
+
+
+def wants_write_transaction():
+    if _write_intent.get():
+        return True
+    return has_request_context() and request.method not in READ_ONLY_METHODS
+
+
+def sqlite_pragmas(settings=None):
+    """PRAGMA statements run on every new SQLite connection"""
+    settings = {**SQLITE_DEFAULTS, **(settings or {})}
+    return [
+        'PRAGMA journal_mode=WAL',
+        f"PRAGMA synchronous={settings['synchronous']}",
+        f"PRAGMA busy_timeout={int(settings['busy_timeout_ms'])}",
+        f"PRAGMA mmap_size={int(settings['mmap_size'])}",
+        f"PRAGMA cache_size=-{int(settings['cache_size_kib'])}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def configure_sqlite(engine, settings=None):
+    """Install the pragmas and single-writer transactions on a SQLite file engine"""
+    settings = {**SQLITE_DEFAULTS, **(settings or {})}
+    pragmas = sqlite_pragmas(settings)
+    lock_timeout = settings['busy_timeout_ms'] / 1000
+    writer_lock = threading.Lock()
+    # Thread whose connection holds writer_lock; only that thread sets it to itself
+    writer = {'thread': None}
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        # Let SQLAlchemy emit BEGIN itself so it can choose IMMEDIATE
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def begin(connection):
+        if not wants_write_transaction():
+            connection.exec_driver_sql('BEGIN')
+            return
+        if writer['thread'] == threading.get_ident():
+            # A second connection on the thread that is already writing (e.g. engine.connect()
+            # inside a POST). Waiting for the lock or the write lock in SQLite would only time
+            # out, so reads go ahead and a write fails at once with "database is locked".
+            connection.info['nested_writer'] = True
+            connection.exec_driver_sql('PRAGMA busy_timeout = 0')
+            connection.exec_driver_sql('BEGIN')
+            return
+        # Without the lock the BEGIN still works, it just waits in SQLite instead
+        if writer_lock.acquire(timeout=lock_timeout):
+            connection.info['holds_writer_lock'] = True
+            writer['thread'] = threading.get_ident()
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+    def release_lock(info):
+        if info.pop('holds_writer_lock', False):
+            writer['thread'] = None
+            writer_lock.release()
+
+    def release(connection):
+        if connection.info.pop('nested_writer', False):
+            connection.exec_driver_sql(f"PRAGMA busy_timeout = {settings['busy_timeout_ms']}")
+        release_lock(connection.info)
+
+    event.listen(engine, 'commit', release)
+    event.listen(engine, 'rollback', release)
+
+    @event.listens_for(engine, 'checkin')
+    def release_on_checkin(dbapi_connection, connection_record):
+        # Safety net for a connection returned mid-transaction
+        if connection_record.info.pop('nested_writer', False):
+            dbapi_connection.execute(f"PRAGMA busy_timeout = {settings['busy_timeout_ms']}")
+        release_lock(connection_record.info)
+
+    return engine
+
+
+metrics.describe('db_pool_checked_out', 'Pooled connections currently checked out', 'gauge')
+metrics.describe('db_pool_checked_out_peak', 'Most pooled connections checked out at once', 'gauge')
+
+
+def track_pool_usage(engine):
+    """Export how many of the engine's pooled connections are in use"""
+    label = engine.url.render_as_string(hide_password=True)
+    lock = threading.Lock()
+    usage = {'current': 0, 'peak': 0}
+
+    def change(amount):
+        with lock:
+            usage['current'] += amount
+            usage['peak'] = max(usage['peak'], usage['current'])
+            metrics.set_gauge('db_pool_checked_out', usage['current'], database=label)
+            metrics.set_gauge('db_pool_checked_out_peak', usage['peak'], database=label)
+
+    event.listen(engine, 'checkout', lambda *args: change(1))
+    event.listen(engine, 'checkin', lambda *args: change(-1))
+
+
+def configure_engine(engine, settings=None, resilience=None):
+    """Apply backend-specific tuning, the connect retry policy and pool metrics to an engine"""
+    if engine.dialect.name == 'sqlite' and not is_sqlite_memory(str(engine.url)):
+        configure_sqlite(engine, settings)
+    install_connect_retry(engine, resilience)
+    track_pool_usage(engine)
+    return engine
+
+
+def replica_engines(app=None):
+    """Engines for the configured read replicas, created on first use"""
+    app = app or current_app
+    urls = tuple(app.config.get('SQLALCHEMY_REPLICA_URLS') or ())
+    engines = app.extensions.setdefault('replica_engines', {})
+    if urls not in engines:
+        engines[urls] = [
+            configure_engine(create_engine(url, **engine_options(url)),
+                             app.config.get('SQLITE_SETTINGS'), app.config.get('DB_RESILIENCE'))
+            for url in urls
+        ]
+    return engines[urls]
+
+
+def _version_query(event_id):
+    return select(_event_table.c.version).where(_event_table.c.id == event_id)
+
+
+def event_version(engine, event_id):
+    """The version of an event as seen by an engine"""
+    with engine.connect() as connection:
+        return connection.execute(_version_query(event_id)).scalar()
+
+
+def _recently_wrote():
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class RoutingSession(FlaskSession):
+    """Session that reads from the request's replica until it writes"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self.info.get('wrote') and not getattr(clause, 'is_dml', False):
+            replica = g.get('replica_engine') if has_request_context() else None
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _route_writes_to_primary(session, flush_context, instances):
+    # For the rest of the request, so it reads its own writes
+    session.info['wrote'] = True
+
+
+def read_replica(view):
+    """Serve a read-only view from a replica when one is configured.
+
+    Falls back to the primary for clients that just wrote and when the
+    replica's copy of the event is older than X-Min-Event-Version.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        engines = replica_engines() if request.method in READ_ONLY_METHODS else []
+        # Don't send reads to a replica that is known to be down
+        engines = [engine for engine in engines if breaker_for(engine).available()]
+        if not engines or _recently_wrote():
+            return view(*args, **kwargs)
+
+        replica = random.choice(engines)
+        event_id = kwargs.get('event_id')
+        try:
+            version = event_version(replica, event_id) if event_id is not None else None
+        except DatabaseUnavailable:
+            return view(*args, **kwargs)
+        min_version = request.headers.get('X-Min-Event-Version', type=int)
+        if min_version is not None and (version or 0) < min_version:
+            return view(*args, **kwargs)
+
+        g.replica_engine = replica
+        response = make_response(view(*args, **kwargs))
+        response.headers['X-Read-Source'] = 'replica'
+        if version is not None:
+            response.headers['X-Event-Version'] = str(version)
+        return response
+    return wrapper
+
+
+def remember_writes(response):
+    """after_request hook: pin a client that just wrote to the primary for a while"""
+    if request.method in READ_ONLY_METHODS or response.status_code >= 400:
+        return response
+    if not current_app.config.get('SQLALCHEMY_REPLICA_URLS'):
+        return response
+
+    sticky_seconds = current_app.config.get('REPLICA_STICKY_SECONDS', 10)
+    response.set_cookie(READ_PRIMARY_COOKIE, str(time.time() + sticky_seconds),
+                        max_age=sticky_seconds, httponly=True, samesite='Lax')
+    event_id = (request.view_args or {}).get('event_id')
+    if event_id is not None:
+        # Clients pass this back as X-Min-Event-Version to read their own write
+        version = current_app.extensions['sqlalchemy'].session.execute(_version_query(event_id)).scalar()
+        if version is not None:
+            response.headers['X-Event-Version'] = str(version)
+    return response
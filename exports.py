@@ -0,0 +1,194 @@
+"""
+Streaming exports of an event's guests, guesses and payments.
+
+Rows are read with ``yield_per`` (server-side cursors on PostgreSQL) and
+written to the response in chunks by a generator, so memory stays flat no
+matter how many events or rows a host has.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from sqlalchemy import func, select
+
+from models import db, User, Event, DateGuess, HourGuess, MinuteGuess, NameGuess, Payment, event_guests, guess_rows
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows fetched per round trip and rows buffered per response chunk
+YIELD_PER = 500
+CHUNK_ROWS = 500
+
+GUEST_FIELDS = [
+    'event_id', 'user_id', 'email', 'first_name', 'last_name', 'nickname', 'phone',
+    'payment_method', 'total_guesses', 'amount_owed', 'total_paid', 'payment_status'
+]
+GUESS_FIELDS = ['event_id', 'guess_type', 'guess_id', 'user_id', 'user_name', 'value', 'created_at']
+PAYMENT_FIELDS = ['event_id', 'payment_id', 'user_id', 'user_name', 'amount', 'status', 'created_at']
+
+
+def _count_for_user():
+    """Correlated count of every guess type for the current roster row"""
+    rows = guess_rows()
+    return (
+        select(func.count(rows.c.id))
+        .where(rows.c.user_id == event_guests.c.user_id, rows.c.event_id == event_guests.c.event_id)
+        .scalar_subquery()
+    )
+
+
+def _stream(statement):
+    """Execute a statement and iterate its rows without buffering the result"""
+    result = db.session.execute(statement.execution_options(yield_per=YIELD_PER))
+    for partition in result.partitions():
+        yield from partition
+
+
+def iter_guests(event_ids):
+    """Yield one roster row (dict) per guest of the given events"""
+    total_guesses = _count_for_user()
+    total_paid = (
+        select(func.coalesce(func.sum(Payment.amount), 0.0))
+        .where(Payment.user_id == event_guests.c.user_id, Payment.event_id == event_guests.c.event_id)
+        .scalar_subquery()
+    )
+    statement = (
+        select(
+            event_guests.c.event_id, User.id, User.email, User.first_name, User.last_name,
+            User.nickname, User.phone, User.payment_method, Event.guess_price,
+            total_guesses.label('total_guesses'), total_paid.label('total_paid')
+        )
+        .join(User, User.id == event_guests.c.user_id)
+        .join(Event, Event.id == event_guests.c.event_id)
+        .where(event_guests.c.event_id.in_(event_ids))
+        .order_by(event_guests.c.event_id, User.id)
+    )
+    for row in _stream(statement):
+        amount_owed = row.total_guesses * (row.guess_price or 0)
+        payment_status = 'paid' if row.total_paid >= amount_owed else 'pending'
+        if 0 < row.total_paid < amount_owed:
+            payment_status = 'partial'
+        yield {
+            'event_id': row.event_id,
+            'user_id': row.id,
+            'email': row.email,
+            'first_name': row.first_name,
+            'last_name': row.last_name,
+            'nickname': row.nickname,
+            'phone': row.phone,
+            'payment_method': row.payment_method,
+            'total_guesses': row.total_guesses,
+            'amount_owed': amount_owed,
+            'total_paid': row.total_paid,
+            'payment_status': payment_status
+        }
+
+
+def iter_guesses(event_ids):
+    """Yield every date, hour, minute and name guess for the given events"""
+    guess_types = [
+        ('date', DateGuess, (DateGuess.guess_date,), lambda guess_date: guess_date.strftime('%Y-%m-%d')),
+        ('hour', HourGuess, (HourGuess.hour, HourGuess.am_pm), lambda hour, am_pm: f"{hour} {am_pm}"),
+        ('minute', MinuteGuess, (MinuteGuess.minute,), lambda minute: f"{minute:02d}"),
+        ('name', NameGuess, (NameGuess.name,), lambda name: name),
+    ]
+    for guess_type, model, value_columns, format_value in guess_types:
+        statement = (
+            select(
+                model.event_id, model.id, model.user_id, model.created_at,
+                User.nickname, User.first_name, User.last_name, User.email, *value_columns
+            )
+            .join(User, User.id == model.user_id)
+            .where(model.event_id.in_(event_ids))
+            .order_by(model.event_id, model.id)
+        )
+        for row in _stream(statement):
+            yield {
+                'event_id': row[0],
+                'guess_type': guess_type,
+                'guess_id': row[1],
+                'user_id': row[2],
+                'user_name': User.format_display_name(row[4], row[5], row[6], row[7]),
+                'value': format_value(*row[8:]),
+                'created_at': row[3]
+            }
+
+
+def iter_payments(event_ids):
+    """Yield every payment recorded for the given events"""
+    statement = (
+        select(
+            Payment.event_id, Payment.id, Payment.user_id, Payment.amount, Payment.status,
+            Payment.created_at, User.nickname, User.first_name, User.last_name, User.email
+        )
+        .join(User, User.id == Payment.user_id)
+        .where(Payment.event_id.in_(event_ids))
+        .order_by(Payment.event_id, Payment.id)
+    )
+    for row in _stream(statement):
+        yield {
+            'event_id': row.event_id,
+            'payment_id': row.id,
+            'user_id': row.user_id,
+            'user_name': User.format_display_name(row.nickname, row.first_name, row.last_name, row.email),
+            'amount': row.amount,
+            'status': row.status,
+            'created_at': row.created_at
+        }
+
+
+EXPORT_DATASETS = {
+    'guests': (iter_guests, GUEST_FIELDS),
+    'guesses': (iter_guesses, GUESS_FIELDS),
+    'payments': (iter_payments, PAYMENT_FIELDS),
+}
+
+
+def _format_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def generate_csv(rows, fields):
+    """Encode rows as CSV, yielding one chunk per CHUNK_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    count = 0
+    for row in rows:
+        writer.writerow([_format_value(row[field]) for field in fields])
+        count += 1
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def generate_ndjson(rows, fields):
+    """Encode rows as newline-delimited JSON, yielding one chunk per CHUNK_ROWS rows"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({field: _format_value(row[field]) for field in fields}))
+        if len(lines) >= CHUNK_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def generate_export(dataset, export_format, event_ids):
+    """Return a generator producing the encoded export body.
+
+    ``event_ids`` may be a list of ids or a select() of ids, so a host-wide
+    export never materializes the host's event list in Python.
+    """
+    iter_rows, fields = EXPORT_DATASETS[dataset]
+    encoder = generate_csv if export_format == 'csv' else generate_ndjson
+    return encoder(iter_rows(event_ids), fields)
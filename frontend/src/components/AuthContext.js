@@ -88,8 +88,11 @@ export const AuthProvider = ({ children }) => {
                 
                 console.log("Token refresh successful");
                 
-                // Store the new access token
+                // Store the new tokens (refresh tokens are single use)
                 localStorage.setItem('token', refreshResponse.data.access_token);
+                if (refreshResponse.data.refresh_token) {
+                  localStorage.setItem('refresh_token', refreshResponse.data.refresh_token);
+                }
                 
                 // Fetch user data with new token
                 try {
@@ -234,8 +237,8 @@ export const AuthProvider = ({ children }) => {
   const logout = async () => {
     try {
       const token = localStorage.getItem('token');
-      // Call the logout API endpoint to invalidate server-side tokens
-      await axios.post('/auth/logout', {}, {
+      // Call the logout API endpoint to revoke the access and refresh tokens
+      await axios.post('/auth/logout', { refresh_token: localStorage.getItem('refresh_token') }, {
         headers: token ? { 'Authorization': `Bearer ${token}` } : {},
         withCredentials: true
       });
@@ -24,6 +24,18 @@ const processQueue = (error, token = null) => {
   failedQueue = [];
 };
 
+// Idempotency keys for mutating requests: each call gets a fresh key, and
+// retries of that call (after a token refresh or a dropped connection) send
+// the same one, so the server runs it once and replays the outcome. Repeating
+// an action on purpose is a new call with a new key.
+const MAX_NETWORK_RETRIES = 2;
+
+const newKey = () => (window.crypto && window.crypto.randomUUID)
+  ? window.crypto.randomUUID()
+  : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
+const isMutating = (config) => ['post', 'put', 'delete', 'patch'].includes(config.method);
+
 // Add auth token to all requests if available
 api.interceptors.request.use(
   (config) => {
@@ -31,6 +43,11 @@ api.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    // Retries keep the key already set on their config. Uploads are left out:
+    // a resent multipart body gets a new boundary, so it would never match
+    if (isMutating(config) && !(config.data instanceof FormData) && !config.headers['Idempotency-Key']) {
+      config.headers['Idempotency-Key'] = newKey();
+    }
     return config;
   },
   (error) => Promise.reject(error)
@@ -42,6 +59,15 @@ api.interceptors.response.use(
   async (error) => {
     const originalRequest = error.config;
 
+    // No response at all (flaky venue Wi-Fi): resend the same call, with the
+    // same Idempotency-Key, so it can't be applied twice
+    if (!error.response && originalRequest && isMutating(originalRequest) &&
+        (originalRequest._networkRetries || 0) < MAX_NETWORK_RETRIES) {
+      originalRequest._networkRetries = (originalRequest._networkRetries || 0) + 1;
+      await new Promise(resolve => setTimeout(resolve, 500 * originalRequest._networkRetries));
+      return api(originalRequest);
+    }
+
     // If error is unauthorized and we haven't tried refreshing yet
     if (error.response && error.response.status === 401 && !originalRequest._retry) {
       if (isRefreshing) {
@@ -74,8 +100,12 @@ api.interceptors.response.use(
           withCredentials: true
         });
 
-        const { access_token } = response.data;
+        const { access_token, refresh_token } = response.data;
         localStorage.setItem('token', access_token);
+        // Refresh tokens are single use; keep the rotated one
+        if (refresh_token) {
+          localStorage.setItem('refresh_token', refresh_token);
+        }
 
         // Update authorization header
         api.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
@@ -157,7 +187,8 @@ export const selectEvent = async (eventData) => {
 
 export const logout = async () => {
   try {
-    await axios.post('/auth/logout', {}, {
+    // Send the refresh token so the server revokes it along with the access token
+    await axios.post('/auth/logout', { refresh_token: localStorage.getItem('refresh_token') }, {
       withCredentials: true  // Ensure cookies are sent with the request
     });
     // Clear all authentication data
@@ -187,11 +218,22 @@ export const updateProfile = async (profileData) => {
   }
 };
 
+// List endpoints are cursor-paginated; follow X-Next-Cursor until the last page
+const getAllPages = async (url, params = {}) => {
+  let items = [];
+  let cursor = null;
+  do {
+    const response = await api.get(url, { params: cursor ? { ...params, cursor } : params });
+    items = items.concat(response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return items;
+};
+
 // Event API calls
 export const getEvents = async () => {
   try {
-    const response = await api.get('/events');
-    return response.data;
+    return await getAllPages('/events');
   } catch (error) {
     throw error;
   }
@@ -271,8 +313,7 @@ export const searchEventByMother = async (searchTerm) => {
 // Guest management API calls
 export const getEventGuests = async (eventId) => {
   try {
-    const response = await api.get(`/events/${eventId}/guests`);
-    return response.data;
+    return await getAllPages(`/events/${eventId}/guests`);
   } catch (error) {
     throw error;
   }
@@ -409,6 +450,17 @@ export const createNameGuess = async (eventId, name) => {
   }
 };
 
+// Several guesses in one request: [{ type: 'date', date }, { type: 'hour', hour, am_pm },
+// { type: 'minute', minute }, { type: 'name', name }]; the response has a result per item
+export const createGuessesBatch = async (eventId, guesses) => {
+  try {
+    const response = await api.post(`/events/${eventId}/guesses/batch`, { guesses });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
 export const deleteGuess = async (eventId, guessType, guessId) => {
   try {
     const response = await api.delete(`/events/${eventId}/guesses/${guessType}/${guessId}`);
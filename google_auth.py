@@ -1,86 +1,131 @@
 # Use this Flask blueprint for Google authentication. Do not use flask-dance.
 
 import json
+import logging
 import os
-import time
-from datetime import timedelta
 
-import requests
-from flask import Blueprint, redirect, request, url_for, make_response
+import jwt
+from flask import Blueprint, current_app, redirect, request, make_response
 from flask_login import login_required, login_user, logout_user
-from flask_jwt_extended import (
-    create_access_token, create_refresh_token, 
-    set_access_cookies, set_refresh_cookies,
-    unset_jwt_cookies
-)
+from flask_jwt_extended import set_access_cookies, set_refresh_cookies, unset_jwt_cookies
+import oidc
 from models import User, db
+from tokens import issue_tokens
+from revocation import revoke_request_tokens
 from oauthlib.oauth2 import WebApplicationClient
 
-GOOGLE_CLIENT_ID = os.environ["GOOGLE_OAUTH_CLIENT_ID"]
-GOOGLE_CLIENT_SECRET = os.environ["GOOGLE_OAUTH_CLIENT_SECRET"]
-GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
-
 # Make sure to use this redirect URL. It has to match the one in the whitelist
 DEV_REDIRECT_URL = f'https://{os.environ.get("REPLIT_DEV_DOMAIN", "localhost")}/google_login/callback'
 
-# ALWAYS display setup instructions to the user:
-print(f"""To make Google authentication work:
+SETUP_INSTRUCTIONS = f"""To make Google authentication work:
 1. Go to https://console.cloud.google.com/apis/credentials
 2. Create a new OAuth 2.0 Client ID
 3. Add {DEV_REDIRECT_URL} to Authorized redirect URIs
 
 For detailed instructions, see:
 https://docs.replit.com/additional-resources/google-auth-in-flask#set-up-your-oauth-app--client
-""")
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def get_client():
+    """OAuth client for the app's Google credentials (GOOGLE_OAUTH_CLIENT_ID)"""
+    return WebApplicationClient(current_app.config["GOOGLE_OAUTH_CLIENT_ID"])
 
-client = WebApplicationClient(GOOGLE_CLIENT_ID)
 
 google_auth = Blueprint("google_auth", __name__)
 
 
-@google_auth.route("/google_login")
-def login():
-    google_provider_cfg = requests.get(GOOGLE_DISCOVERY_URL).json()
-    authorization_endpoint = google_provider_cfg["authorization_endpoint"]
-
-    request_uri = client.prepare_request_uri(
-        authorization_endpoint,
-        # Replacing http:// with https:// is important as the external
-        # protocol must be https to match the URI whitelisted
-        redirect_uri=request.base_url.replace("http://", "https://") + "/callback",
+@google_auth.record_once
+def show_setup_instructions(state):
+    # Shown once, when the blueprint is first registered
+    logger.info(SETUP_INSTRUCTIONS)
+
+
+def to_https(url):
+    # Replacing http:// with https:// is important as the external
+    # protocol must be https to match the URI whitelisted
+    return url.replace("http://", "https://")
+
+
+def authorization_url(client, google_provider_cfg, base_url):
+    """Where to send the browser to sign in with Google"""
+    return client.prepare_request_uri(
+        google_provider_cfg["authorization_endpoint"],
+        redirect_uri=to_https(base_url) + "/callback",
         scope=["openid", "email", "profile"],
     )
-    return redirect(request_uri)
+
+
+def token_request(client, google_provider_cfg, url, base_url, code):
+    """(url, headers, body) exchanging the callback's code for tokens"""
+    return client.prepare_token_request(
+        google_provider_cfg["token_endpoint"],
+        authorization_response=to_https(url),
+        redirect_url=to_https(base_url),
+        code=code,
+    )
+
+
+def userinfo_request(client, google_provider_cfg, token_json):
+    """(uri, headers, body) fetching the profile with the token response's access token"""
+    client.parse_request_body_response(json.dumps(token_json))
+    return client.add_token(google_provider_cfg["userinfo_endpoint"])
+
+
+def client_credentials():
+    return (current_app.config["GOOGLE_OAUTH_CLIENT_ID"], current_app.config["GOOGLE_OAUTH_CLIENT_SECRET"])
+
+
+def provider_config():
+    """Google's discovery document (cached per its HTTP caching headers)"""
+    return oidc.fetch_json(current_app.config["GOOGLE_DISCOVERY_URL"])
+
+
+def identity_from_token(token_json, google_provider_cfg):
+    """The signed-in user's claims from the ID token, or None to ask the userinfo endpoint"""
+    id_token = token_json.get("id_token")
+    if not (current_app.config["GOOGLE_VERIFY_ID_TOKEN"] and id_token):
+        return None
+    return oidc.profile_claims(
+        oidc.verified_claims(id_token, current_app.config["GOOGLE_OAUTH_CLIENT_ID"], google_provider_cfg))
+
+
+# The ASGI server (asgi.py) answers these two routes itself, making the
+# outbound calls on its event loop and reusing complete_login
+@google_auth.route("/google_login")
+def login():
+    return redirect(authorization_url(get_client(), provider_config(), request.base_url))
 
 
 @google_auth.route("/google_login/callback")
 def callback():
     code = request.args.get("code")
-    google_provider_cfg = requests.get(GOOGLE_DISCOVERY_URL).json()
-    token_endpoint = google_provider_cfg["token_endpoint"]
-
-    token_url, headers, body = client.prepare_token_request(
-        token_endpoint,
-        # Replacing http:// with https:// is important as the external
-        # protocol must be https to match the URI whitelisted
-        authorization_response=request.url.replace("http://", "https://"),
-        redirect_url=request.base_url.replace("http://", "https://"),
-        code=code,
-    )
-    token_response = requests.post(
-        token_url,
-        headers=headers,
-        data=body,
-        auth=(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET),
-    )
+    client = get_client()
+    google_provider_cfg = provider_config()
+    session = oidc.http_session()
 
-    client.parse_request_body_response(json.dumps(token_response.json()))
+    token_url, headers, body = token_request(client, google_provider_cfg, request.url, request.base_url, code)
+    token_response = session.post(token_url, headers=headers, data=body, auth=client_credentials(),
+                                  timeout=oidc.HTTP_TIMEOUT)
+    token_json = token_response.json()
 
-    userinfo_endpoint = google_provider_cfg["userinfo_endpoint"]
-    uri, headers, body = client.add_token(userinfo_endpoint)
-    userinfo_response = requests.get(uri, headers=headers, data=body)
+    try:
+        userinfo = identity_from_token(token_json, google_provider_cfg)
+    except jwt.InvalidTokenError as e:
+        logger.warning(f"Rejected Google ID token: {str(e)}")
+        return "Could not verify the Google sign-in.", 400
 
-    userinfo = userinfo_response.json()
+    if userinfo is None:
+        uri, headers, body = userinfo_request(client, google_provider_cfg, token_json)
+        userinfo = session.get(uri, headers=headers, data=body, timeout=oidc.HTTP_TIMEOUT).json()
+
+    return complete_login(userinfo)
+
+
+def complete_login(userinfo):
+    """Sign in (creating if needed) the Google user described by userinfo"""
     if userinfo.get("email_verified"):
         users_email = userinfo["email"]
         users_name = userinfo["given_name"]
@@ -119,20 +164,8 @@ def callback():
         'hosted_events_count': hosted_events_count
     }
     
-    # Create JWT tokens for the user
-    identity = {
-        'id': user.id,
-        'email': user.email,
-        'is_host': user.is_host,
-        'type': 'host' if user.is_host else 'guest'
-    }
-    
-    # Create tokens with appropriate expirations
-    access_token_expires = timedelta(days=7) if user.is_host else timedelta(days=30)
-    refresh_token_expires = timedelta(days=30)
-    
-    access_token = create_access_token(identity=identity, expires_delta=access_token_expires)
-    refresh_token = create_refresh_token(identity=identity, expires_delta=refresh_token_expires)
+    # Create JWT tokens for the user (same format as the password logins)
+    access_token, refresh_token = issue_tokens(user)
     
     # Determine redirect URL based on user type
     redirect_url = '/host/dashboard' if user.is_host else '/'
@@ -195,6 +228,7 @@ def callback():
 @login_required
 def logout():
     logout_user()
+    revoke_request_tokens()
     
     # Return HTML that clears localStorage before redirecting
     html_response = """
@@ -0,0 +1,174 @@
+"""
+Batch guess submission helpers.
+
+A guest picking several dates, hours and minutes sends them in one request
+instead of one POST each. The items are validated up front, checked against
+the slots already claimed with one query per pool, and the accepted ones
+are inserted together, so a batch costs a constant number of queries and a
+single commit however many guesses it holds.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from models import db, User, Event, DateGuess, HourGuess, MinuteGuess, GUESS_MODELS, bump_event_version
+
+MAX_BATCH_GUESSES = 200
+
+
+def parse_guess(item, event):
+    """(guess_type, slot, values) for one batch item, or raise ValueError with the reason.
+
+    slot identifies the pool slot the guess claims (None for names, which
+    several guests may share); values are the model's keyword arguments.
+    """
+    if not isinstance(item, dict):
+        raise ValueError('Each guess must be an object')
+    guess_type = item.get('type')
+
+    if guess_type == 'date':
+        value = item.get('guess_date') or item.get('date')  # Same names as the single endpoint
+        if not isinstance(value, str):
+            raise ValueError('Date is required')
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('Date must be YYYY-MM-DD')
+        return 'date', day, {'guess_date': day}
+
+    if guess_type == 'hour':
+        hour, am_pm = item.get('hour'), item.get('am_pm')
+        if hour is None or not am_pm:
+            raise ValueError('Hour and AM/PM are required')
+        if not isinstance(hour, int) or isinstance(hour, bool) or not (1 <= hour <= 12):
+            raise ValueError('Hour must be between 1 and 12')
+        if am_pm not in ('AM', 'PM'):
+            raise ValueError('AM/PM must be either "AM" or "PM"')
+        return 'hour', (hour, am_pm), {'hour': hour, 'am_pm': am_pm}
+
+    if guess_type == 'minute':
+        minute = item.get('minute')
+        if minute is None:
+            raise ValueError('Minute is required')
+        if not isinstance(minute, int) or isinstance(minute, bool) or not (0 <= minute <= 59):
+            raise ValueError('Minute must be between 0 and 59')
+        return 'minute', minute, {'minute': minute}
+
+    if guess_type == 'name':
+        if not event.name_game_enabled:
+            raise ValueError('Name game is not enabled for this event')
+        name = item.get('name')
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError('Name is required')
+        if len(name) > 100:
+            raise ValueError('Name must be at most 100 characters')
+        return 'name', None, {'name': name}
+
+    raise ValueError('type must be one of date, hour, minute or name')
+
+
+def lock_event_slots(event_id):
+    """Make concurrent claims on an event's slots wait for each other until the transaction ends.
+
+    The unique constraints are per guest, so only this stops two guests
+    taking one slot. On SQLite the write transaction already holds the
+    writer lock (see database.configure_sqlite) and FOR UPDATE is left
+    out; elsewhere the event row lock serializes the claimers.
+    """
+    db.session.execute(select(Event.id).where(Event.id == event_id).with_for_update())
+
+
+def claimed_slots(event_id, slots):
+    """{(guess_type, slot): claimant user id} for the requested slots, one query per pool"""
+    claimed = {}
+    if slots['date']:
+        rows = db.session.query(DateGuess.guess_date, DateGuess.user_id) \
+            .filter(DateGuess.event_id == event_id, DateGuess.guess_date.in_(slots['date']))
+        claimed.update((('date', day), user_id) for day, user_id in rows)
+    if slots['hour']:
+        rows = db.session.query(HourGuess.hour, HourGuess.am_pm, HourGuess.user_id) \
+            .filter(HourGuess.event_id == event_id, HourGuess.hour.in_({hour for hour, _ in slots['hour']}))
+        claimed.update((('hour', (hour, am_pm)), user_id) for hour, am_pm, user_id in rows)
+    if slots['minute']:
+        rows = db.session.query(MinuteGuess.minute, MinuteGuess.user_id) \
+            .filter(MinuteGuess.event_id == event_id, MinuteGuess.minute.in_(slots['minute']))
+        claimed.update((('minute', minute), user_id) for minute, user_id in rows)
+    return claimed
+
+
+def place_guesses(event, user, items):
+    """Validate and add a batch of guesses for user; returns the per-item results.
+
+    Items are accepted in order: an item claiming a slot that's taken, or
+    that an earlier item of the batch already claimed, is a conflict. Slots
+    are checked with the event locked, so a guest racing for the same slot
+    gets a conflict too. The
+    accepted guesses are inserted with one statement per pool (the caller
+    commits); their results get the new ids.
+    """
+    results = []
+    parsed = []
+    slots = {'date': set(), 'hour': set(), 'minute': set()}
+    for index, item in enumerate(items):
+        try:
+            guess_type, slot, values = parse_guess(item, event)
+        except ValueError as e:
+            results.append({'index': index, 'status': 'invalid', 'error': str(e)})
+            parsed.append(None)
+            continue
+        results.append({'index': index, 'status': 'created', 'type': guess_type})
+        parsed.append((guess_type, slot, values))
+        if slot is not None:
+            slots[guess_type].add(slot)
+
+    # Nobody else can claim a slot between this check and our commit
+    lock_event_slots(event.id)
+    claimed = claimed_slots(event.id, slots)
+    claimant_ids = {user_id for user_id in claimed.values() if user_id != user.id}
+    claimants = {claimant.id: claimant for claimant in User.query.filter(User.id.in_(claimant_ids))} \
+        if claimant_ids else {}
+
+    accepted = {guess_type: [] for guess_type in GUESS_MODELS}
+    for result, guess in zip(results, parsed):
+        if guess is None:
+            continue
+        guess_type, slot, values = guess
+        if slot is not None:
+            owner_id = claimed.get((guess_type, slot))
+            if owner_id is not None:
+                result['status'] = 'conflict'
+                if owner_id == user.id:
+                    result['error'] = f'You have already guessed this {guess_type}'
+                else:
+                    result['error'] = f'This {guess_type} is already taken by {claimants[owner_id].get_display_name()}'
+                continue
+            # Later items of the batch can't claim it again
+            claimed[(guess_type, slot)] = user.id
+        accepted[guess_type].append((result, values))
+
+    for guess_type, guesses in accepted.items():
+        if guesses:
+            insert_guesses(GUESS_MODELS[guess_type], event.id, user.id, guesses)
+    if any(accepted.values()):
+        # The bulk inserts skip the ORM hooks that normally bump the version
+        bump_event_version(event.id)
+    return results
+
+
+def insert_guesses(model, event_id, user_id, guesses):
+    """Insert one pool's accepted guesses in a single statement and fill in their ids"""
+    # Bulk inserts take column names, not the per-pool synonyms
+    synonyms = model.__mapper__.synonyms
+    rows = [{'user_id': user_id, 'event_id': event_id,
+             **{synonyms[key].name if key in synonyms else key: value for key, value in values.items()}}
+            for _, values in guesses]
+    value_keys = list(guesses[0][1])
+    inserted = db.session.execute(
+        insert(model).returning(model.id, *[getattr(model, key) for key in value_keys]), rows)
+    # Rows come back in no particular order; match them up by value
+    pending = {}
+    for result, values in guesses:
+        pending.setdefault(tuple(values[key] for key in value_keys), []).append(result)
+    for guess_id, *value in inserted:
+        pending[tuple(value)].pop()['id'] = guess_id
@@ -0,0 +1,170 @@
+"""
+Bulk guest import helpers.
+
+Hosts paste a column of emails copied from a spreadsheet (tab separated),
+a CSV export, or a plain comma-separated list. These helpers turn that text
+into normalized, de-duplicated email addresses and attach them to an event
+using a constant number of queries instead of one query per email.
+"""
+
+import csv
+import io
+import re
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from models import db, User, event_guests, bump_event_version, email_key
+
+# Loose pattern used to pull addresses out of cells like "Jane <jane@x.com>"
+EMAIL_PATTERN = re.compile(r"[^\s@<>,;:\"'()\[\]]+@[^\s@<>,;:\"'()\[\]]+\.[^\s@<>,;:\"'()\[\]]+")
+
+# Header cells that are silently skipped instead of reported as invalid
+HEADER_CELLS = {'email', 'emails', 'e-mail', 'email address', 'guest email', 'guest emails'}
+
+# Keep IN lists well under SQLite's bound-parameter limit
+IN_CHUNK_SIZE = 500
+
+MAX_IMPORT_ROWS = 5000
+
+
+def normalize_email(email):
+    """Return the canonical (trimmed, lower-cased) form of an email address"""
+    if not email:
+        return None
+    return email.strip().strip('<>').strip().lower()
+
+
+def _sniff_dialect(text):
+    """Pick the delimiter for pasted text, defaulting to a comma"""
+    sample = text[:4096]
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',\t;')
+    except csv.Error:
+        return 'excel-tab' if '\t' in sample else 'excel'
+
+
+def parse_guest_rows(text):
+    """Parse CSV/TSV paste input into (emails, invalid_rows).
+
+    Every row may hold one or more addresses in any column. Rows without a
+    usable address are reported back with their 1-based line number so the
+    host can fix them.
+    """
+    emails = []
+    invalid = []
+
+    if not text or not text.strip():
+        return emails, invalid
+
+    reader = csv.reader(io.StringIO(text.strip()), _sniff_dialect(text))
+    for line_number, row in enumerate(reader, start=1):
+        cells = [cell.strip() for cell in row if cell and cell.strip()]
+        if not cells:
+            continue
+
+        # A single header cell like "Email" is not an error
+        if line_number == 1 and len(cells) == 1 and cells[0].lower() in HEADER_CELLS:
+            continue
+
+        found = []
+        for cell in cells:
+            found.extend(EMAIL_PATTERN.findall(cell))
+
+        if not found:
+            invalid.append({'row': line_number, 'value': ', '.join(cells), 'error': 'No valid email found'})
+            continue
+
+        emails.extend(found)
+
+    return emails, invalid
+
+
+def dedupe_emails(emails):
+    """Normalize emails and drop duplicates, keeping first-seen order"""
+    seen = set()
+    unique = []
+    for email in emails:
+        normalized = normalize_email(email)
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            unique.append(normalized)
+    return unique
+
+
+def _chunks(items, size=IN_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def import_guests(event, emails):
+    """Attach the given emails to an event as guests.
+
+    Existing users are resolved with one IN query per chunk, missing users
+    are bulk-inserted, and only association rows that don't exist yet are
+    inserted. The caller is responsible for committing.
+    """
+    emails = dedupe_emails(emails)
+    summary = {
+        'created': [],
+        'added': [],
+        'already_guests': [],
+        'skipped': [],
+    }
+    if not emails:
+        return summary
+
+    # Resolve existing users (case-insensitive via the indexed email_key, one query per chunk)
+    user_ids = {}
+    for chunk in _chunks(emails):
+        rows = db.session.execute(
+            select(User.id, User.email_key).where(User.email_key.in_(chunk)).order_by(User.id)
+        ).all()
+        for user_id, email in rows:
+            user_ids.setdefault(email, user_id)
+
+    # Bulk-insert users we have never seen
+    missing = [email for email in emails if email not in user_ids]
+    if missing:
+        now = datetime.utcnow()
+        result = db.session.execute(
+            insert(User).returning(User.id, User.email),
+            [{'email': email, 'email_key': email_key(email), 'is_host': False, 'created_at': now}
+             for email in missing]
+        )
+        for user_id, email in result.all():
+            user_ids[email] = user_id
+        summary['created'] = missing
+
+    # Find which of these users are already on the guest list
+    all_ids = list(user_ids.values())
+    existing_guest_ids = set()
+    for chunk in _chunks(all_ids):
+        existing_guest_ids.update(db.session.execute(
+            select(event_guests.c.user_id).where(
+                event_guests.c.event_id == event.id,
+                event_guests.c.user_id.in_(chunk)
+            )
+        ).scalars())
+
+    new_rows = []
+    for email in emails:
+        user_id = user_ids[email]
+        if user_id == event.host_id:
+            # The host never needs to be invited to their own event
+            summary['skipped'].append(email)
+        elif user_id in existing_guest_ids:
+            summary['already_guests'].append(email)
+        else:
+            new_rows.append({'event_id': event.id, 'user_id': user_id})
+            existing_guest_ids.add(user_id)
+            summary['added'].append(email)
+
+    if new_rows:
+        db.session.execute(insert(event_guests), new_rows)
+        bump_event_version(event.id)
+
+    # The guest relationship may have been loaded before the core inserts
+    db.session.expire(event, ['guests'])
+
+    return summary
@@ -0,0 +1,94 @@
+"""
+Password hashing policy.
+
+New hashes are PBKDF2-SHA256 with an iteration count calibrated so one
+verification takes about PASSWORD_HASH_TARGET_SECONDS on this machine, never
+fewer than MIN_ITERATIONS. Verification also accepts the formats older
+code wrote: werkzeug's scrypt and PBKDF2 hashes at any work factor, bcrypt
+hashes and werkzeug's pre-2.3 salted HMAC hashes (`sha256$salt$digest`).
+needs_rehash tells which stored hashes to replace at the next login.
+"""
+
+import hashlib
+import hmac
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+METHOD = 'pbkdf2:sha256'
+SALT_LENGTH = 16
+
+# Floor for any machine, however slow (OWASP's figure for PBKDF2-SHA256)
+MIN_ITERATIONS = 600000
+# Iterations timed to estimate the cost of one
+CALIBRATION_ITERATIONS = 50000
+
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+
+def measure(iterations, rounds=3):
+    """Fastest of a few PBKDF2-SHA256 runs of the given length, in seconds"""
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        hashlib.pbkdf2_hmac('sha256', b'calibration', b'0' * SALT_LENGTH, iterations)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def calibrate(target_seconds, minimum=MIN_ITERATIONS):
+    """Iterations for one verification to take about target_seconds here"""
+    per_iteration = measure(CALIBRATION_ITERATIONS) / CALIBRATION_ITERATIONS
+    iterations = int(target_seconds / per_iteration) // 10000 * 10000
+    return max(minimum, iterations)
+
+
+def pbkdf2_iterations(stored):
+    """Iteration count of a werkzeug PBKDF2-SHA256 hash (None for anything else)"""
+    method = stored.split('$', 1)[0].split(':')
+    if method[:2] != ['pbkdf2', 'sha256'] or len(method) != 3 or not method[2].isdigit():
+        return None
+    return int(method[2])
+
+
+def _verify_legacy_hmac(stored, password):
+    # werkzeug < 2.3: method$salt$hexdigest, HMAC keyed with the salt (plain digest without one)
+    parts = stored.split('$')
+    if len(parts) != 3 or parts[0] not in hashlib.algorithms_guaranteed:
+        return False
+    method, salt, digest = parts
+    if salt:
+        expected = hmac.new(salt.encode(), password.encode(), method).hexdigest()
+    else:
+        expected = hashlib.new(method, password.encode()).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+class HashingPolicy:
+    """The current scheme and work factor"""
+
+    def __init__(self, iterations):
+        self.iterations = iterations
+
+    def hash(self, password):
+        return generate_password_hash(password, f'{METHOD}:{self.iterations}', SALT_LENGTH)
+
+    def verify(self, stored, password):
+        """Check a password against a hash in any supported format"""
+        if not stored or password is None:
+            return False
+        if stored.startswith(BCRYPT_PREFIXES):
+            import bcrypt  # Installed with flask-bcrypt
+            return bcrypt.checkpw(password.encode(), stored.encode())
+        if stored.startswith(('pbkdf2:', 'scrypt:')):
+            try:
+                return check_password_hash(stored, password)
+            except ValueError:
+                return False
+        return _verify_legacy_hmac(stored, password)
+
+    def needs_rehash(self, stored):
+        """Whether a hash is in an older format or weaker than the policy"""
+        iterations = pbkdf2_iterations(stored or '')
+        return iterations is None or iterations < self.iterations
@@ -0,0 +1,175 @@
+"""
+Idempotency-Key support for mutating API routes.
+
+A client that may retry a request (guests on flaky venue Wi-Fi, hosts
+double-clicking) sends the same `Idempotency-Key` header with every attempt.
+The first attempt claims the key for its user by inserting an unfinished
+idempotency_record row, runs the view and stores the status and body.
+Later attempts get that stored response back (marked `Idempotent-Replayed`)
+without running the view again. An attempt arriving while the first is
+still running waits up to IDEMPOTENCY_WAIT_SECONDS for its outcome, then
+gets a 409. Reusing a key for a different request is a 422.
+
+Outcomes are kept for IDEMPOTENCY_TTL_SECONDS. Server errors and exceptions
+release the claim so a retry runs again, as does a first attempt that
+hasn't finished after IDEMPOTENCY_LOCK_SECONDS (its worker died).
+Requests without the header behave as before.
+"""
+
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Response, current_app, jsonify, request
+from flask_login import current_user
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+import metrics
+from models import db, IdempotencyRecord
+from tokens import current_user_id
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.05
+
+metrics.describe('idempotent_requests_total', 'Requests with an Idempotency-Key, by outcome')
+
+record = IdempotencyRecord.__table__
+
+
+def request_owner():
+    """The id of the user sending the request (token first, then session), or None"""
+    try:
+        user_id = current_user_id()
+    except RuntimeError:
+        # Session-authenticated route; no token was verified
+        user_id = None
+    if user_id is None and current_user.is_authenticated:
+        user_id = current_user.id
+    return user_id
+
+
+def request_fingerprint():
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.path.encode(), request.get_data()):
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def _prune_if_due(now):
+    # Each process deletes expired records every IDEMPOTENCY_PRUNE_SECONDS
+    state = current_app.extensions.setdefault('idempotency', {'pruned_at': None})
+    clock = time.monotonic()
+    if state['pruned_at'] is None or clock - state['pruned_at'] >= current_app.config['IDEMPOTENCY_PRUNE_SECONDS']:
+        state['pruned_at'] = clock
+        db.session.execute(delete(record).where(record.c.expires_at <= now))
+
+
+def _fetch(owner_id, key):
+    existing = db.session.execute(
+        select(record).where(record.c.owner_id == owner_id, record.c.key == key)
+    ).first()
+    # Don't hold a transaction (SQLite's writer lock) while waiting
+    db.session.rollback()
+    return existing
+
+
+def _claim(owner_id, key, fingerprint):
+    """Claim the key for this request; None if claimed, else the existing record"""
+    config = current_app.config
+    now = datetime.utcnow()
+    try:
+        _prune_if_due(now)
+        db.session.execute(insert(record).values(
+            owner_id=owner_id, key=key, fingerprint=fingerprint, created_at=now,
+            expires_at=now + timedelta(seconds=config['IDEMPOTENCY_TTL_SECONDS'])))
+        db.session.commit()
+        return None
+    except IntegrityError:
+        db.session.rollback()
+    existing = _fetch(owner_id, key)
+    if existing is None:
+        # Deleted in the meantime; try again
+        return _claim(owner_id, key, fingerprint)
+    abandoned = (existing.status_code is None and
+                 existing.created_at <= now - timedelta(seconds=config['IDEMPOTENCY_LOCK_SECONDS']))
+    if existing.expires_at <= now or abandoned:
+        # Take the key over; only one of several racing requests deletes the row
+        db.session.execute(delete(record).where(record.c.id == existing.id))
+        db.session.commit()
+        return _claim(owner_id, key, fingerprint)
+    return existing
+
+
+def _release(owner_id, key):
+    db.session.execute(delete(record).where(
+        record.c.owner_id == owner_id, record.c.key == key, record.c.status_code.is_(None)))
+    db.session.commit()
+
+
+def _store(owner_id, key, response):
+    db.session.execute(update(record).where(record.c.owner_id == owner_id, record.c.key == key).values(
+        status_code=response.status_code, content_type=response.content_type, body=response.get_data()))
+    db.session.commit()
+
+
+def _replay(existing):
+    metrics.inc('idempotent_requests_total', outcome='replayed')
+    response = Response(existing.body, status=existing.status_code, content_type=existing.content_type)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Replay the stored outcome of a request retried with the same Idempotency-Key"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        owner_id = request_owner() if key else None
+        if not key or owner_id is None:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        fingerprint = request_fingerprint()
+        # The claim commits on its own, without whatever loading the user began
+        db.session.rollback()
+        existing = _claim(owner_id, key, fingerprint)
+        deadline = time.monotonic() + current_app.config['IDEMPOTENCY_WAIT_SECONDS']
+        # A duplicate of a request still running waits for its outcome
+        while existing is not None and existing.status_code is None and existing.fingerprint == fingerprint:
+            if time.monotonic() >= deadline:
+                metrics.inc('idempotent_requests_total', outcome='in_progress')
+                response = jsonify({'error': 'A request with this Idempotency-Key is still being processed'})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            time.sleep(POLL_SECONDS)
+            existing = _fetch(owner_id, key)
+            if existing is None:
+                # The first attempt failed and released the key
+                existing = _claim(owner_id, key, fingerprint)
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                metrics.inc('idempotent_requests_total', outcome='mismatch')
+                return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+            return _replay(existing)
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except BaseException:
+            db.session.rollback()
+            _release(owner_id, key)
+            raise
+        # Whatever the view didn't commit would be discarded at teardown anyway
+        db.session.rollback()
+        if (response.status_code >= 500 or response.is_streamed or
+                response.calculate_content_length() > current_app.config['IDEMPOTENCY_MAX_BODY_BYTES']):
+            _release(owner_id, key)
+        else:
+            _store(owner_id, key, response)
+        metrics.inc('idempotent_requests_total', outcome='executed')
+        return response
+    return wrapper
@@ -3,18 +3,18 @@ Database initialization script.
 Run this script to create all database tables.
 """
 
-from app import app, db
-from models import User, Event, DateGuess, HourGuess, MinuteGuess, NameGuess, Payment
+from app import create_app, init_schema
+from models import db, User, Event, DateGuess, HourGuess, MinuteGuess, NameGuess, Payment
 from werkzeug.security import generate_password_hash
 
 def init_db():
     """Create all database tables and add a test user."""
     print("Creating database tables...")
+    app = create_app()
+    init_schema(app)
+    print("Tables created successfully!")
+
     with app.app_context():
-        # Create all tables
-        db.create_all()
-        print("Tables created successfully!")
-        
         # Check if test user exists
         test_user = User.query.filter_by(email='test@example.com').first()
         
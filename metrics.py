@@ -0,0 +1,83 @@
+"""
+In-process metrics with a Prometheus text exposition.
+
+Counters, gauges and summaries (a count and a sum) are keyed by name and labels and live in this process
+only; each server worker reports its own values.
+"""
+
+import threading
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_summaries = {}
+_help = {}
+
+
+def describe(name, help_text, metric_type='counter'):
+    _help[name] = (help_text, metric_type)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, amount, **labels):
+    """Add one observation (e.g. a duration) to a summary"""
+    key = _key(name, labels)
+    with _lock:
+        count, total = _summaries.get(key, (0, 0))
+        _summaries[key] = (count + 1, total + amount)
+
+
+def summary(name, **labels):
+    """(count, sum) of a summary"""
+    with _lock:
+        return _summaries.get(_key(name, labels), (0, 0))
+
+
+def value(name, **labels):
+    """Current value of a counter or gauge (0 if never recorded)"""
+    key = _key(name, labels)
+    with _lock:
+        return _counters.get(key, _gauges.get(key, 0))
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _summaries.clear()
+
+
+def render():
+    """All metrics in the Prometheus text format"""
+    with _lock:
+        samples = [(key, '', sample) for key, sample in list(_counters.items()) + list(_gauges.items())]
+        for key, (count, total) in _summaries.items():
+            samples += [(key, '_count', count), (key, '_sum', total)]
+    samples.sort()
+
+    lines = []
+    described = set()
+    for (name, labels), suffix, sample in samples:
+        if name not in described and name in _help:
+            help_text, metric_type = _help[name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            described.add(name)
+        label_text = ','.join(f'{label}="{label_value}"' for label, label_value in labels)
+        series = name + suffix
+        lines.append(f'{series}{{{label_text}}} {sample}' if label_text else f'{series} {sample}')
+    return '\n'.join(lines) + '\n'
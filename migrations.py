@@ -0,0 +1,176 @@
+"""
+Lightweight schema upgrades for existing databases.
+
+``db.create_all()`` only creates missing tables, so indexes and columns
+added to tables that already exist are applied here. Every step is
+idempotent and safe to run on each start.
+"""
+
+import logging
+
+from sqlalchemy import and_, bindparam, inspect, or_, select, text
+
+from config import Config
+from models import db, User, identity_keys
+
+# Per-pool tables copied into the unified guess table, with the typed value
+# columns each one fills (value_date, value_int, value_text, am_pm)
+LEGACY_GUESS_TABLES = (
+    ('date', 'date_guess', 'guess_date, NULL, NULL, NULL'),
+    ('hour', 'hour_guess', 'NULL, hour, NULL, am_pm'),
+    ('minute', 'minute_guess', 'NULL, minute, NULL, NULL'),
+    ('name', 'name_guess', 'NULL, NULL, name, NULL'),
+)
+
+# Rows per batch when backfilling computed columns
+BACKFILL_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def create_missing_indexes(engine):
+    """Create indexes declared on the models that the database lacks"""
+    inspector = inspect(engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+    return created
+
+
+def add_missing_columns(engine):
+    """Add nullable or server-defaulted columns the database lacks"""
+    inspector = inspect(engine)
+    added = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable and column.server_default is not None:
+                ddl += " NOT NULL"
+            with engine.begin() as connection:
+                connection.execute(text(ddl))
+            added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def key_event_guests(engine):
+    """Rebuild an event_guests table created without its primary key.
+
+    Older databases have a bare (event_id, user_id) table that can hold
+    duplicates. The rows are copied, de-duplicated, into a table created
+    from the model and the old table is dropped. Returns the rows kept.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table('event_guests'):
+        return 0
+    if inspector.get_pk_constraint('event_guests').get('constrained_columns'):
+        return 0
+
+    table = db.metadata.tables['event_guests']
+    with engine.begin() as connection:
+        connection.execute(text('ALTER TABLE event_guests RENAME TO event_guests_unkeyed'))
+        table.create(bind=connection)
+        kept = connection.execute(text(
+            'INSERT INTO event_guests (event_id, user_id) '
+            'SELECT DISTINCT event_id, user_id FROM event_guests_unkeyed '
+            'WHERE event_id IS NOT NULL AND user_id IS NOT NULL'
+        )).rowcount
+        connection.execute(text('DROP TABLE event_guests_unkeyed'))
+    return kept
+
+
+def backfill_identity_keys(engine):
+    """Fill the User *_key lookup columns for users saved before they existed.
+
+    Walks the users missing a key for a field they have, in id order and in
+    batches. Returns the number of users updated.
+    """
+    table = User.__table__
+    sources = ('email', 'phone', 'nickname', 'first_name', 'last_name')
+    missing = or_(*[and_(table.c[field].isnot(None), table.c[f'{field}_key'].is_(None)) for field in sources])
+    update = table.update().where(table.c.id == bindparam('user_id')) \
+        .values({f'{field}_key': bindparam(f'{field}_key') for field in sources})
+
+    updated = 0
+    last_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(table.c.id, *[table.c[field] for field in sources])
+                .where(missing, table.c.id > last_id).order_by(table.c.id).limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                return updated
+            connection.execute(update, [{'user_id': row.id, **identity_keys(*row[1:])} for row in rows])
+        updated += len(rows)
+        last_id = rows[-1].id
+
+
+def migrate_legacy_guesses(engine):
+    """Copy the per-pool guess tables into the unified guess table.
+
+    Runs only with GUESS_STORAGE='unified' and while the unified table is
+    empty. Ids are shifted per pool so they stay unique and settled
+    PoolWinner rows are pointed at the new ids. The old tables are then
+    renamed with a _legacy suffix, which marks the copy as done: it never
+    runs again, even once every guess has been deleted.
+    """
+    if Config.GUESS_STORAGE != 'unified':
+        return 0
+    inspector = inspect(engine)
+    legacy = [entry for entry in LEGACY_GUESS_TABLES if inspector.has_table(entry[1])]
+    if not legacy:
+        return 0
+    
+    copied = 0
+    with engine.begin() as connection:
+        if connection.execute(text('SELECT COUNT(*) FROM guess')).scalar():
+            return 0
+        offset = 0
+        for guess_type, table, values in legacy:
+            copied += connection.execute(text(
+                f'INSERT INTO guess (id, user_id, event_id, guess_type, value_date, value_int, value_text, am_pm, created_at) '
+                f'SELECT id + :offset, user_id, event_id, :guess_type, {values}, created_at FROM {table}'
+            ), {'offset': offset, 'guess_type': guess_type}).rowcount
+            connection.execute(text(
+                'UPDATE pool_winner SET guess_id = guess_id + :offset WHERE pool = :pool AND guess_id IS NOT NULL'
+            ), {'offset': offset, 'pool': guess_type})
+            offset += connection.execute(text(f'SELECT COALESCE(MAX(id), 0) FROM {table}')).scalar()
+            connection.execute(text(f'ALTER TABLE {table} RENAME TO {table}_legacy'))
+        if engine.dialect.name == 'postgresql':
+            # Explicit ids do not advance the sequence
+            connection.execute(text("SELECT setval(pg_get_serial_sequence('guess', 'id'), GREATEST(MAX(id), 1)) FROM guess"))
+    return copied
+
+
+def upgrade_schema(engine=None):
+    """Bring an existing database up to date with the models"""
+    engine = engine or db.engine
+    added = add_missing_columns(engine)
+    if added:
+        logger.info(f"Added columns: {', '.join(added)}")
+    kept = key_event_guests(engine)
+    if kept:
+        logger.info(f"Rebuilt event_guests with a primary key ({kept} rows)")
+    created = create_missing_indexes(engine)
+    if created:
+        logger.info(f"Created indexes: {', '.join(created)}")
+    backfilled = backfill_identity_keys(engine)
+    if backfilled:
+        logger.info(f"Backfilled lookup keys for {backfilled} users")
+    copied = migrate_legacy_guesses(engine)
+    if copied:
+        logger.info(f"Copied {copied} guesses into the unified guess table")
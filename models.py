@@ -1,14 +1,23 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import and_, case, delete, event as sa_event, func, inspect, insert, literal, or_, select, union_all
 from datetime import datetime
 import random
+import re
 
-db = SQLAlchemy()
+from config import Config
+from database import RoutingSession
 
-# Association tables for many-to-many relationships
+# Reads can be routed to replicas (see database.read_replica)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Association tables for many-to-many relationships; keyed by (event, user)
+# so membership checks are index lookups and a guest can't be added twice
 event_guests = db.Table('event_guests',
-    db.Column('event_id', db.Integer, db.ForeignKey('event.id')),
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id'))
+    db.Column('event_id', db.Integer, db.ForeignKey('event.id'), primary_key=True),
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    # "Events I'm a guest of"
+    db.Index('ix_event_guests_user_id', 'user_id'),
 )
 
 class User(db.Model, UserMixin):
@@ -28,6 +37,22 @@ class User(db.Model, UserMixin):
     venmo_phone_last4 = db.Column(db.String(4), nullable=True)
     venmo_qr_path = db.Column(db.String(255), nullable=True)
     
+    # Normalized copies of the identifying fields for indexed lookups when
+    # guests sign in; kept in step by set_identity_keys (see identity_keys)
+    email_key = db.Column(db.String(120), nullable=True)
+    phone_key = db.Column(db.String(20), nullable=True)
+    nickname_key = db.Column(db.String(50), nullable=True)
+    first_name_key = db.Column(db.String(50), nullable=True)
+    last_name_key = db.Column(db.String(50), nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_user_email_key', 'email_key'),
+        db.Index('ix_user_phone_key', 'phone_key'),
+        db.Index('ix_user_nickname_key', 'nickname_key'),
+        # Also serves first-name-only lookups
+        db.Index('ix_user_name_key', 'first_name_key', 'last_name_key'),
+    )
+    
     # Relationships
     hosted_events = db.relationship('Event', backref='host', lazy=True)
     date_guesses = db.relationship('DateGuess', backref='user', lazy=True)
@@ -45,11 +70,38 @@ class User(db.Model, UserMixin):
         return self.email or "Anonymous"
     
     def get_display_name(self):
-        if self.nickname:
-            return self.nickname
-        if self.first_name:
-            return f"{self.first_name} {self.last_name[0]}." if self.last_name else self.first_name
-        return self.email or "Anonymous"
+        return User.format_display_name(self.nickname, self.first_name, self.last_name, self.email)
+    
+    @staticmethod
+    def format_display_name(nickname, first_name, last_name, email):
+        # Shared with code that reads plain rows instead of User objects
+        if nickname:
+            return nickname
+        if first_name:
+            return f"{first_name} {last_name[0]}." if last_name else first_name
+        return email or "Anonymous"
+
+def email_key(email):
+    """Trimmed, lower-cased email (None when empty)"""
+    return (email.strip().lower() or None) if email else None
+
+def phone_key(phone):
+    """Digits of a phone number (None when there are none)"""
+    return (re.sub(r'\D', '', phone) or None) if phone else None
+
+def name_key(name):
+    """Case-folded name with whitespace collapsed (None when empty)"""
+    return (' '.join(name.split()).casefold() or None) if name else None
+
+def identity_keys(email=None, phone=None, nickname=None, first_name=None, last_name=None):
+    """Values of the User *_key columns for the given fields"""
+    return {
+        'email_key': email_key(email),
+        'phone_key': phone_key(phone),
+        'nickname_key': name_key(nickname),
+        'first_name_key': name_key(first_name),
+        'last_name_key': name_key(last_name),
+    }
 
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -70,9 +122,12 @@ class Event(db.Model):
     theme = db.Column(db.String(50), default='default')
     theme_mode = db.Column(db.String(10), default='light')  # 'light' or 'dark'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every change to the event or its board; used as a cache key
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
-    # Relationship with guests (many-to-many)
-    guests = db.relationship('User', secondary=event_guests, lazy='subquery',
+    # Relationship with guests (many-to-many), loaded only when accessed; use
+    # is_event_guest / add_event_guest instead of touching the whole list
+    guests = db.relationship('User', secondary=event_guests, lazy=True,
                             backref=db.backref('events', lazy=True))
     
     # One-to-many relationships
@@ -94,63 +149,355 @@ class Event(db.Model):
             if not Event.query.filter_by(event_code=code).first():
                 return code
 
-class DateGuess(db.Model):
+# Guesses live in one table per pool unless GUESS_STORAGE is 'unified'
+if Config.GUESS_STORAGE == 'unified':
+    class Guess(db.Model):
+        """Every guess of every pool in one table, told apart by guess_type"""
+        id = db.Column(db.Integer, primary_key=True)
+        user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+        event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+        guess_type = db.Column(db.String(10), nullable=False)  # 'date', 'hour', 'minute' or 'name'
+        # Typed value: dates in value_date, hours and minutes in value_int, names in value_text
+        value_date = db.Column(db.Date, nullable=True)
+        value_int = db.Column(db.Integer, nullable=True)
+        value_text = db.Column(db.String(100), nullable=True)
+        am_pm = db.Column(db.String(2), nullable=True)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+        
+        __mapper_args__ = {'polymorphic_on': guess_type}
+        
+        # Partial unique indexes keep the per-pool constraints of the separate tables
+        __table_args__ = (
+            db.Index('uq_guess_date', 'user_id', 'event_id', 'value_date', unique=True,
+                     sqlite_where=db.text("guess_type = 'date'"), postgresql_where=db.text("guess_type = 'date'")),
+            db.Index('uq_guess_hour', 'user_id', 'event_id', 'value_int', 'am_pm', unique=True,
+                     sqlite_where=db.text("guess_type = 'hour'"), postgresql_where=db.text("guess_type = 'hour'")),
+            db.Index('uq_guess_minute', 'user_id', 'event_id', 'value_int', unique=True,
+                     sqlite_where=db.text("guess_type = 'minute'"), postgresql_where=db.text("guess_type = 'minute'")),
+            # Board lookups and settlement, then per-user aggregates
+            db.Index('ix_guess_event_type_date', 'event_id', 'guess_type', 'value_date'),
+            db.Index('ix_guess_event_type_int', 'event_id', 'guess_type', 'am_pm', 'value_int'),
+            db.Index('ix_guess_event_user', 'event_id', 'user_id'),
+        )
+    
+    # The per-pool classes stay as views over the unified table
+    class DateGuess(Guess):
+        __mapper_args__ = {'polymorphic_identity': 'date'}
+        guess_date = db.synonym('value_date')
+        
+        def __repr__(self):
+            return f'<DateGuess {self.guess_date}>'
+    
+    class HourGuess(Guess):
+        __mapper_args__ = {'polymorphic_identity': 'hour'}
+        hour = db.synonym('value_int')
+        
+        def __repr__(self):
+            return f'<HourGuess {self.hour} {self.am_pm}>'
+    
+    class MinuteGuess(Guess):
+        __mapper_args__ = {'polymorphic_identity': 'minute'}
+        minute = db.synonym('value_int')
+        
+        def __repr__(self):
+            return f'<MinuteGuess {self.minute}>'
+    
+    class NameGuess(Guess):
+        __mapper_args__ = {'polymorphic_identity': 'name'}
+        name = db.synonym('value_text')
+        
+        def __repr__(self):
+            return f'<NameGuess {self.name}>'
+
+else:
+    class DateGuess(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+        event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+        guess_date = db.Column(db.Date, nullable=False)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+        # Ensure unique constraint for user+event+date combination
+        __table_args__ = (
+            db.UniqueConstraint('user_id', 'event_id', 'guess_date', name='unique_date_guess'),
+            # Nearest-date lookups when settling the pool
+            db.Index('ix_date_guess_event_date', 'event_id', 'guess_date'),
+        )
+    
+        def __repr__(self):
+            return f'<DateGuess {self.guess_date}>'
+
+    class HourGuess(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+        event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+        hour = db.Column(db.Integer, nullable=False)  # 0-23
+        am_pm = db.Column(db.String(2), nullable=False)  # 'AM' or 'PM'
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+        # Ensure unique constraint for user+event+hour combination
+        __table_args__ = (
+            db.UniqueConstraint('user_id', 'event_id', 'hour', 'am_pm', name='unique_hour_guess'),
+            db.Index('ix_hour_guess_event_hour', 'event_id', 'am_pm', 'hour'),
+        )
+    
+        def __repr__(self):
+            return f'<HourGuess {self.hour} {self.am_pm}>'
+
+    class MinuteGuess(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+        event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+        minute = db.Column(db.Integer, nullable=False)  # 0-59
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+        # Ensure unique constraint for user+event+minute combination
+        __table_args__ = (
+            db.UniqueConstraint('user_id', 'event_id', 'minute', name='unique_minute_guess'),
+            db.Index('ix_minute_guess_event_minute', 'event_id', 'minute'),
+        )
+    
+        def __repr__(self):
+            return f'<MinuteGuess {self.minute}>'
+
+    class NameGuess(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+        event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+        name = db.Column(db.String(100), nullable=False)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+        __table_args__ = (db.Index('ix_name_guess_event', 'event_id'),)
+    
+        def __repr__(self):
+            return f'<NameGuess {self.name}>'
+
+GUESS_MODELS = {
+    'date': DateGuess,
+    'hour': HourGuess,
+    'minute': MinuteGuess,
+    'name': NameGuess,
+}
+
+class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
-    guess_date = db.Column(db.Date, nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # 'pending', 'paid'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Ensure unique constraint for user+event+date combination
-    __table_args__ = (db.UniqueConstraint('user_id', 'event_id', 'guess_date', name='unique_date_guess'),)
-    
     def __repr__(self):
-        return f'<DateGuess {self.guess_date}>'
+        return f'<Payment {self.amount}>'
 
-class HourGuess(db.Model):
+class EventOutcome(db.Model):
+    """The actual birth details recorded by the host, used to settle the pools"""
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
-    hour = db.Column(db.Integer, nullable=False)  # 0-23
-    am_pm = db.Column(db.String(2), nullable=False)  # 'AM' or 'PM'
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), unique=True, nullable=False)
+    birth_datetime = db.Column(db.DateTime, nullable=False)
+    tie_rule = db.Column(db.String(20), nullable=False, default='split')
+    settled_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Ensure unique constraint for user+event+hour combination
-    __table_args__ = (db.UniqueConstraint('user_id', 'event_id', 'hour', 'am_pm', name='unique_hour_guess'),)
+    event = db.relationship('Event', backref=db.backref('outcome', uselist=False, cascade="all, delete-orphan"))
     
     def __repr__(self):
-        return f'<HourGuess {self.hour} {self.am_pm}>'
+        return f'<EventOutcome {self.event_id} {self.birth_datetime}>'
 
-class MinuteGuess(db.Model):
+class PoolWinner(db.Model):
+    """One winning guess of a settled pool ('date', 'hour', 'minute', 'name' or 'jackpot')"""
     id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False, index=True)
+    pool = db.Column(db.String(10), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
-    minute = db.Column(db.Integer, nullable=False)  # 0-59
+    guess_id = db.Column(db.Integer, nullable=True)  # Not set for jackpot rows
+    distance = db.Column(db.Integer, nullable=True)  # Days, hours or minutes away from the actual birth
+    share = db.Column(db.Float, nullable=False, default=1.0)
+    payout = db.Column(db.Float, nullable=False, default=0.0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Ensure unique constraint for user+event+minute combination
-    __table_args__ = (db.UniqueConstraint('user_id', 'event_id', 'minute', name='unique_minute_guess'),)
+    user = db.relationship('User')
     
     def __repr__(self):
-        return f'<MinuteGuess {self.minute}>'
+        return f'<PoolWinner {self.pool} {self.user_id}>'
 
-class NameGuess(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
-    name = db.Column(db.String(100), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+class RevokedToken(db.Model):
+    """A JWT revoked before its expiry, by token id (kept until it expires)"""
+    id = db.Column(db.Integer, primary_key=True)  # Sync high-water mark for revocation.py
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<NameGuess {self.name}>'
+        return f'<RevokedToken {self.jti}>'
 
-class Payment(db.Model):
+class IdempotencyRecord(db.Model):
+    """The outcome of a mutating request, replayed when its Idempotency-Key is retried"""
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), default='pending')  # 'pending', 'paid'
+    owner_id = db.Column(db.Integer, nullable=False)  # The user who sent the key
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 of method, path and body
+    status_code = db.Column(db.Integer, nullable=True)  # None while the first request runs
+    content_type = db.Column(db.String(100), nullable=True)
+    body = db.Column(db.LargeBinary, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    __table_args__ = (db.UniqueConstraint('owner_id', 'key', name='uq_idempotency_owner_key'),)
     
     def __repr__(self):
-        return f'<Payment {self.amount}>'
+        return f'<IdempotencyRecord {self.owner_id} {self.key}>'
+
+def bump_event_version(event_id, connection=None):
+    """Increment an event's version so caches keyed on it are refreshed"""
+    table = Event.__table__
+    statement = table.update().where(table.c.id == event_id).values(version=table.c.version + 1)
+    if connection is not None:
+        connection.execute(statement)
+    else:
+        db.session.execute(statement)
+
+def _bump_version_for_child(mapper, connection, target):
+    bump_event_version(target.event_id, connection)
+
+# Any guess or payment written through the ORM changes the event's board
+for _model in (DateGuess, HourGuess, MinuteGuess, NameGuess, Payment):
+    for _hook in ('after_insert', 'after_update', 'after_delete'):
+        sa_event.listen(_model, _hook, _bump_version_for_child)
+
+@sa_event.listens_for(User, 'before_insert')
+@sa_event.listens_for(User, 'before_update')
+def set_identity_keys(mapper, connection, target):
+    for column, value in identity_keys(target.email, target.phone, target.nickname,
+                                       target.first_name, target.last_name).items():
+        setattr(target, column, value)
+
+# Boards show each claimant's name, and event summaries the host's
+DISPLAY_NAME_FIELDS = ('nickname', 'first_name', 'last_name', 'email')
+
+@sa_event.listens_for(User, 'after_update')
+def _bump_versions_for_renamed_user(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[field].history.has_changes() for field in DISPLAY_NAME_FIELDS):
+        return
+    table = Event.__table__
+    guest_of = select(event_guests.c.event_id).where(event_guests.c.user_id == target.id)
+    connection.execute(table.update()
+                       .where(or_(table.c.host_id == target.id, table.c.id.in_(guest_of)))
+                       .values(version=table.c.version + 1))
+
+@sa_event.listens_for(Event, 'before_update')
+def _bump_version_for_event(mapper, connection, target):
+    target.version = (target.version or 0) + 1
+
+def is_event_guest(event_id, user_id):
+    """Whether a user is on an event's guest list (a single EXISTS query)"""
+    return db.session.execute(
+        select(select(event_guests.c.user_id)
+               .where(event_guests.c.event_id == event_id, event_guests.c.user_id == user_id).exists())
+    ).scalar()
+
+def is_event_member(event, user_id):
+    """Whether a user hosts or is a guest of an event"""
+    return user_id == event.host_id or is_event_guest(event.id, user_id)
+
+def add_event_guest(event_id, user_id):
+    """Put a user on an event's guest list unless already there.
+
+    One INSERT ... SELECT ... WHERE NOT EXISTS; returns whether a row was
+    added. The caller commits.
+    """
+    already = select(event_guests.c.user_id) \
+        .where(event_guests.c.event_id == event_id, event_guests.c.user_id == user_id).exists()
+    added = db.session.execute(
+        insert(event_guests).from_select(
+            ['event_id', 'user_id'],
+            select(literal(event_id), literal(user_id)).where(~already)
+        )
+    ).rowcount > 0
+    if added:
+        bump_event_version(event_id)
+    return added
+
+def remove_event_guest(event_id, user_id):
+    """Take a user off an event's guest list; returns whether they were on it"""
+    removed = db.session.execute(
+        delete(event_guests).where(event_guests.c.event_id == event_id, event_guests.c.user_id == user_id)
+    ).rowcount > 0
+    if removed:
+        bump_event_version(event_id)
+    return removed
+
+def identify_guest(event_id, email=None, phone=None, nickname=None, first_name=None, last_name=None):
+    """Find a returning guest in one indexed query.
+
+    Tries, in order: the email, the phone number, a nickname among the
+    event's guests, then a first and last name among the event's guests.
+    Returns (user, ambiguous); ambiguous is True when the best match is a
+    nickname that more than one of the event's guests use.
+    """
+    keys = identity_keys(email, phone, nickname, first_name, last_name)
+    is_guest = select(event_guests.c.user_id) \
+        .where(event_guests.c.event_id == event_id, event_guests.c.user_id == User.id).exists()
+    matches = []  # (kind, condition), best first
+    if keys['email_key']:
+        matches.append(('email', User.email_key == keys['email_key']))
+    if keys['phone_key']:
+        matches.append(('phone', User.phone_key == keys['phone_key']))
+    if keys['nickname_key']:
+        matches.append(('nickname', and_(User.nickname_key == keys['nickname_key'], is_guest)))
+    if keys['first_name_key'] and keys['last_name_key']:
+        matches.append(('name', and_(User.first_name_key == keys['first_name_key'],
+                                     User.last_name_key == keys['last_name_key'], is_guest)))
+    if not matches:
+        return None, False
+
+    # The two best candidates are enough to tell a unique nickname from a shared one
+    rank = case(*[(condition, position) for position, (kind, condition) in enumerate(matches)])
+    rows = db.session.execute(
+        select(User, rank).where(or_(*[condition for kind, condition in matches]))
+        .order_by(rank, User.id).limit(2)
+    ).all()
+    if not rows:
+        return None, False
+    user, best = rows[0]
+    ambiguous = matches[best][0] == 'nickname' and len(rows) == 2 and rows[1][1] == best
+    return user, ambiguous
+
+def event_guest_query(event_id):
+    """Query of the users on an event's guest list"""
+    return User.query.join(event_guests, event_guests.c.user_id == User.id) \
+        .filter(event_guests.c.event_id == event_id)
+
+def guess_rows():
+    """Every guess as one selectable with id, user_id, event_id and guess_type columns"""
+    if Config.GUESS_STORAGE == 'unified':
+        return Guess.__table__
+    return union_all(*[
+        select(model.id, model.user_id, model.event_id, literal(guess_type).label('guess_type'))
+        for guess_type, model in GUESS_MODELS.items()
+    ]).subquery('guesses')
+
+def count_guesses(event_id, user_ids=None):
+    """Guesses per user and pool for an event in one grouped query.
+
+    Returns {user_id: {guess_type: count}}; users without guesses are absent.
+    """
+    rows = guess_rows()
+    query = select(rows.c.user_id, rows.c.guess_type, func.count(rows.c.id)) \
+        .where(rows.c.event_id == event_id) \
+        .group_by(rows.c.user_id, rows.c.guess_type)
+    if user_ids is not None:
+        query = query.where(rows.c.user_id.in_(user_ids))
+    
+    counts = {}
+    for user_id, guess_type, count in db.session.execute(query):
+        counts.setdefault(user_id, {})[guess_type] = count
+    return counts
+
+def has_guesses(event_id, user_id):
+    """Whether a user has made any guess for an event (a single EXISTS query)"""
+    rows = guess_rows()
+    return db.session.execute(
+        select(select(rows.c.id).where(rows.c.event_id == event_id, rows.c.user_id == user_id).exists())
+    ).scalar()
@@ -0,0 +1,155 @@
+"""
+OpenID Connect helpers for Google sign-in.
+
+The discovery document and the signing keys (JWKS) are cached for as long
+as the provider's Cache-Control/Expires headers allow, so a login normally
+makes no discovery request at all. Outbound calls share one pooled
+requests.Session per process, which keeps connections to Google alive, and
+every call has a timeout. An ID token from the token endpoint can be
+verified locally against the cached keys, which makes the userinfo call
+unnecessary.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import jwt
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TTL = 3600  # Seconds to cache a document that sends no caching headers
+MAX_TTL = 24 * 3600
+HTTP_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+POOL_SIZE = 10
+CLOCK_SKEW = 60  # Seconds of leeway when checking token times
+
+# Google's ID tokens use either form of the issuer
+GOOGLE_ISSUERS = ['https://accounts.google.com', 'accounts.google.com']
+
+
+class UnknownSigningKey(jwt.InvalidTokenError):
+    """The token was signed with a key missing from the cached key set.
+
+    Still raised after the keys are refetched, so callers reject it like
+    any other bad token.
+    """
+
+
+def cache_ttl(headers, default=DEFAULT_TTL):
+    """Seconds a response may be reused, from its Cache-Control, Age and Expires headers"""
+    cache_control = [directive.strip().lower() for directive in headers.get('Cache-Control', '').split(',')]
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    for directive in cache_control:
+        if directive.startswith('max-age='):
+            try:
+                max_age = int(directive.split('=', 1)[1])
+            except ValueError:
+                break
+            age = int(headers.get('Age', 0) or 0)
+            return min(MAX_TTL, max(0, max_age - age))
+    if headers.get('Expires'):
+        try:
+            expires = parsedate_to_datetime(headers['Expires'])
+            date = parsedate_to_datetime(headers['Date']) if headers.get('Date') else None
+        except (TypeError, ValueError):
+            return 0
+        if date is None:
+            return min(MAX_TTL, max(0, int(expires.timestamp() - time.time())))
+        return min(MAX_TTL, max(0, int((expires - date).total_seconds())))
+    return default
+
+
+class DocumentCache:
+    """JSON documents by URL, each kept until its HTTP freshness runs out"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            entry = self._documents.get(url)
+        if entry and entry[1] > self.clock():
+            return entry[0]
+        return None
+
+    def put(self, url, document, headers):
+        ttl = cache_ttl(headers)
+        if ttl > 0:
+            with self._lock:
+                self._documents[url] = (document, self.clock() + ttl)
+        return document
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+
+documents = DocumentCache()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def http_session():
+    """The process's pooled HTTP session for calls to the identity provider"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def reset_http_session():
+    """Drop the shared session (its pooled connections must not cross a fork)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def fetch_json(url, refresh=False):
+    """A JSON document, from the cache when it is still fresh"""
+    document = None if refresh else documents.get(url)
+    if document is None:
+        response = http_session().get(url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        document = documents.put(url, response.json(), response.headers)
+    return document
+
+
+def verify_id_token(id_token, client_id, jwks, issuers=GOOGLE_ISSUERS):
+    """Claims of an ID token after checking its signature, audience, issuer and expiry"""
+    kid = jwt.get_unverified_header(id_token).get('kid')
+    key = next((key for key in jwks.get('keys', []) if key.get('kid') == kid), None)
+    if key is None:
+        raise UnknownSigningKey(kid)
+    return jwt.decode(id_token, jwt.PyJWK(key).key, algorithms=['RS256'], audience=client_id,
+                      issuer=issuers, leeway=CLOCK_SKEW)
+
+
+def issuers(provider_cfg):
+    return ([provider_cfg['issuer']] if provider_cfg.get('issuer') else []) + GOOGLE_ISSUERS
+
+
+def verified_claims(id_token, client_id, provider_cfg):
+    """verify_id_token against the cached keys, refetching them once after a key rotation"""
+    try:
+        return verify_id_token(id_token, client_id, fetch_json(provider_cfg['jwks_uri']), issuers(provider_cfg))
+    except UnknownSigningKey:
+        jwks = fetch_json(provider_cfg['jwks_uri'], refresh=True)
+        return verify_id_token(id_token, client_id, jwks, issuers(provider_cfg))
+
+
+def profile_claims(claims):
+    """The claims if they can stand in for a userinfo response, else None"""
+    # The token only carries the profile fields when the profile scope was granted
+    return claims if 'email' in claims and 'given_name' in claims else None
@@ -0,0 +1,165 @@
+"""
+Password hashing on a bounded worker pool, and the login rate limits.
+
+Hashing and verifying passwords is deliberately slow, so it runs on a small
+thread pool (the hash functions release the GIL) sized to the CPUs instead
+of on the request threads. At most PASSWORD_HASH_QUEUE jobs wait for it.
+Beyond that, callers get HasherBusy (a 503) at once instead of joining an
+ever longer queue. Logins pass per-IP and per-email token buckets before
+any hashing, so bursts of guesses are turned away cheaply.
+"""
+
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+import metrics
+from hashing import HashingPolicy, calibrate
+from ratelimit import TokenBucketLimiter
+
+logger = logging.getLogger(__name__)
+
+metrics.describe('password_hash_jobs_total', 'Password hash and verify jobs run on the pool')
+metrics.describe('password_hash_rejections_total', 'Password jobs turned away, by reason')
+metrics.describe('password_hash_queue_depth', 'Password jobs queued or running', 'gauge')
+metrics.describe('login_rejections_total', 'Logins rejected, by reason')
+metrics.describe('login_duration_seconds', 'Host login latency, by outcome', 'summary')
+
+
+class HasherBusy(Exception):
+    """Too many password jobs are already waiting"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class HashPool:
+    """Thread pool for password work with a bounded backlog"""
+
+    def __init__(self, workers, max_queue, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._depth = 0
+        self._lock = threading.Lock()
+
+    def _track(self, change):
+        with self._lock:
+            self._depth += change
+            metrics.set_gauge('password_hash_queue_depth', self._depth)
+
+    def run(self, function, *args):
+        """Run function on the pool and wait for its result"""
+        if not self._slots.acquire(blocking=False):
+            metrics.inc('password_hash_rejections_total', reason='queue_full')
+            raise HasherBusy('Password hashing is at capacity')
+        self._track(1)
+        metrics.inc('password_hash_jobs_total')
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            metrics.inc('password_hash_rejections_total', reason='timeout')
+            raise HasherBusy('Password hashing timed out')
+
+    def _release(self):
+        self._track(-1)
+        self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def hash_pool(app=None):
+    """The app's password pool, created on first use in each process"""
+    app = app or current_app
+    pool = app.extensions.get('password_pool')
+    if pool is None or pool[0] != os.getpid():
+        workers = app.config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1
+        pool = (os.getpid(), HashPool(workers, app.config['PASSWORD_HASH_QUEUE'], app.config['PASSWORD_HASH_TIMEOUT']))
+        app.extensions['password_pool'] = pool
+    return pool[1]
+
+
+def hashing_policy(app=None):
+    """The app's hashing policy, calibrated on first use unless PASSWORD_HASH_ITERATIONS is set"""
+    app = app or current_app
+    policy = app.extensions.get('hashing_policy')
+    if policy is None:
+        iterations = app.config.get('PASSWORD_HASH_ITERATIONS')
+        if not iterations:
+            iterations = calibrate(app.config['PASSWORD_HASH_TARGET_SECONDS'],
+                                   app.config['PASSWORD_HASH_MIN_ITERATIONS'])
+            logger.info(f"Calibrated password hashing to {iterations} PBKDF2 iterations")
+        policy = app.extensions.setdefault('hashing_policy', HashingPolicy(iterations))
+    return policy
+
+
+def hash_password(password):
+    return hash_pool().run(hashing_policy().hash, password)
+
+
+def verify_password(password_hash, password):
+    return hash_pool().run(hashing_policy().verify, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    return hashing_policy().needs_rehash(password_hash)
+
+
+def login_limiters(app=None):
+    """(per-IP, per-email) token buckets for logins"""
+    app = app or current_app
+    limiters = app.extensions.get('login_limiters')
+    if limiters is None:
+        limiters = (
+            TokenBucketLimiter(app.config['LOGIN_IP_RATE_PER_MINUTE'] / 60, app.config['LOGIN_IP_BURST']),
+            TokenBucketLimiter(app.config['LOGIN_EMAIL_RATE_PER_MINUTE'] / 60, app.config['LOGIN_EMAIL_BURST']),
+        )
+        app.extensions['login_limiters'] = limiters
+    return limiters
+
+
+def check_login_rate(ip, email):
+    """None when the login may proceed, else (reason, retry after seconds)"""
+    by_ip, by_email = login_limiters()
+    allowed, retry_after = by_ip.acquire(ip)
+    if not allowed:
+        return 'rate_limited_ip', retry_after
+    allowed, retry_after = by_email.acquire(email.strip().lower())
+    if not allowed:
+        return 'rate_limited_email', retry_after
+    return None
+
+
+# Login outcome recorded in login_duration_seconds, by response status
+LOGIN_OUTCOMES = {200: 'success', 400: 'invalid', 401: 'rejected', 403: 'rejected',
+                  429: 'rate_limited', 503: 'busy'}
+
+
+def timed_login(view):
+    """Record the view's latency in login_duration_seconds"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+            outcome = LOGIN_OUTCOMES.get(response.status_code, 'error')
+            return response
+        except HasherBusy:
+            outcome = 'busy'
+            raise
+        finally:
+            metrics.observe('login_duration_seconds', time.perf_counter() - started, outcome=outcome)
+    return wrapper
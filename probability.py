@@ -0,0 +1,149 @@
+"""
+Win-probability estimates for every slot of the date, hour and minute pools.
+
+The actual birth is modelled as a discrete distribution over outcomes:
+a day offset from the due date (a normal curve by default), an hour of
+the day and a minute of the hour (uniform by default). Each pool is won by
+the guess nearest to the actual outcome, so a slot's chance of winning is
+the probability mass of its "territory" - the outcomes closer to it than
+to any other claimed slot, with ties shared equally.
+
+All arithmetic is vectorized with NumPy: one (outcomes x slots) distance
+matrix per pool, no Python loops over outcomes or slots.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+from cache import LRUCache
+
+# Guessable window around the due date (matches utils.get_date_range)
+DATE_WINDOW_DAYS = 30
+# Births are modelled well past the window so tail mass goes to the edge slots
+OUTCOME_SPAN_DAYS = 60
+
+DEFAULT_MEAN_OFFSET_DAYS = 0.0
+DEFAULT_SD_DAYS = 10.0
+
+HOURS_PER_DAY = 24
+MINUTES_PER_HOUR = 60
+
+# Results keyed by (event_id, event version, distribution parameters)
+_probability_cache = LRUCache(maxsize=512)
+
+
+def day_distribution(mean_offset=DEFAULT_MEAN_OFFSET_DAYS, sd=DEFAULT_SD_DAYS, span=OUTCOME_SPAN_DAYS):
+    """Discretized normal distribution of the birth day relative to the due date.
+
+    Returns (offsets, pmf) where offsets are whole days from the due date.
+    """
+    offsets = np.arange(-span, span + 1)
+    sd = max(float(sd), 0.5)
+    pmf = np.exp(-0.5 * ((offsets - float(mean_offset)) / sd) ** 2)
+    return offsets, pmf / pmf.sum()
+
+
+def uniform_distribution(size):
+    """Uniform distribution over 0..size-1 (hours of the day, minutes of the hour)"""
+    return np.arange(size), np.full(size, 1.0 / size)
+
+
+def distance_matrix(outcomes, slots, circular_size=None):
+    """Absolute distance between every outcome (rows) and slot (columns)"""
+    distances = np.abs(np.asarray(outcomes)[:, None] - np.asarray(slots)[None, :])
+    if circular_size:
+        distances = np.minimum(distances, circular_size - distances)
+    return distances
+
+
+def territory_probabilities(outcomes, pmf, claimed, candidates, circular_size=None):
+    """Probability of winning for each claimed slot and each open candidate.
+
+    ``claimed`` may contain the same slot more than once (one entry per
+    claimant); tied claimants split the outcome equally. A candidate's
+    probability is what it would win if it were claimed next.
+    Returns (claimed_probabilities, candidate_probabilities).
+    """
+    claimed = np.asarray(claimed, dtype=float)
+    candidates = np.asarray(candidates, dtype=float)
+
+    if claimed.size:
+        claimed_distances = distance_matrix(outcomes, claimed, circular_size)
+        nearest = claimed_distances.min(axis=1)
+        is_nearest = claimed_distances == nearest[:, None]
+        tied = is_nearest.sum(axis=1)
+        claimed_probabilities = pmf @ (is_nearest / tied[:, None])
+    else:
+        nearest = np.full(len(outcomes), np.inf)
+        tied = np.zeros(len(outcomes))
+        claimed_probabilities = np.zeros(0)
+
+    if candidates.size:
+        candidate_distances = distance_matrix(outcomes, candidates, circular_size)
+        wins = (candidate_distances < nearest[:, None]) + \
+            (candidate_distances == nearest[:, None]) / (tied[:, None] + 1)
+        candidate_probabilities = pmf @ wins
+    else:
+        candidate_probabilities = np.zeros(0)
+
+    return claimed_probabilities, candidate_probabilities
+
+
+def _pool_probabilities(outcomes, pmf, slots, claimed, circular_size=None):
+    """Map every slot of a pool to its win probability.
+
+    Claimed slots report the combined probability of their claimants; open
+    slots report the probability they would have if claimed.
+    """
+    claimed_set = set(claimed)
+    open_slots = [slot for slot in slots if slot not in claimed_set]
+    claimed_probabilities, open_probabilities = territory_probabilities(
+        outcomes, pmf, claimed, open_slots, circular_size)
+
+    probabilities = {}
+    for slot, probability in zip(claimed, claimed_probabilities):
+        probabilities[slot] = probabilities.get(slot, 0.0) + float(probability)
+    for slot, probability in zip(open_slots, open_probabilities):
+        probabilities[slot] = float(probability)
+    return probabilities
+
+
+def estimate_pool_probabilities(due_date, claimed_dates, claimed_hours, claimed_minutes,
+                                mean_offset=DEFAULT_MEAN_OFFSET_DAYS, sd=DEFAULT_SD_DAYS):
+    """Win probabilities for every date, hour (0-23) and minute slot of an event.
+
+    ``claimed_dates`` are date objects, ``claimed_hours`` hours of the day
+    and ``claimed_minutes`` minutes of the hour, one entry per guess.
+    Returns {'date': {date: p}, 'hour': {hour: p}, 'minute': {minute: p}}.
+    """
+    day_offsets, day_pmf = day_distribution(mean_offset, sd)
+    date_slots = list(range(-DATE_WINDOW_DAYS, DATE_WINDOW_DAYS + 1))
+    claimed_offsets = [(claimed_date - due_date).days for claimed_date in claimed_dates]
+    date_probabilities = _pool_probabilities(day_offsets, day_pmf, date_slots, claimed_offsets)
+
+    hours, hour_pmf = uniform_distribution(HOURS_PER_DAY)
+    minutes, minute_pmf = uniform_distribution(MINUTES_PER_HOUR)
+
+    return {
+        'date': {
+            due_date + timedelta(days=offset): probability
+            for offset, probability in date_probabilities.items()
+        },
+        'hour': _pool_probabilities(hours, hour_pmf, list(range(HOURS_PER_DAY)),
+                                    list(claimed_hours), HOURS_PER_DAY),
+        'minute': _pool_probabilities(minutes, minute_pmf, list(range(MINUTES_PER_HOUR)),
+                                      list(claimed_minutes), MINUTES_PER_HOUR),
+    }
+
+
+def cached_pool_probabilities(event, claimed_dates, claimed_hours, claimed_minutes,
+                              mean_offset=DEFAULT_MEAN_OFFSET_DAYS, sd=DEFAULT_SD_DAYS):
+    """estimate_pool_probabilities, cached per event version"""
+    key = (event.id, event.version, event.due_date, float(mean_offset), float(sd))
+    probabilities = _probability_cache.get(key)
+    if probabilities is None:
+        probabilities = estimate_pool_probabilities(
+            event.due_date, claimed_dates, claimed_hours, claimed_minutes, mean_offset, sd)
+        _probability_cache.set(key, probabilities)
+    return probabilities
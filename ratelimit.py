@@ -0,0 +1,41 @@
+"""
+Token-bucket rate limiting.
+
+Each key (an IP address, an email, ...) has a bucket of `burst` tokens that
+refills at `rate` tokens per second; a request spends one token or is
+rejected with the time until the next token. Buckets live in process
+memory, bounded to the `max_keys` most recently used keys.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets"""
+
+    def __init__(self, rate, burst, max_keys=100000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()  # key -> (tokens, last refill time)
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """(allowed, seconds until a token is available)"""
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (1 - tokens) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
@@ -0,0 +1,171 @@
+"""
+Retry, deadline and circuit breaking for new database connections.
+
+Every engine gets a ``do_connect`` hook, so the policy applies wherever the
+pool opens a connection: session checkout, pre-ping reconnects and replica
+reads alike. A failed connect is retried with exponential backoff and full
+jitter until it succeeds, runs out of attempts or passes the deadline. The
+deadline is measured from the start of the current request when there is
+one. Consecutive failures open a per-engine circuit breaker. While it is
+open, connects fail at once with DatabaseUnavailable, which the app turns
+into a 503, instead of tying up threads in retries. After a cooldown a
+single probe connection is let through to close it again.
+"""
+
+import random
+import threading
+import time
+
+from flask import g, has_request_context
+from sqlalchemy import event
+
+import metrics
+
+DEFAULTS = {
+    'attempts': 4,
+    'base_delay': 0.05,  # Seconds before the first retry; doubles each time
+    'max_delay': 1.0,
+    'deadline': 3.0,  # Seconds per request (or per connect outside requests)
+    'breaker_threshold': 5,  # Consecutive failed connects that open the breaker
+    'breaker_cooldown': 10.0,
+}
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+metrics.describe('db_connect_attempts_total', 'Database connection attempts')
+metrics.describe('db_connect_retries_total', 'Database connection attempts that were retries')
+metrics.describe('db_connect_failures_total', 'Failed database connection attempts')
+metrics.describe('db_circuit_rejections_total', 'Connections refused because the circuit breaker was open')
+metrics.describe('db_circuit_opened_total', 'Times the circuit breaker opened')
+metrics.describe('db_circuit_state', 'Circuit breaker state (0 closed, 1 half-open, 2 open)', 'gauge')
+
+
+class DatabaseUnavailable(Exception):
+    """The database cannot be reached right now; retry after retry_after seconds"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    def __init__(self, name, threshold, cooldown, clock=time.monotonic):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        metrics.set_gauge('db_circuit_state', 0, engine=name)
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.set_gauge('db_circuit_state', STATE_VALUES[state], engine=self.name)
+
+    def retry_after(self):
+        return max(1, int(self.cooldown - (self.clock() - self.opened_at) + 0.999))
+
+    def available(self):
+        """Whether the breaker would let a connection through (without claiming the probe)"""
+        return self.state == CLOSED or (self.state == OPEN and self.clock() - self.opened_at >= self.cooldown)
+
+    def allow(self):
+        """Whether a connection attempt may go ahead now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() - self.opened_at >= self.cooldown:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                self.opened_at = self.clock()
+                self._set_state(OPEN)
+                metrics.inc('db_circuit_opened_total', engine=self.name)
+
+
+_breakers = {}
+
+
+def breaker_for(engine):
+    """The circuit breaker guarding an engine (None if no retry policy is installed)"""
+    return _breakers.get(id(engine))
+
+
+def start_request_deadline(deadline=None):
+    """before_request hook: connection retries in this request stop at the deadline"""
+    from flask import current_app
+    seconds = deadline or current_app.config.get('DB_RESILIENCE', {}).get('deadline', DEFAULTS['deadline'])
+    g.db_deadline = time.monotonic() + seconds
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """Full-jitter exponential backoff for the given retry (1-based)"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def install_connect_retry(engine, settings=None, sleep=time.sleep):
+    """Wrap new connections of an engine in the retry policy and a circuit breaker"""
+    settings = {**DEFAULTS, **(settings or {})}
+    name = engine.url.render_as_string(hide_password=True)
+    breaker = CircuitBreaker(name, settings['breaker_threshold'], settings['breaker_cooldown'])
+    _breakers[id(engine)] = breaker
+    retryable = (engine.dialect.loaded_dbapi.OperationalError, engine.dialect.loaded_dbapi.InterfaceError)
+
+    @event.listens_for(engine, 'do_connect')
+    def connect_with_retry(dialect, connection_record, cargs, cparams):
+        deadline = g.get('db_deadline') if has_request_context() else None
+        if deadline is None:
+            deadline = time.monotonic() + settings['deadline']
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                metrics.inc('db_circuit_rejections_total', engine=name)
+                raise DatabaseUnavailable('Database circuit breaker is open', breaker.retry_after())
+
+            attempt += 1
+            metrics.inc('db_connect_attempts_total', engine=name)
+            if attempt > 1:
+                metrics.inc('db_connect_retries_total', engine=name)
+            try:
+                connection = dialect.connect(*cargs, **cparams)
+            except retryable as e:
+                breaker.record_failure()
+                metrics.inc('db_connect_failures_total', engine=name)
+                if breaker.state == OPEN:
+                    raise DatabaseUnavailable(f'Could not connect to the database: {e}', breaker.retry_after()) from e
+                delay = backoff_delay(attempt, settings['base_delay'], settings['max_delay'])
+                if attempt >= settings['attempts'] or time.monotonic() + delay >= deadline:
+                    raise DatabaseUnavailable(f'Could not connect to the database: {e}') from e
+                sleep(delay)
+                continue
+            except BaseException:
+                # Not worth retrying, but it still has to end a half-open probe
+                breaker.record_failure()
+                metrics.inc('db_connect_failures_total', engine=name)
+                raise
+            breaker.record_success()
+            return connection
+
+    return breaker
@@ -0,0 +1,148 @@
+"""
+Revoked JWTs, checked on every request without a database query.
+
+Revocations are rows in revoked_token, keyed by token id (`jti`). Each
+worker process keeps the unexpired ids in memory and checks tokens against
+that set. Every TOKEN_REVOCATION_SYNC_SECONDS one request reads the rows
+added since the last sync (by id, so the query is a short index range);
+revocations made in this process count at once, those made by other workers
+within that interval. Expired ids are dropped from memory at each sync and
+deleted from the table every TOKEN_REVOCATION_PRUNE_SECONDS.
+
+If the database can't be read, the previous set is used until the next sync.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, request
+from flask_jwt_extended import decode_token, get_jwt, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from sqlalchemy import delete, select
+
+import metrics
+from models import db, RevokedToken
+
+logger = logging.getLogger(__name__)
+
+metrics.describe('token_revocations_total', 'Tokens revoked, by reason')
+metrics.describe('token_revocation_syncs_total', 'Reads of new revocations, by outcome')
+metrics.describe('token_revocation_list_size', 'Unexpired revoked tokens held in memory', 'gauge')
+
+
+class RevocationList:
+    """Unexpired revoked token ids, synced from the revoked_token table"""
+
+    def __init__(self, sync_seconds, prune_seconds, clock=time.monotonic):
+        self.sync_seconds = sync_seconds
+        self.prune_seconds = prune_seconds
+        self.clock = clock
+        self._expiry = {}  # jti -> expiry, seconds since the epoch
+        self._last_id = 0
+        self._synced_at = None
+        self._pruned_at = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def __contains__(self, jti):
+        # No sync: safe inside an open transaction
+        return jti in self._expiry
+
+    def is_revoked(self, jti):
+        if self._synced_at is None or self.clock() - self._synced_at >= self.sync_seconds:
+            self.sync()
+        return jti in self._expiry
+
+    def add(self, jti, expires):
+        self._expiry[jti] = expires
+
+    def sync(self, engine=None):
+        """Pick up rows added since the last sync and forget expired ids"""
+        with self._lock:
+            now = self.clock()
+            # Another thread synced while this one waited
+            if self._synced_at is not None and now - self._synced_at < self.sync_seconds:
+                return
+            self._synced_at = now
+            engine = engine or db.engine
+            wall_now = datetime.utcnow()
+            try:
+                with engine.connect() as connection:
+                    rows = connection.execute(
+                        select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+                        .where(RevokedToken.id > self._last_id, RevokedToken.expires_at > wall_now)
+                        .order_by(RevokedToken.id)
+                    ).all()
+                    if self._pruned_at is None or now - self._pruned_at >= self.prune_seconds:
+                        self._pruned_at = now
+                        connection.execute(delete(RevokedToken).where(RevokedToken.expires_at <= wall_now))
+                        connection.commit()
+            except Exception as e:
+                logger.warning(f"Couldn't sync revoked tokens, keeping the previous list: {str(e)}")
+                metrics.inc('token_revocation_syncs_total', outcome='error')
+                return
+            for row_id, jti, expires_at in rows:
+                self._expiry[jti] = _epoch(expires_at)
+                self._last_id = max(self._last_id, row_id)
+            cutoff = time.time()
+            self._expiry = {jti: expires for jti, expires in self._expiry.items() if expires > cutoff}
+            metrics.inc('token_revocation_syncs_total', outcome='ok')
+            metrics.set_gauge('token_revocation_list_size', len(self._expiry))
+
+
+def _epoch(naive_utc):
+    return (naive_utc - datetime(1970, 1, 1)).total_seconds()
+
+
+def revocation_list(app=None):
+    """The app's revocation list, created on first use in each process"""
+    app = app or current_app
+    revocations = app.extensions.get('token_revocations')
+    if revocations is None or revocations[0] != os.getpid():
+        revocations = (os.getpid(), RevocationList(app.config['TOKEN_REVOCATION_SYNC_SECONDS'],
+                                                   app.config['TOKEN_REVOCATION_PRUNE_SECONDS']))
+        app.extensions['token_revocations'] = revocations
+    return revocations[1]
+
+
+def revoke_token(claims, reason):
+    """Revoke a decoded token until it expires (committed with the session)"""
+    jti, expires = claims.get('jti'), claims.get('exp')
+    if not jti or not expires or jti in revocation_list():
+        return False
+    db.session.add(RevokedToken(jti=jti, expires_at=datetime.utcfromtimestamp(expires)))
+    revocation_list().add(jti, expires)
+    metrics.inc('token_revocations_total', reason=reason)
+    return True
+
+
+def revoke_request_tokens(reason='logout'):
+    """Revoke the valid access token a request carries and any refresh token in its JSON body"""
+    revoked = False
+    try:
+        verify_jwt_in_request(optional=True)
+        claims = get_jwt()
+    except (JWTExtendedException, PyJWTError):
+        claims = {}
+    if claims:
+        revoked = revoke_token(claims, reason)
+    refresh = (request.get_json(silent=True) or {}).get('refresh_token')
+    if isinstance(refresh, str):
+        try:
+            revoked = revoke_token(decode_token(refresh), reason) or revoked
+        except (JWTExtendedException, PyJWTError):
+            pass
+    if revoked:
+        db.session.commit()
+    return revoked
+
+
+def is_token_revoked(jwt_header, jwt_payload):
+    """flask-jwt-extended's token_in_blocklist_loader"""
+    return revocation_list().is_revoked(jwt_payload.get('jti'))
@@ -1,68 +1,29 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context
 from flask_login import current_user, login_required
-from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
-from models import db, User, Event, DateGuess, HourGuess, MinuteGuess, NameGuess, Payment
+from flask_jwt_extended import jwt_required, verify_jwt_in_request
+from models import db, User, Event, DateGuess, HourGuess, MinuteGuess, NameGuess, Payment, event_guests, bump_event_version, \
+    GUESS_MODELS, count_guesses, has_guesses, is_event_guest, is_event_member, add_event_guest, remove_event_guest
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime, timedelta
 import uuid
-from utils import calculate_amount_owed
+from utils import calculate_amount_owed, get_page_args, paginate_query, add_page_headers, generate_available_dates, format_date
+from guest_import import parse_guest_rows, import_guests, MAX_IMPORT_ROWS
+from guess_batch import lock_event_slots, place_guesses, MAX_BATCH_GUESSES
+from exports import EXPORT_DATASETS, EXPORT_FORMATS, generate_export
+from winners import resolve_winners, serialize_results, TIE_RULES, hour_slot
+from database import read_replica
+from tokens import current_token_user
+from idempotency import idempotent
+from boards import board_response
 
 api = Blueprint('api', __name__)
 
 # Helper function to get user from JWT identity
 def get_user_from_jwt():
     """Get the current user based on JWT identity"""
-    try:
-        jwt_identity = get_jwt_identity()
-        
-        print(f"DEBUG: JWT identity type and value: {type(jwt_identity).__name__}, {jwt_identity}")
-        
-        # Handle different formats of identity
-        if isinstance(jwt_identity, str):
-            # String identities need to be converted to int
-            try:
-                user_id = int(jwt_identity)
-            except ValueError:
-                # If it's not a valid int string, use as is
-                user_id = jwt_identity
-        # Legacy support for dict format if needed
-        elif isinstance(jwt_identity, dict):
-            # Get user_id from dict, might be int or string
-            user_id = jwt_identity.get('id')
-            print(f"DEBUG: ID from dict: {user_id}, type: {type(user_id).__name__}")
-            if isinstance(user_id, str):
-                # Convert string to int if possible
-                try:
-                    user_id = int(user_id)
-                except ValueError:
-                    # Keep as string if not convertible
-                    pass
-        else:
-            # Assume it's already an int or other format
-            user_id = jwt_identity
-            
-        if not user_id:
-            print("DEBUG: No user_id found in JWT")
-            return None
-            
-        print(f"DEBUG: Final user_id: {user_id}, type: {type(user_id).__name__}")
-        
-        # Query with explicit integer conversion for safety
-        try:
-            user_id_int = int(user_id)
-            user = User.query.get(user_id_int)
-            if user:
-                return user
-        except (ValueError, TypeError):
-            # If int conversion fails, try string lookup or other methods
-            print(f"DEBUG: Int conversion failed, trying string comparison")
-        
-        # Fallback to manual filtering to handle string IDs
-        return User.query.filter(User.id == user_id).first()
-    except Exception as e:
-        print(f"Error getting user from JWT: {str(e)}")
-        return None
+    return current_token_user()
 
 # User endpoints
 @api.route('/users/me', methods=['GET'])
@@ -106,6 +67,7 @@ def allowed_file(filename):
 
 # Event routes
 @api.route('/events', methods=['GET'])
+@read_replica
 def get_events():
     try:
         user = None
@@ -113,13 +75,6 @@ def get_events():
         # Try to get user from JWT if available
         try:
             verify_jwt_in_request(optional=True)
-            raw_identity = get_jwt_identity()
-            print(f"DEBUG: Raw JWT identity: {raw_identity}, type: {type(raw_identity)}")
-            
-            # Debug print for request headers
-            auth_header = request.headers.get('Authorization')
-            print(f"DEBUG: Authorization header: {auth_header}")
-            
             user = get_user_from_jwt()
             print(f"DEBUG: User from JWT: {user}")
         except:
@@ -135,9 +90,17 @@ def get_events():
         return jsonify({'error': f'Authentication error: {str(e)}'}), 500
         
     if user.is_host:
-        events = Event.query.filter_by(host_id=user.id).all()
+        events_query = Event.query.filter_by(host_id=user.id)
     else:
-        events = user.events
+        events_query = Event.query.join(event_guests, event_guests.c.event_id == Event.id) \
+            .filter(event_guests.c.user_id == user.id)
+    
+    try:
+        limit, after_id, include_total = get_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    events, next_cursor, total = paginate_query(events_query, Event.id, limit, after_id, include_total)
     
     events_data = []
     for event in events:
@@ -150,11 +113,12 @@ def get_events():
             'due_date': event.due_date.strftime('%Y-%m-%d')
         })
     
-    return jsonify(events_data)
+    return add_page_headers(jsonify(events_data), next_cursor, total)
 
 
 
 @api.route('/events/<int:event_id>', methods=['GET'])
+@read_replica
 def get_event(event_id):
     event = Event.query.get_or_404(event_id)
     user = None
@@ -169,10 +133,7 @@ def get_event(event_id):
             user = current_user
         
     # If user is not the host and not a guest, only return limited info
-    if not user or (
-        user.id != event.host_id and 
-        user not in event.guests
-    ):
+    if not user or not is_event_member(event, user.id):
         return jsonify({
             'id': event.id,
             'title': event.title,
@@ -210,6 +171,7 @@ def get_event(event_id):
 
 @api.route('/events', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_event():
     user = get_user_from_jwt()
     
@@ -271,20 +233,9 @@ def create_event():
         # Process guest emails if provided
         guest_emails = data.get('guest_emails', [])
         if guest_emails:
-            for email in guest_emails:
-                if not email or '@' not in email:
-                    continue  # Skip invalid emails
-                    
-                # Check if the user already exists
-                guest_user = User.query.filter_by(email=email).first()
-                if not guest_user:
-                    guest_user = User(email=email)
-                    db.session.add(guest_user)
-                
-                # Add user to the event's guests
-                if guest_user not in new_event.guests:
-                    new_event.guests.append(guest_user)
-            
+            # Invalid entries are skipped; the import endpoint reports them
+            emails, _ = parse_guest_rows('\n'.join(email for email in guest_emails if email))
+            import_guests(new_event, emails)
             db.session.commit()
         
         # Handle Venmo information if provided
@@ -309,6 +260,7 @@ def create_event():
 
 @api.route('/events/<int:event_id>', methods=['PUT'])
 @jwt_required()
+@idempotent
 def update_event(event_id):
     user = get_user_from_jwt()
     
@@ -361,6 +313,7 @@ def update_event(event_id):
 
 @api.route('/events/<int:event_id>/image', methods=['POST'])
 @login_required
+@idempotent
 def upload_event_image(event_id):
     event = Event.query.get_or_404(event_id)
     
@@ -403,29 +356,42 @@ def upload_event_image(event_id):
     return jsonify({'error': 'File type not allowed'}), 400
 
 @api.route('/events/code/<event_code>', methods=['GET'])
+@read_replica
 def find_event_by_code(event_code):
     event = Event.query.filter_by(event_code=event_code).first()
     
     if not event:
         return jsonify({'error': 'Event not found'}), 404
     
-    return jsonify({
+    # Every guest joining by code reads this; serve it as stored bytes
+    return board_response('code', event, lambda: build_event_summary(event))
+
+def build_event_summary(event):
+    """What a guest sees of an event before joining it"""
+    return {
         'id': event.id,
         'title': event.title,
         'mother_name': event.mother_name,
         'event_date': event.event_date.strftime('%Y-%m-%d'),
         'due_date': event.due_date.strftime('%Y-%m-%d'),
         'host': User.query.get(event.host_id).get_full_name()
-    })
+    }
 
 @api.route('/events/find-by-mother', methods=['GET'])
+@read_replica
 def find_event_by_mother():
     search_term = request.args.get('name', '')
     if not search_term or len(search_term) < 2:
         return jsonify({'error': 'Search term must be at least 2 characters'}), 400
     
     # Search for events with matching mother's name
-    events = Event.query.filter(Event.mother_name.ilike(f'%{search_term}%')).all()
+    try:
+        limit, after_id, include_total = get_page_args(request.args, default_limit=None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    events_query = Event.query.filter(Event.mother_name.ilike(f'%{search_term}%'))
+    events, next_cursor, total = paginate_query(events_query, Event.id, limit, after_id, include_total)
     
     events_data = []
     for event in events:
@@ -437,10 +403,11 @@ def find_event_by_mother():
             'host_name': host.get_full_name()
         })
     
-    return jsonify(events_data)
+    return add_page_headers(jsonify(events_data), next_cursor, total)
 
 @api.route('/events/<int:event_id>/add-guest', methods=['POST'])
 @login_required
+@idempotent
 def add_guest_to_event(event_id):
     event = Event.query.get_or_404(event_id)
     
@@ -461,18 +428,64 @@ def add_guest_to_event(event_id):
         user = User(email=email)
         db.session.add(user)
     
-    # Check if user is already a guest
-    if user in event.guests:
-        return jsonify({'error': 'User is already a guest for this event'}), 400
+    db.session.flush()
     
-    # Add user to the event's guests
-    event.guests.append(user)
+    # Add user to the event's guests unless they already are one
+    if not add_event_guest(event.id, user.id):
+        db.session.rollback()
+        return jsonify({'error': 'User is already a guest for this event'}), 400
     db.session.commit()
     
     return jsonify({'message': 'Guest added successfully'})
 
+@api.route('/events/<int:event_id>/guests/import', methods=['POST'])
+@login_required
+@idempotent
+def import_event_guests(event_id):
+    """Bulk-add guests from a pasted CSV/TSV column or a list of emails"""
+    event = Event.query.get_or_404(event_id)
+    
+    # Ensure only the host can add guests
+    if current_user.id != event.host_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    # Accept raw text/csv bodies as well as JSON
+    if request.is_json:
+        data = request.json or {}
+        text = data.get('text') or ''
+        if data.get('emails'):
+            text = '\n'.join([text] + [str(email) for email in data['emails'] if email])
+    else:
+        text = request.get_data(as_text=True)
+    
+    if not text.strip():
+        return jsonify({'error': 'No guest emails provided'}), 400
+    
+    emails, invalid_rows = parse_guest_rows(text)
+    
+    if len(emails) + len(invalid_rows) > MAX_IMPORT_ROWS:
+        return jsonify({'error': f'A single import is limited to {MAX_IMPORT_ROWS} rows'}), 400
+    
+    try:
+        summary = import_guests(event, emails)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error importing guests: {str(e)}")
+        return jsonify({'error': f'Failed to import guests: {str(e)}'}), 400
+    
+    return jsonify({
+        'message': f"{len(summary['added'])} guests added",
+        'added': summary['added'],
+        'created': summary['created'],
+        'already_guests': summary['already_guests'],
+        'skipped': summary['skipped'],
+        'invalid_rows': invalid_rows
+    })
+
 @api.route('/events/<int:event_id>/guests', methods=['GET'])
 @login_required
+@read_replica
 def get_event_guests(event_id):
     event = Event.query.get_or_404(event_id)
     
@@ -480,20 +493,29 @@ def get_event_guests(event_id):
     if current_user.id != event.host_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    try:
+        limit, after_id, include_total = get_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    guests_query = User.query.join(event_guests, event_guests.c.user_id == User.id) \
+        .filter(event_guests.c.event_id == event_id)
+    guests, next_cursor, total = paginate_query(guests_query, User.id, limit, after_id, include_total)
+    
+    # Guess counts and payments for the whole page in one grouped query each
+    guest_ids = [guest.id for guest in guests]
+    guess_counts = count_guesses(event_id, guest_ids)
+    paid_by_guest = dict(
+        db.session.query(Payment.user_id, db.func.sum(Payment.amount))
+        .filter(Payment.event_id == event_id, Payment.user_id.in_(guest_ids))
+        .group_by(Payment.user_id).all()
+    )
+    
     guests_data = []
-    for guest in event.guests:
-        # Calculate guesses and payments
-        date_guesses = DateGuess.query.filter_by(user_id=guest.id, event_id=event_id).count()
-        hour_guesses = HourGuess.query.filter_by(user_id=guest.id, event_id=event_id).count()
-        minute_guesses = MinuteGuess.query.filter_by(user_id=guest.id, event_id=event_id).count()
-        name_guesses = NameGuess.query.filter_by(user_id=guest.id, event_id=event_id).count()
-        
-        total_guesses = date_guesses + hour_guesses + minute_guesses + name_guesses
+    for guest in guests:
+        total_guesses = sum(guess_counts.get(guest.id, {}).values())
         amount_owed = total_guesses * event.guess_price
-        
-        # Get total paid
-        payments = Payment.query.filter_by(user_id=guest.id, event_id=event_id).all()
-        total_paid = sum(payment.amount for payment in payments)
+        total_paid = paid_by_guest.get(guest.id) or 0
         
         payment_status = 'paid' if total_paid >= amount_owed else 'pending'
         if 0 < total_paid < amount_owed:
@@ -513,10 +535,52 @@ def get_event_guests(event_id):
             'payment_status': payment_status
         })
     
-    return jsonify(guests_data)
+    return add_page_headers(jsonify(guests_data), next_cursor, total)
+
+def export_response(dataset, event_ids, filename):
+    """Build a streaming download response for an export dataset"""
+    export_format = request.args.get('format', 'csv').lower()
+    
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({'error': f'Unknown export: {dataset}'}), 404
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Format must be csv or ndjson'}), 400
+    
+    return Response(
+        stream_with_context(generate_export(dataset, export_format, event_ids)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}-{dataset}.{export_format}'}
+    )
+
+@api.route('/events/<int:event_id>/export/<string:dataset>', methods=['GET'])
+@login_required
+@read_replica
+def export_event_data(event_id, dataset):
+    """Download an event's guests, guesses or payments as CSV or NDJSON"""
+    event = Event.query.get_or_404(event_id)
+    
+    # Ensure only the host can export
+    if current_user.id != event.host_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return export_response(dataset, [event.id], f'event-{event.id}')
+
+@api.route('/events/export/<string:dataset>', methods=['GET'])
+@login_required
+@read_replica
+def export_host_data(dataset):
+    """Download guests, guesses or payments across all of the host's events"""
+    if not current_user.is_host:
+        return jsonify({'error': 'Only hosts can export events'}), 403
+    
+    # Pass the id query itself so the host's event list is never loaded
+    hosted_event_ids = db.select(Event.id).where(Event.host_id == current_user.id)
+    return export_response(dataset, hosted_event_ids, 'all-events')
 
 @api.route('/events/<int:event_id>/guests/<int:user_id>', methods=['GET'])
 @login_required
+@read_replica
 def get_guest_details(event_id, user_id):
     event = Event.query.get_or_404(event_id)
     user = User.query.get_or_404(user_id)
@@ -526,7 +590,7 @@ def get_guest_details(event_id, user_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     # Ensure the user is a guest of this event
-    if user not in event.guests:
+    if not is_event_guest(event_id, user.id):
         return jsonify({'error': 'User is not a guest of this event'}), 400
     
     # Get all guesses
@@ -576,6 +640,7 @@ def get_guest_details(event_id, user_id):
 
 @api.route('/events/<int:event_id>/guests/<int:user_id>/payment', methods=['POST'])
 @login_required
+@idempotent
 def update_guest_payment(event_id, user_id):
     event = Event.query.get_or_404(event_id)
     user = User.query.get_or_404(user_id)
@@ -605,6 +670,8 @@ def update_guest_payment(event_id, user_id):
     elif action == 'mark_unpaid':
         # Delete all payments for this user in this event
         Payment.query.filter_by(user_id=user.id, event_id=event_id).delete()
+        # Bulk deletes skip the ORM hooks that normally bump the version
+        bump_event_version(event_id)
         db.session.commit()
         
         return jsonify({'message': 'Payment marked as unpaid'})
@@ -629,6 +696,7 @@ def update_guest_payment(event_id, user_id):
 
 @api.route('/events/<int:event_id>/guests/<int:user_id>', methods=['DELETE'])
 @login_required
+@idempotent
 def remove_guest(event_id, user_id):
     event = Event.query.get_or_404(event_id)
     user = User.query.get_or_404(user_id)
@@ -637,20 +705,13 @@ def remove_guest(event_id, user_id):
     if current_user.id != event.host_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Check if user has any guesses
-    has_guesses = (
-        DateGuess.query.filter_by(user_id=user.id, event_id=event_id).first() or
-        HourGuess.query.filter_by(user_id=user.id, event_id=event_id).first() or
-        MinuteGuess.query.filter_by(user_id=user.id, event_id=event_id).first() or
-        NameGuess.query.filter_by(user_id=user.id, event_id=event_id).first()
-    )
-    
     # Only allow deletion if the user has no guesses
-    if has_guesses:
+    if has_guesses(event_id, user.id):
         return jsonify({'error': 'Cannot remove guest with existing guesses'}), 400
     
     # Remove user from event guests
-    event.guests.remove(user)
+    if not remove_event_guest(event_id, user.id):
+        return jsonify({'error': 'User is not a guest of this event'}), 400
     db.session.commit()
     
     return jsonify({'message': 'Guest removed successfully'})
@@ -658,13 +719,20 @@ def remove_guest(event_id, user_id):
 # Guess routes
 @api.route('/events/<int:event_id>/guesses/date', methods=['GET'])
 @jwt_required(optional=True)
+@read_replica
 def get_date_guesses(event_id):
     event = Event.query.get_or_404(event_id)
     
     # Get current user from JWT if available
     current_jwt_user = get_user_from_jwt()
     
-    guesses = DateGuess.query.filter_by(event_id=event_id).all()
+    try:
+        limit, after_id, include_total = get_page_args(request.args, default_limit=None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    guesses, next_cursor, total = paginate_query(
+        DateGuess.query.filter_by(event_id=event_id), DateGuess.id, limit, after_id, include_total)
     
     guesses_data = []
     for guess in guesses:
@@ -695,10 +763,11 @@ def get_date_guesses(event_id):
             'is_current_user': is_current_user
         })
     
-    return jsonify(guesses_data)
+    return add_page_headers(jsonify(guesses_data), next_cursor, total)
 
 @api.route('/events/<int:event_id>/guesses/date', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_date_guess(event_id):
     # Get user from JWT
     user = get_user_from_jwt()
@@ -707,10 +776,8 @@ def create_date_guess(event_id):
     
     event = Event.query.get_or_404(event_id)
     
-    # Ensure the user is a guest of this event
-    if user not in event.guests and user.id != event.host_id:
-        # Add the user as a guest if they're not already
-        event.guests.append(user)
+    # Ensure the user is a guest of this event, adding them if they're not already
+    if user.id != event.host_id and add_event_guest(event_id, user.id):
         db.session.commit()
     
     data = request.json
@@ -723,6 +790,9 @@ def create_date_guess(event_id):
         # Parse the date
         date_obj = datetime.strptime(guess_date, '%Y-%m-%d').date()
         
+        # Held until commit, so no one else can take the date after the checks below
+        lock_event_slots(event_id)
+        
         # Check if the user already has a guess for this date
         existing_guess = DateGuess.query.filter_by(
             user_id=user.id,
@@ -759,15 +829,102 @@ def create_date_guess(event_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+@api.route('/events/<int:event_id>/availability', methods=['GET'])
+@jwt_required(optional=True)
+@read_replica
+def get_event_availability(event_id):
+    """Every date, hour and minute slot with who claimed it and its chance of winning"""
+    event = Event.query.get_or_404(event_id)
+    
+    try:
+        mean_offset = float(request.args.get('mean_offset', current_app.config['WIN_PROBABILITY_MEAN_OFFSET_DAYS']))
+        sd = float(request.args.get('sd', current_app.config['WIN_PROBABILITY_SD_DAYS']))
+    except ValueError:
+        return jsonify({'error': 'mean_offset and sd must be numbers'}), 400
+    
+    if not (0 < sd <= 60) or abs(mean_offset) > 30:
+        return jsonify({'error': 'sd must be between 0 and 60 days and mean_offset within 30 days'}), 400
+    
+    # Pollers that miss together share one build per event version
+    return board_response('availability', event, lambda: build_availability(event, mean_offset, sd),
+                          mean_offset, sd)
+
+def build_availability(event, mean_offset, sd):
+    """The availability board payload for an event"""
+    event_id = event.id
+    # One query per pool, with the claimant's name joined in
+    user_columns = (User.nickname, User.first_name, User.last_name, User.email)
+    date_claims = db.session.query(DateGuess.guess_date, *user_columns) \
+        .join(User, User.id == DateGuess.user_id).filter(DateGuess.event_id == event_id).all()
+    hour_claims = db.session.query(HourGuess.hour, HourGuess.am_pm, *user_columns) \
+        .join(User, User.id == HourGuess.user_id).filter(HourGuess.event_id == event_id).all()
+    minute_claims = db.session.query(MinuteGuess.minute, *user_columns) \
+        .join(User, User.id == MinuteGuess.user_id).filter(MinuteGuess.event_id == event_id).all()
+    
+    # numpy is only imported once win probabilities are first requested
+    from probability import cached_pool_probabilities
+    probabilities = cached_pool_probabilities(
+        event,
+        [claim[0] for claim in date_claims],
+        [hour_slot(claim[0], claim[1]) for claim in hour_claims],
+        [claim[0] for claim in minute_claims],
+        mean_offset,
+        sd
+    )
+    
+    dates = generate_available_dates(event.due_date, [
+        {'date': claim[0], 'user': User.format_display_name(*claim[1:])} for claim in date_claims
+    ])
+    date_probabilities = {format_date(day): p for day, p in probabilities['date'].items()}
+    for date_item in dates:
+        date_item['win_probability'] = round(date_probabilities.get(date_item['date'], 0.0), 6)
+    
+    hour_owners = {hour_slot(claim[0], claim[1]): User.format_display_name(*claim[2:]) for claim in hour_claims}
+    hours = []
+    for slot in range(24):
+        hours.append({
+            'hour': (slot % 12) or 12,
+            'am_pm': 'PM' if slot >= 12 else 'AM',
+            'is_available': slot not in hour_owners,
+            'user': hour_owners.get(slot),
+            'win_probability': round(probabilities['hour'][slot], 6)
+        })
+    
+    minute_owners = {claim[0]: User.format_display_name(*claim[1:]) for claim in minute_claims}
+    minutes = []
+    for minute in range(60):
+        minutes.append({
+            'minute': minute,
+            'is_available': minute not in minute_owners,
+            'user': minute_owners.get(minute),
+            'win_probability': round(probabilities['minute'][minute], 6)
+        })
+    
+    return {
+        'event_id': event.id,
+        'version': event.version,
+        'due_date': event.due_date.strftime('%Y-%m-%d'),
+        'dates': dates,
+        'hours': hours,
+        'minutes': minutes
+    }
+
 @api.route('/events/<int:event_id>/guesses/hour', methods=['GET'])
 @jwt_required(optional=True)
+@read_replica
 def get_hour_guesses(event_id):
     event = Event.query.get_or_404(event_id)
     
     # Get current user from JWT if available
     current_jwt_user = get_user_from_jwt()
     
-    guesses = HourGuess.query.filter_by(event_id=event_id).all()
+    try:
+        limit, after_id, include_total = get_page_args(request.args, default_limit=None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    guesses, next_cursor, total = paginate_query(
+        HourGuess.query.filter_by(event_id=event_id), HourGuess.id, limit, after_id, include_total)
     
     guesses_data = []
     for guess in guesses:
@@ -799,10 +956,11 @@ def get_hour_guesses(event_id):
             'is_current_user': is_current_user
         })
     
-    return jsonify(guesses_data)
+    return add_page_headers(jsonify(guesses_data), next_cursor, total)
 
 @api.route('/events/<int:event_id>/guesses/hour', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_hour_guess(event_id):
     # Get user from JWT
     user = get_user_from_jwt()
@@ -811,10 +969,8 @@ def create_hour_guess(event_id):
     
     event = Event.query.get_or_404(event_id)
     
-    # Ensure the user is a guest of this event
-    if user not in event.guests and user.id != event.host_id:
-        # Add the user as a guest if they're not already
-        event.guests.append(user)
+    # Ensure the user is a guest of this event, adding them if they're not already
+    if user.id != event.host_id and add_event_guest(event_id, user.id):
         db.session.commit()
     
     data = request.json
@@ -833,6 +989,9 @@ def create_hour_guess(event_id):
         return jsonify({'error': 'AM/PM must be either "AM" or "PM"'}), 400
     
     try:
+        # Held until commit, so no one else can take the hour after the checks below
+        lock_event_slots(event_id)
+        
         # Check if the user already has a guess for this hour
         existing_guess = HourGuess.query.filter_by(
             user_id=user.id,
@@ -874,13 +1033,20 @@ def create_hour_guess(event_id):
 
 @api.route('/events/<int:event_id>/guesses/minute', methods=['GET'])
 @jwt_required(optional=True)
+@read_replica
 def get_minute_guesses(event_id):
     event = Event.query.get_or_404(event_id)
     
     # Get current user from JWT if available
     current_jwt_user = get_user_from_jwt()
     
-    guesses = MinuteGuess.query.filter_by(event_id=event_id).all()
+    try:
+        limit, after_id, include_total = get_page_args(request.args, default_limit=None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    guesses, next_cursor, total = paginate_query(
+        MinuteGuess.query.filter_by(event_id=event_id), MinuteGuess.id, limit, after_id, include_total)
     
     guesses_data = []
     for guess in guesses:
@@ -911,10 +1077,11 @@ def get_minute_guesses(event_id):
             'is_current_user': is_current_user
         })
     
-    return jsonify(guesses_data)
+    return add_page_headers(jsonify(guesses_data), next_cursor, total)
 
 @api.route('/events/<int:event_id>/guesses/minute', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_minute_guess(event_id):
     # Get user from JWT
     user = get_user_from_jwt()
@@ -923,10 +1090,8 @@ def create_minute_guess(event_id):
     
     event = Event.query.get_or_404(event_id)
     
-    # Ensure the user is a guest of this event
-    if user not in event.guests and user.id != event.host_id:
-        # Add the user as a guest if they're not already
-        event.guests.append(user)
+    # Ensure the user is a guest of this event, adding them if they're not already
+    if user.id != event.host_id and add_event_guest(event_id, user.id):
         db.session.commit()
     
     data = request.json
@@ -940,6 +1105,9 @@ def create_minute_guess(event_id):
         return jsonify({'error': 'Minute must be between 0 and 59'}), 400
     
     try:
+        # Held until commit, so no one else can take the minute after the checks below
+        lock_event_slots(event_id)
+        
         # Check if the user already has a guess for this minute
         existing_guess = MinuteGuess.query.filter_by(
             user_id=user.id,
@@ -978,6 +1146,7 @@ def create_minute_guess(event_id):
 
 @api.route('/events/<int:event_id>/guesses/name', methods=['GET'])
 @jwt_required(optional=True)
+@read_replica
 def get_name_guesses(event_id):
     event = Event.query.get_or_404(event_id)
     
@@ -987,7 +1156,13 @@ def get_name_guesses(event_id):
     # Get current user from JWT if available
     current_jwt_user = get_user_from_jwt()
     
-    guesses = NameGuess.query.filter_by(event_id=event_id).all()
+    try:
+        limit, after_id, include_total = get_page_args(request.args, default_limit=None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    guesses, next_cursor, total = paginate_query(
+        NameGuess.query.filter_by(event_id=event_id), NameGuess.id, limit, after_id, include_total)
     
     guesses_data = []
     for guess in guesses:
@@ -1018,10 +1193,11 @@ def get_name_guesses(event_id):
             'is_current_user': is_current_user
         })
     
-    return jsonify(guesses_data)
+    return add_page_headers(jsonify(guesses_data), next_cursor, total)
 
 @api.route('/events/<int:event_id>/guesses/name', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_name_guess(event_id):
     # Get user from JWT
     user = get_user_from_jwt()
@@ -1033,10 +1209,8 @@ def create_name_guess(event_id):
     if not event.name_game_enabled:
         return jsonify({'error': 'Name game is not enabled for this event'}), 400
     
-    # Ensure the user is a guest of this event
-    if user not in event.guests and user.id != event.host_id:
-        # Add the user as a guest if they're not already
-        event.guests.append(user)
+    # Ensure the user is a guest of this event, adding them if they're not already
+    if user.id != event.host_id and add_event_guest(event_id, user.id):
         db.session.commit()
     
     data = request.json
@@ -1062,8 +1236,48 @@ def create_name_guess(event_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+@api.route('/events/<int:event_id>/guesses/batch', methods=['POST'])
+@jwt_required()
+@idempotent
+def create_guesses_batch(event_id):
+    """Place several date, hour, minute and name guesses in one transaction"""
+    user = get_user_from_jwt()
+    if not user:
+        return jsonify({'error': 'User not found'}), 401
+    
+    event = Event.query.get_or_404(event_id)
+    
+    data = request.get_json(silent=True) or {}
+    items = data.get('guesses')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'guesses must be a non-empty list'}), 400
+    if len(items) > MAX_BATCH_GUESSES:
+        return jsonify({'error': f'A single batch is limited to {MAX_BATCH_GUESSES} guesses'}), 400
+    
+    try:
+        # Membership and every accepted guess commit together
+        if user.id != event.host_id:
+            add_event_guest(event_id, user.id)
+        results = place_guesses(event, user, items)
+        db.session.commit()
+    except IntegrityError:
+        # Slot claims are serialized per event (lock_event_slots); this is a
+        # guess written without the lock taking one of these slots first
+        db.session.rollback()
+        return jsonify({'error': 'Some of these guesses were just taken, please try again'}), 409
+    
+    created = sum(1 for result in results if result['status'] == 'created')
+    return jsonify({
+        'message': f'{created} of {len(results)} guesses created',
+        'created': created,
+        'conflicts': sum(1 for result in results if result['status'] == 'conflict'),
+        'invalid': sum(1 for result in results if result['status'] == 'invalid'),
+        'results': results
+    }), 201 if created else 200
+
 @api.route('/events/<int:event_id>/guesses/<string:guess_type>/<int:guess_id>', methods=['DELETE'])
 @jwt_required()
+@idempotent
 def delete_guess(event_id, guess_type, guess_id):
     # Get user from JWT
     user = get_user_from_jwt()
@@ -1073,21 +1287,16 @@ def delete_guess(event_id, guess_type, guess_id):
     event = Event.query.get_or_404(event_id)
     
     # Determine which model to use based on guess_type
-    if guess_type == 'date':
-        guess = DateGuess.query.get_or_404(guess_id)
-        model_name = 'DateGuess'
-    elif guess_type == 'hour':
-        guess = HourGuess.query.get_or_404(guess_id)
-        model_name = 'HourGuess'
-    elif guess_type == 'minute':
-        guess = MinuteGuess.query.get_or_404(guess_id)
-        model_name = 'MinuteGuess'
-    elif guess_type == 'name':
-        guess = NameGuess.query.get_or_404(guess_id)
-        model_name = 'NameGuess'
-    else:
+    model = GUESS_MODELS.get(guess_type)
+    if not model:
         return jsonify({'error': 'Invalid guess type'}), 400
     
+    guess = model.query.get_or_404(guess_id)
+    model_name = model.__name__
+    
+    if guess.event_id != event.id:
+        return jsonify({'error': 'Guess not found'}), 404
+    
     # Ensure the user has permission to delete this guess
     # (either they are the host or it's their own guess)
     if user.id != event.host_id and user.id != guess.user_id:
@@ -1124,6 +1333,7 @@ def get_current_user():
 
 @api.route('/users/me', methods=['PUT'])
 @jwt_required()
+@idempotent
 def update_current_user():
     # Get user from JWT
     user = get_user_from_jwt()
@@ -1160,6 +1370,7 @@ def update_current_user():
         return jsonify({'error': str(e)}), 400
 
 @api.route('/events/<int:event_id>/guesses/current', methods=['GET'])
+@read_replica
 def get_current_user_guesses(event_id):
     user = None
     
@@ -1207,6 +1418,7 @@ def get_current_user_guesses(event_id):
     return jsonify(result)
 
 @api.route('/events/<int:event_id>/guesses', methods=['GET'])
+@read_replica
 def get_all_event_guesses(event_id):
     user = None
     
@@ -1225,9 +1437,15 @@ def get_all_event_guesses(event_id):
     event = Event.query.get_or_404(event_id)
     
     # Check if user is authorized (either host or guest)
-    if user.id != event.host_id and user not in event.guests:
+    if not is_event_member(event, user.id):
         return jsonify({'error': 'Unauthorized'}), 403
     
+    # Every member sees the same board; dashboards polling together share one build
+    return board_response('guesses', event, lambda: build_event_guesses(event))
+
+def build_event_guesses(event):
+    """Every guess on an event with its guest's name"""
+    event_id = event.id
     # Get all guesses for the event
     date_guesses = DateGuess.query.filter_by(event_id=event_id).all()
     hour_guesses = HourGuess.query.filter_by(event_id=event_id).all()
@@ -1276,14 +1494,122 @@ def get_all_event_guesses(event_id):
             'user_name': guess_user.get_display_name() if guess_user else 'Unknown User'
         })
     
-    return jsonify({
+    return {
         'date_guesses': date_guesses_data,
         'hour_guesses': hour_guesses_data,
         'minute_guesses': minute_guesses_data,
         'name_guesses': name_guesses_data
-    })
+    }
+
+@api.route('/events/<int:event_id>/results', methods=['POST'])
+@jwt_required()
+@idempotent
+def record_birth(event_id):
+    """Record the actual birth details and settle every pool"""
+    user = get_user_from_jwt()
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 401
+        
+    event = Event.query.get_or_404(event_id)
+    
+    # Ensure only the host can settle the event
+    if user.id != event.host_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.json or {}
+    
+    if not data.get('birth_datetime'):
+        return jsonify({'error': 'Birth date and time are required'}), 400
+    
+    try:
+        birth_datetime = datetime.strptime(data['birth_datetime'][:16], '%Y-%m-%dT%H:%M')
+    except ValueError:
+        return jsonify({'error': 'Invalid birth date/time format, expected YYYY-MM-DDTHH:MM'}), 400
+    
+    tie_rule = data.get('tie_rule') or current_app.config.get('WINNER_TIE_RULE', 'split')
+    if tie_rule not in TIE_RULES:
+        return jsonify({'error': f"Tie rule must be one of: {', '.join(TIE_RULES)}"}), 400
+    
+    try:
+        if 'baby_name' in data:
+            event.baby_name = data['baby_name']
+        if 'baby_name_revealed' in data:
+            event.baby_name_revealed = data['baby_name_revealed']
+        
+        resolve_winners(event, birth_datetime, tie_rule)
+        db.session.commit()
+        
+        return jsonify(serialize_results(event))
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+@api.route('/events/<int:event_id>/results', methods=['GET'])
+@read_replica
+def get_event_results(event_id):
+    user = None
+    
+    # Try to get user from JWT if available
+    try:
+        verify_jwt_in_request(optional=True)
+        user = get_user_from_jwt()
+    except:
+        # If JWT verification fails, try to use session-based authentication
+        if current_user.is_authenticated:
+            user = current_user
+            
+    if not user:
+        return jsonify({'error': 'User not authenticated'}), 401
+    
+    event = Event.query.get_or_404(event_id)
+    
+    # Check if user is authorized (either host or guest)
+    if not is_event_member(event, user.id):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    results = serialize_results(event)
+    if not results:
+        return jsonify({'error': 'The birth has not been recorded yet'}), 404
+    
+    return jsonify(results)
+
+@api.route('/events/<int:event_id>/simulation', methods=['GET'])
+@jwt_required()
+@read_replica
+def simulate_event_pools(event_id):
+    """Monte Carlo estimate of every guest's expected winnings (host only)"""
+    user = get_user_from_jwt()
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 401
+        
+    event = Event.query.get_or_404(event_id)
+    
+    # Ensure only the host can see the simulation
+    if user.id != event.host_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    from simulation import cached_simulation, MAX_SAMPLES
+    try:
+        samples = int(request.args.get('samples', current_app.config['SIMULATION_SAMPLES']))
+        mean_offset = float(request.args.get('mean_offset', current_app.config['WIN_PROBABILITY_MEAN_OFFSET_DAYS']))
+        sd = float(request.args.get('sd', current_app.config['WIN_PROBABILITY_SD_DAYS']))
+        seed = int(request.args['seed']) if 'seed' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'samples and seed must be integers, mean_offset and sd numbers'}), 400
+    
+    if not (1 <= samples <= MAX_SAMPLES):
+        return jsonify({'error': f'samples must be between 1 and {MAX_SAMPLES}'}), 400
+    
+    if not (0 < sd <= 60) or abs(mean_offset) > 30:
+        return jsonify({'error': 'sd must be between 0 and 60 days and mean_offset within 30 days'}), 400
+    
+    return jsonify(cached_simulation(event, samples, mean_offset, sd, seed))
 
 @api.route('/events/<int:event_id>/user/guesses', methods=['GET'])
+@read_replica
 def get_user_guesses(event_id):
     user = None
     
@@ -1302,7 +1628,7 @@ def get_user_guesses(event_id):
     event = Event.query.get_or_404(event_id)
     
     # Ensure the user is a guest of this event or the host
-    if user not in event.guests and user.id != event.host_id:
+    if not is_event_member(event, user.id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     # Get all guesses for the current user in this event
@@ -0,0 +1,119 @@
+"""
+Production server: gunicorn with the app preloaded and warmed in the master.
+
+The master builds the app, brings the schema up to date and warms it up
+(mappers, templates, the numpy-backed modules and the SQL compilation cache
+of the hot queries) before forking. Workers therefore share those pages
+copy-on-write and answer their first request at full speed. There is no
+event-code pool or search index to pre-build: codes are drawn at random and
+checked with one query when an event is created, and mothers are found
+with a LIKE query on each search, so warming those paths means compiling their SQL
+(WARM_UP_PATHS). Board responses are cached per event version and can
+only be built once there is an event to build them for. Database
+connections opened while warming are closed before the fork. Each worker
+also drops any pooled connection it inherited, so no socket or SQLite
+handle is shared between processes.
+
+    python serve.py                         # WEB_CONCURRENCY workers x WEB_THREADS threads on $PORT
+    WEB_CONCURRENCY=4 WEB_THREADS=8 python serve.py
+"""
+
+import logging
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+from sqlalchemy.orm import configure_mappers
+
+import oidc
+from app import create_app, init_schema
+from passwords import hashing_policy
+from database import replica_engines
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Routes whose queries are compiled during warm-up (the responses don't matter)
+WARM_UP_PATHS = [
+    '/',
+    '/api/events/code/0000',
+    '/api/events/find-by-mother?name=warmup',
+]
+
+
+def server_options():
+    """gunicorn settings from the environment"""
+    workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+    threads = int(os.environ.get('WEB_THREADS', 4))
+    return {
+        'bind': os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}"),
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'timeout': int(os.environ.get('WEB_TIMEOUT', 30)),
+        'graceful_timeout': int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30)),
+        'keepalive': int(os.environ.get('WEB_KEEPALIVE', 5)),
+        # Recycle workers now and then so slow leaks can't build up
+        'max_requests': int(os.environ.get('WEB_MAX_REQUESTS', 5000)),
+        'max_requests_jitter': int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 500)),
+        'preload_app': True,
+        'accesslog': os.environ.get('WEB_ACCESS_LOG'),
+    }
+
+
+def warm_up(app):
+    """Do the one-off work of a first request before the workers exist"""
+    configure_mappers()
+    # numpy and the probability model, otherwise imported by the first board request
+    import probability, simulation  # noqa: F401
+    # Calibrate password hashing once here rather than in every worker
+    hashing_policy(app)
+
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
+    client = app.test_client()
+    for path in WARM_UP_PATHS:
+        client.get(path)
+
+
+def dispose_engines(app, close=True):
+    """Drop pooled connections (close=False leaves the parent's sockets alone)"""
+    with app.app_context():
+        db.engine.dispose(close=close)
+        for engine in replica_engines(app):
+            engine.dispose(close=close)
+
+
+def post_fork(server, worker):
+    # Connections copied from the master belong to the master
+    dispose_engines(server.app.application, close=False)
+    oidc.reset_http_session()
+
+
+class ProductionServer(BaseApplication):
+    """gunicorn application serving a preloaded, warmed-up app"""
+
+    def __init__(self, options=None):
+        self.options = {**server_options(), **(options or {})}
+        self.application = None
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+        self.cfg.set('post_fork', post_fork)
+
+    def load(self):
+        if self.application is None:
+            app = create_app()
+            init_schema(app)
+            warm_up(app)
+            dispose_engines(app)
+            self.application = app
+        return self.application
+
+
+if __name__ == '__main__':
+    ProductionServer().run()
@@ -0,0 +1,33 @@
+"""
+Batch settlement script.
+
+Resolves the date, hour, minute and name pools for every event whose birth
+has been recorded but not yet settled. Pass event ids to settle (or
+re-settle) specific events.
+
+    python settle_events.py
+    python settle_events.py 12 15 --tie-rule first_claimed
+"""
+
+import argparse
+
+from app import create_app
+from winners import settle_events, TIE_RULES
+
+def main():
+    parser = argparse.ArgumentParser(description='Settle baby pool events')
+    parser.add_argument('event_ids', nargs='*', type=int, help='Events to settle (default: all unsettled)')
+    parser.add_argument('--tie-rule', choices=TIE_RULES, help='Override the tie rule stored with each event')
+    parser.add_argument('--resettle', action='store_true', help='Also re-settle events that were already settled')
+    args = parser.parse_args()
+    
+    with create_app().app_context():
+        results = settle_events(args.event_ids or None, tie_rule=args.tie_rule, resettle=args.resettle)
+    
+    if not results:
+        print("No events to settle.")
+    for event_id, result in results.items():
+        print(f"Event {event_id}: {result if isinstance(result, str) else f'{result} winners'}")
+
+if __name__ == "__main__":
+    main()
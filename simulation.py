@@ -0,0 +1,161 @@
+"""
+Monte Carlo simulation of pool outcomes for hosts.
+
+Birth datetimes are sampled from the same model the win probabilities use
+(a normal curve of days around the due date, uniform hours and minutes),
+each sample is settled against the current boards the way
+winners.resolve_winners settles a real birth (nearest slot wins, hours and
+minutes wrap, ties split per guess), and the payouts are averaged into each
+guest's expected winnings. The jackpot pays nothing beyond the hour and
+minute pots, so it is reported only as each guest's chance of hitting it.
+
+Sampling and settlement are batched NumPy array operations over chunks of
+samples; the only Python loop is over chunks. The name pool cannot be
+simulated (there is no distribution over names) and is left out.
+"""
+
+import numpy as np
+
+from cache import LRUCache
+from models import db, User, DateGuess, HourGuess, MinuteGuess, count_guesses
+from probability import day_distribution, distance_matrix, DEFAULT_MEAN_OFFSET_DAYS, DEFAULT_SD_DAYS
+from winners import hour_slot, HOURS_PER_DAY, MINUTES_PER_HOUR
+
+DEFAULT_SAMPLES = 20000
+MAX_SAMPLES = 200000
+# Samples settled per batch; bounds the (samples x slots) matrices to a few MB
+SAMPLE_CHUNK = 8192
+
+SIMULATED_POOLS = ('date', 'hour', 'minute')
+
+# Results keyed by (event_id, event version, samples, distribution, seed)
+_simulation_cache = LRUCache(maxsize=128)
+
+
+def _claims_matrix(slots, users, user_columns):
+    """Distinct claimed slots and a (slots x users) matrix of guess counts"""
+    distinct, slot_index = np.unique(np.asarray(slots, dtype=np.int64), return_inverse=True)
+    counts = np.zeros((len(distinct), len(user_columns)))
+    np.add.at(counts, (slot_index, [user_columns[user_id] for user_id in users]), 1.0)
+    return distinct, counts
+
+
+def settle_samples(samples, slots, counts, pot, circular_size=None):
+    """Payout to every user for every sample, shape (samples x users).
+
+    Every guess on a nearest slot gets an equal share of the pot, the same
+    split rule winners.resolve_winners applies to ties.
+    """
+    if not len(slots):
+        return np.zeros((len(samples), counts.shape[1]))
+    distances = distance_matrix(samples, slots, circular_size)
+    is_nearest = (distances == distances.min(axis=1)[:, None]).astype(float)
+    winning_guesses = is_nearest @ counts
+    return winning_guesses * (pot / winning_guesses.sum(axis=1))[:, None]
+
+
+def _load_board(event_id):
+    """Claimed slots per pool as (slot, user_id) arrays, with hours as 0-23"""
+    dates = db.session.query(DateGuess.guess_date, DateGuess.user_id) \
+        .filter(DateGuess.event_id == event_id).all()
+    hours = db.session.query(HourGuess.hour, HourGuess.am_pm, HourGuess.user_id) \
+        .filter(HourGuess.event_id == event_id).all()
+    minutes = db.session.query(MinuteGuess.minute, MinuteGuess.user_id) \
+        .filter(MinuteGuess.event_id == event_id).all()
+    return {
+        'date': [(guess_date, user_id) for guess_date, user_id in dates],
+        'hour': [(hour_slot(hour, am_pm), user_id) for hour, am_pm, user_id in hours],
+        'minute': [(minute, user_id) for minute, user_id in minutes],
+    }
+
+
+def _guess_counts(event_id):
+    """Total guesses per user across every pool, including names"""
+    return {user_id: sum(counts.values()) for user_id, counts in count_guesses(event_id).items()}
+
+
+def simulate_event(event, samples=DEFAULT_SAMPLES, mean_offset=DEFAULT_MEAN_OFFSET_DAYS,
+                   sd=DEFAULT_SD_DAYS, seed=None):
+    """Expected winnings per guest over sampled birth datetimes.
+
+    Without a seed the generator is seeded from the event id and version,
+    so repeated runs against an unchanged board agree.
+    """
+    board = _load_board(event.id)
+    guess_counts = _guess_counts(event.id)
+    user_ids = sorted(guess_counts)
+    user_columns = {user_id: column for column, user_id in enumerate(user_ids)}
+    price = event.guess_price or 0
+
+    pools = {}
+    for pool, claims in board.items():
+        slots = [slot for slot, _ in claims]
+        if pool == 'date':
+            slots = [(guess_date - event.due_date).days for guess_date in slots]
+        distinct, counts = _claims_matrix(slots, [user_id for _, user_id in claims], user_columns)
+        pools[pool] = (distinct, counts, len(claims) * price)
+
+    rng = np.random.default_rng(seed if seed is not None else [event.id, event.version or 0])
+    day_offsets, day_pmf = day_distribution(mean_offset, sd)
+
+    totals = {pool: np.zeros(len(user_ids)) for pool in SIMULATED_POOLS}
+    wins = np.zeros(len(user_ids))
+    jackpots = np.zeros(len(user_ids))
+
+    for start in range(0, samples, SAMPLE_CHUNK):
+        size = min(SAMPLE_CHUNK, samples - start)
+        payouts = {
+            'date': settle_samples(rng.choice(day_offsets, size=size, p=day_pmf), *pools['date']),
+            'hour': settle_samples(rng.integers(0, HOURS_PER_DAY, size), *pools['hour'], HOURS_PER_DAY),
+            'minute': settle_samples(rng.integers(0, MINUTES_PER_HOUR, size), *pools['minute'], MINUTES_PER_HOUR),
+        }
+        for pool in SIMULATED_POOLS:
+            totals[pool] += payouts[pool].sum(axis=0)
+        wins += (sum(payouts.values()) > 0).sum(axis=0)
+        # Winning both the hour and the minute pool is the jackpot; it is already paid above
+        jackpots += ((payouts['hour'] > 0) & (payouts['minute'] > 0)).sum(axis=0)
+
+    names = {
+        user.id: user.get_display_name()
+        for user in User.query.filter(User.id.in_(user_ids)).all()
+    } if user_ids else {}
+
+    guests = []
+    for column, user_id in enumerate(user_ids):
+        expected = {pool: round(float(totals[pool][column]) / samples, 2) for pool in SIMULATED_POOLS}
+        expected_total = round(sum(float(totals[pool][column]) for pool in SIMULATED_POOLS) / samples, 2)
+        spent = round(guess_counts[user_id] * price, 2)
+        guests.append({
+            'user_id': user_id,
+            'display_name': names.get(user_id, 'Unknown User'),
+            'guesses': guess_counts[user_id],
+            'spent': spent,
+            'expected_winnings': expected,
+            'expected_total': expected_total,
+            'expected_net': round(expected_total - spent, 2),
+            'win_probability': round(float(wins[column]) / samples, 4),
+            'p_jackpot': round(float(jackpots[column]) / samples, 4)
+        })
+    guests.sort(key=lambda guest: (-guest['expected_total'], guest['user_id']))
+
+    return {
+        'event_id': event.id,
+        'version': event.version,
+        'samples': samples,
+        'mean_offset': mean_offset,
+        'sd': sd,
+        'seed': seed,
+        'pots': {pool: pools[pool][2] for pool in ('date', 'hour', 'minute')},
+        'guests': guests
+    }
+
+
+def cached_simulation(event, samples=DEFAULT_SAMPLES, mean_offset=DEFAULT_MEAN_OFFSET_DAYS,
+                      sd=DEFAULT_SD_DAYS, seed=None):
+    """simulate_event, cached per event version"""
+    key = (event.id, event.version, samples, float(mean_offset), float(sd), seed)
+    result = _simulation_cache.get(key)
+    if result is None:
+        result = simulate_event(event, samples, mean_offset, sd, seed)
+        _simulation_cache.set(key, result)
+    return result
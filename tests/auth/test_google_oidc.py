@@ -0,0 +1,194 @@
+"""
+Tests for the Google sign-in against a local stand-in OpenID Connect server.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from app import create_app, init_schema
+import oidc
+from models import db, User
+
+CLIENT_ID = 'client-id.apps.googleusercontent.com'
+
+def new_signing_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    public_jwk.update(kid=kid, use='sig', alg='RS256')
+    return private_key, public_jwk
+
+class StandInProvider(ThreadingHTTPServer):
+    """Discovery, JWKS, token and userinfo endpoints, counting requests and connections"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), ProviderHandler)
+        self.issuer = f'http://127.0.0.1:{self.server_port}'
+        self.private_key, public_jwk = new_signing_key('key-1')
+        self.jwks = {'keys': [public_jwk]}
+        self.requests = []
+        self.connections = set()
+        self.id_token_claims = {'email': 'oidc@example.com', 'email_verified': True, 'given_name': 'Oidc'}
+        self.audience = CLIENT_ID
+
+    def rotate_key(self):
+        self.private_key, public_jwk = new_signing_key('key-2')
+        self.jwks = {'keys': [public_jwk]}
+
+    def id_token(self):
+        now = int(time.time())
+        claims = {'iss': self.issuer, 'aud': self.audience, 'sub': '1234', 'iat': now, 'exp': now + 600,
+                  **self.id_token_claims}
+        return jwt.encode(claims, self.private_key, algorithm='RS256',
+                          headers={'kid': self.jwks['keys'][0]['kid']})
+
+class ProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, document, cache_control=None):
+        body = json.dumps(document).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if cache_control:
+            self.send_header('Cache-Control', cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def record(self):
+        self.server.requests.append(urlparse(self.path).path)
+        self.server.connections.add(self.client_address)
+
+    def do_GET(self):
+        self.record()
+        path = urlparse(self.path).path
+        issuer = self.server.issuer
+        if path == '/.well-known/openid-configuration':
+            self.reply({
+                'issuer': issuer,
+                'authorization_endpoint': f'{issuer}/auth',
+                'token_endpoint': f'{issuer}/token',
+                'userinfo_endpoint': f'{issuer}/userinfo',
+                'jwks_uri': f'{issuer}/certs',
+            }, 'public, max-age=3600')
+        elif path == '/certs':
+            self.reply(self.server.jwks, 'public, max-age=20000, must-revalidate')
+        elif path == '/userinfo':
+            self.reply({'email': 'userinfo@example.com', 'email_verified': True, 'given_name': 'Info'})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        self.record()
+        body = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        assert body['code'] == ['the-code']
+        self.reply({'access_token': 'access', 'token_type': 'Bearer', 'expires_in': 3600,
+                    'id_token': self.server.id_token()})
+
+class CacheTtlTestCase(unittest.TestCase):
+    """Test cases for reading freshness from HTTP headers"""
+
+    def test_cache_headers(self):
+        self.assertEqual(oidc.cache_ttl({'Cache-Control': 'public, max-age=600'}), 600)
+        self.assertEqual(oidc.cache_ttl({'Cache-Control': 'max-age=600', 'Age': '100'}), 500)
+        self.assertEqual(oidc.cache_ttl({'Cache-Control': 'no-store'}), 0)
+        self.assertEqual(oidc.cache_ttl({'Expires': 'Sun, 01 Feb 2026 10:10:00 GMT',
+                                         'Date': 'Sun, 01 Feb 2026 10:00:00 GMT'}), 600)
+        self.assertEqual(oidc.cache_ttl({}), oidc.DEFAULT_TTL)
+
+class GoogleOidcTestCase(unittest.TestCase):
+    """Test cases for the Flask sign-in routes"""
+
+    def setUp(self):
+        # The stand-in speaks plain HTTP, which oauthlib refuses by default
+        patcher = mock.patch.dict(os.environ, {'OAUTHLIB_INSECURE_TRANSPORT': '1'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.provider = StandInProvider()
+        threading.Thread(target=self.provider.serve_forever, daemon=True).start()
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'oidc.db')}",
+            'TESTING': True,
+            'GOOGLE_OAUTH_CLIENT_ID': CLIENT_ID,
+            'GOOGLE_OAUTH_CLIENT_SECRET': 'secret',
+            'GOOGLE_DISCOVERY_URL': f'{self.provider.issuer}/.well-known/openid-configuration',
+        })
+        init_schema(self.app)
+        oidc.documents.clear()
+        oidc.reset_http_session()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.provider.shutdown()
+        self.provider.server_close()
+        oidc.reset_http_session()
+        oidc.documents.clear()
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def sign_in(self):
+        return self.client.get('/google_auth/google_login/callback?code=the-code')
+
+    def test_login_uses_the_cached_discovery_document(self):
+        for _ in range(3):
+            response = self.client.get('/google_auth/google_login')
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response.headers['Location'].startswith(f'{self.provider.issuer}/auth?'))
+        self.assertEqual(self.provider.requests, ['/.well-known/openid-configuration'])
+
+    def test_id_token_is_verified_locally(self):
+        for _ in range(2):
+            self.assertEqual(self.sign_in().status_code, 200)
+        # Discovery and keys once, then only the token exchange; userinfo is never called
+        self.assertEqual(self.provider.requests,
+                         ['/.well-known/openid-configuration', '/token', '/certs', '/token'])
+        # All over one kept-alive connection
+        self.assertEqual(len(self.provider.connections), 1)
+        with self.app.app_context():
+            self.assertEqual(User.query.filter_by(email='oidc@example.com').one().first_name, 'Oidc')
+
+    def test_rotated_keys_are_refetched(self):
+        self.sign_in()
+        self.provider.rotate_key()
+        self.assertEqual(self.sign_in().status_code, 200)
+        self.assertEqual(self.provider.requests.count('/certs'), 2)
+
+    def test_unknown_key_after_refresh_is_rejected(self):
+        self.sign_in()
+        # Signed with a key the provider never published
+        signed = self.provider.id_token
+        forged_key, _ = new_signing_key('forged')
+        self.provider.id_token = lambda: jwt.encode(jwt.decode(signed(), options={'verify_signature': False}),
+                                                    forged_key, algorithm='RS256', headers={'kid': 'forged'})
+        self.assertEqual(self.sign_in().status_code, 400)
+        self.assertEqual(self.provider.requests.count('/certs'), 2)
+
+    def test_token_for_another_client_is_rejected(self):
+        self.provider.audience = 'someone-else'
+        response = self.sign_in()
+        self.assertEqual(response.status_code, 400)
+        with self.app.app_context():
+            self.assertIsNone(User.query.filter_by(email='oidc@example.com').first())
+
+    def test_userinfo_when_verification_is_off(self):
+        self.app.config['GOOGLE_VERIFY_ID_TOKEN'] = False
+        self.assertEqual(self.sign_in().status_code, 200)
+        self.assertIn('/userinfo', self.provider.requests)
+        self.assertNotIn('/certs', self.provider.requests)
+        with self.app.app_context():
+            self.assertIsNotNone(User.query.filter_by(email='userinfo@example.com').first())
+
+if __name__ == '__main__':
+    unittest.main()
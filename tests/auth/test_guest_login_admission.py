@@ -0,0 +1,123 @@
+"""
+Tests for the admission gate in front of guest login.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date
+from flask_jwt_extended import create_access_token
+from admission import AdmissionGate, AdmissionRejected, admission_gate
+from app import create_app, init_schema
+import metrics
+from models import db, User, Event
+
+class AdmissionGateTestCase(unittest.TestCase):
+    """Test cases for the gate itself"""
+
+    def tearDown(self):
+        metrics.reset()
+
+    def enter_later(self, gate, priority, entered):
+        def enter():
+            gate.acquire(priority)
+            entered.append(priority)
+        thread = threading.Thread(target=enter)
+        thread.start()
+        while gate.waiting[priority] == 0 and thread.is_alive():
+            time.sleep(0.005)
+        return thread
+
+    def test_full_queue_is_refused_at_once(self):
+        gate = AdmissionGate('test', limit=1, queue=0, timeout=5, retry_after=3)
+        gate.acquire()
+        started = time.perf_counter()
+        with self.assertRaises(AdmissionRejected) as caught:
+            gate.acquire()
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(caught.exception.retry_after, 3)
+        gate.release()
+        gate.acquire()
+
+    def test_queued_request_times_out(self):
+        gate = AdmissionGate('test', limit=1, queue=1, timeout=0.05)
+        gate.acquire()
+        with self.assertRaises(AdmissionRejected):
+            gate.acquire()
+        self.assertEqual(gate.waiting, {False: 0, True: 0})
+        self.assertEqual(metrics.value('admission_rejections_total', gate='test', reason='timeout'), 1)
+
+    def test_token_holders_go_first(self):
+        gate = AdmissionGate('test', limit=1, queue=2, timeout=5)
+        gate.acquire()
+        entered = []
+        ordinary = self.enter_later(gate, False, entered)
+        priority = self.enter_later(gate, True, entered)
+        gate.release()
+        priority.join(5)
+        self.assertEqual(entered, [True])
+        gate.release()
+        ordinary.join(5)
+        self.assertEqual(entered, [True, False])
+
+class GuestLoginAdmissionTestCase(unittest.TestCase):
+    """Test cases for /auth/guest/login behind its gate"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'admission.db')}",
+            'TESTING': True,
+            'ADMISSION_GATES': {'guest_login': {'limit': 1, 'queue': 1, 'timeout': 0.1}},
+        })
+        init_schema(self.app)
+        with self.app.app_context():
+            host = User(email='gatehost@example.com', is_host=True)
+            db.session.add(host)
+            db.session.flush()
+            db.session.add(Event(event_code='6464', title='Gated Shower', host_id=host.id, mother_name='Jane Doe',
+                                 event_date=date(2026, 1, 1), due_date=date(2026, 2, 1)))
+            db.session.commit()
+            self.token = create_access_token(identity=str(host.id))
+            self.gate = admission_gate('guest_login', self.app)
+        metrics.reset()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def login(self, **headers):
+        return self.client.post('/auth/guest/login', headers=headers, json={
+            'login_type': 'event_code', 'event_code': '6464', 'first_name': 'Ann', 'last_name': 'Guest'})
+
+    def test_saturated_gate_returns_429(self):
+        self.gate.acquire()
+        try:
+            response = self.login()
+        finally:
+            self.gate.release()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.gate.active, 0)
+
+    def test_token_holder_is_admitted_when_a_slot_frees_up(self):
+        self.gate.acquire()
+        threading.Timer(0.03, self.gate.release).start()
+        response = self.login(Authorization=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(metrics.value('admission_admitted_total', gate='guest_login', priority='true'), 1)
+
+    def test_page_loads_are_not_gated(self):
+        self.gate.acquire()
+        try:
+            self.assertEqual(self.client.get('/auth/guest/login').status_code, 200)
+        finally:
+            self.gate.release()
+
+if __name__ == '__main__':
+    unittest.main()
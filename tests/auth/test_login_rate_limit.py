@@ -0,0 +1,140 @@
+"""
+Tests for host login rate limiting and the bounded password hashing pool.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from app import create_app, init_schema
+import metrics
+import passwords
+from models import db, User
+from passwords import HashPool, HasherBusy
+from ratelimit import TokenBucketLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TokenBucketTestCase(unittest.TestCase):
+    """Test cases for the token buckets"""
+
+    def test_burst_then_refill(self):
+        clock = FakeClock()
+        limiter = TokenBucketLimiter(rate=0.5, burst=2, clock=clock)
+        self.assertTrue(limiter.acquire('a')[0])
+        self.assertTrue(limiter.acquire('a')[0])
+        allowed, retry_after = limiter.acquire('a')
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 2)
+        # Other keys have their own bucket
+        self.assertTrue(limiter.acquire('b')[0])
+        clock.now = 2
+        self.assertTrue(limiter.acquire('a')[0])
+        self.assertFalse(limiter.acquire('a')[0])
+
+    def test_keys_are_bounded(self):
+        limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=3)
+        for key in range(10):
+            limiter.acquire(key)
+        self.assertEqual(len(limiter), 3)
+
+class HashPoolTestCase(unittest.TestCase):
+    """Test cases for the bounded password pool"""
+
+    def test_full_backlog_is_rejected_at_once(self):
+        pool = HashPool(workers=1, max_queue=1, timeout=5)
+        self.addCleanup(pool.shutdown)
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'done'
+
+        # One job running and one waiting fill the pool
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(pool.run(slow))) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        started.wait(5)
+        while metrics.value('password_hash_queue_depth') < 2:
+            time.sleep(0.01)
+        with self.assertRaises(HasherBusy):
+            pool.run(slow)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ['done', 'done'])
+        self.assertEqual(pool.run(len, 'abc'), 3)
+
+class LoginRateLimitTestCase(unittest.TestCase):
+    """Test cases for /auth/host/login"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'login.db')}",
+            'TESTING': True,
+            'LOGIN_EMAIL_BURST': 3,
+            'LOGIN_IP_BURST': 5,
+        })
+        init_schema(self.app)
+        self.client = self.app.test_client()
+        response = self.client.post('/auth/host/register', json={
+            'email': 'limit@example.com', 'password': 'correct horse',
+            'first_name': 'Lim', 'last_name': 'It'})
+        self.assertEqual(response.status_code, 201)
+        metrics.reset()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def login(self, email='limit@example.com', password='wrong'):
+        return self.client.post('/auth/host/login', json={'email': email, 'password': password})
+
+    def test_registration_hashes_on_the_pool(self):
+        with self.app.app_context():
+            user = User.query.filter_by(email='limit@example.com').one()
+            self.assertTrue(user.password_hash.startswith('pbkdf2:sha256:'))
+        self.assertEqual(self.login(password='correct horse').status_code, 200)
+        self.assertEqual(metrics.value('password_hash_jobs_total'), 1)
+        self.assertEqual(metrics.summary('login_duration_seconds', outcome='success')[0], 1)
+
+    def test_email_limit_rejects_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 401)
+        response = self.login(password='correct horse')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertEqual(metrics.value('password_hash_jobs_total'), 3)
+        self.assertEqual(metrics.value('login_rejections_total', reason='bad_password'), 3)
+        self.assertEqual(metrics.value('login_rejections_total', reason='rate_limited_email'), 1)
+        self.assertEqual(metrics.summary('login_duration_seconds', outcome='rate_limited')[0], 1)
+
+    def test_ip_limit_covers_all_emails(self):
+        for number in range(5):
+            self.assertEqual(self.login(email=f'nobody{number}@example.com').status_code, 401)
+        self.assertEqual(self.login(email='someone@example.com').status_code, 429)
+        self.assertEqual(metrics.value('login_rejections_total', reason='rate_limited_ip'), 1)
+        self.assertEqual(metrics.value('password_hash_jobs_total'), 0)
+        self.assertIn('login_rejections_total{reason="unknown_email"} 5', metrics.render())
+
+    def test_busy_pool_returns_503(self):
+        with mock.patch.object(passwords.HashPool, 'run', side_effect=HasherBusy('full', retry_after=2)):
+            response = self.login(password='correct horse')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '2')
+        self.assertEqual(metrics.summary('login_duration_seconds', outcome='busy')[0], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Tests for the password hashing policy and the upgrade of old hashes at login.
+"""
+
+import hashlib
+import hmac
+import os
+import tempfile
+import unittest
+import bcrypt
+from werkzeug.security import generate_password_hash
+from app import create_app, init_schema
+import auth
+import hashing
+import metrics
+from hashing import HashingPolicy
+from models import db, User
+
+class HashingPolicyTestCase(unittest.TestCase):
+    """Test cases for hashing.py"""
+
+    def setUp(self):
+        self.policy = HashingPolicy(iterations=20000)
+
+    def test_round_trip(self):
+        stored = self.policy.hash('s3cret')
+        self.assertTrue(stored.startswith('pbkdf2:sha256:20000$'))
+        self.assertTrue(self.policy.verify(stored, 's3cret'))
+        self.assertFalse(self.policy.verify(stored, 'wrong'))
+        self.assertFalse(self.policy.needs_rehash(stored))
+
+    def test_legacy_formats(self):
+        legacy = {
+            'scrypt': generate_password_hash('s3cret', 'scrypt'),
+            'weaker pbkdf2': generate_password_hash('s3cret', 'pbkdf2:sha256:10000'),
+            'bcrypt': bcrypt.hashpw(b's3cret', bcrypt.gensalt(rounds=4)).decode(),
+            'salted hmac': 'sha256$pepper$' + hmac.new(b'pepper', b's3cret', 'sha256').hexdigest(),
+            'plain digest': 'sha1$$' + hashlib.sha1(b's3cret').hexdigest(),
+        }
+        for name, stored in legacy.items():
+            with self.subTest(name):
+                self.assertTrue(self.policy.verify(stored, 's3cret'))
+                self.assertFalse(self.policy.verify(stored, 'wrong'))
+                self.assertTrue(self.policy.needs_rehash(stored))
+
+    def test_unknown_formats_never_verify(self):
+        for stored in (None, '', 'plaintext', 'md4$x$y', 'pbkdf2:sha256:x$salt$hash'):
+            with self.subTest(stored):
+                self.assertFalse(self.policy.verify(stored, 'plaintext'))
+
+    def test_calibration(self):
+        self.assertEqual(hashing.calibrate(0.0001, minimum=30000), 30000)
+        fast, slow = hashing.calibrate(0.01, minimum=0), hashing.calibrate(0.05, minimum=0)
+        self.assertEqual(slow % 10000, 0)
+        self.assertGreater(slow, fast)
+
+class RehashOnLoginTestCase(unittest.TestCase):
+    """Test cases for upgrading stored hashes when a host logs in"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'rehash.db')}",
+            'TESTING': True,
+            'PASSWORD_HASH_ITERATIONS': 20000,
+        })
+        init_schema(self.app)
+        with self.app.app_context():
+            db.session.add(User(email='scrypthost@example.com', is_host=True,
+                                password_hash=generate_password_hash('password', 'scrypt')))
+            db.session.commit()
+        self.client = self.app.test_client()
+        metrics.reset()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def login(self, password='password'):
+        return self.client.post('/auth/host/login', json={'email': 'scrypthost@example.com', 'password': password})
+
+    def stored_hash(self):
+        with self.app.app_context():
+            return User.query.filter_by(email='scrypthost@example.com').one().password_hash
+
+    def test_old_hash_is_upgraded_once(self):
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertTrue(self.stored_hash().startswith('scrypt:'))
+
+        self.assertEqual(self.login().status_code, 200)
+        self.assertTrue(self.stored_hash().startswith('pbkdf2:sha256:20000$'))
+        # Verify twice and hash once so far
+        self.assertEqual(metrics.value('password_hash_jobs_total'), 3)
+
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(metrics.value('password_hash_jobs_total'), 4)
+
+    def test_hashing_holds_no_transaction(self):
+        """A write transaction holds SQLite's writer lock, so every other write would wait on the hash"""
+        in_transaction = []
+
+        def recording(function):
+            def wrapper(*args):
+                in_transaction.append(db.session().in_transaction())
+                return function(*args)
+            return wrapper
+
+        for name in ('verify_password', 'hash_password'):
+            self.addCleanup(setattr, auth, name, getattr(auth, name))
+            setattr(auth, name, recording(getattr(auth, name)))
+
+        # Verify, then rehash the old scrypt hash
+        self.assertEqual(self.login().status_code, 200)
+        self.assertTrue(self.stored_hash().startswith('pbkdf2:sha256:20000$'))
+        response = self.client.post('/auth/host/register', json={
+            'email': 'newhost@example.com', 'password': 'password', 'first_name': 'New', 'last_name': 'Host'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(in_transaction, [False] * 3)
+
+if __name__ == '__main__':
+    unittest.main()
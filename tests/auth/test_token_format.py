@@ -0,0 +1,92 @@
+"""
+Tests for the compact token format and the identity decoder.
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+from flask import make_response
+from flask_jwt_extended import create_access_token, decode_token, set_refresh_cookies
+from app import create_app, init_schema
+from models import db, User
+from tokens import issue_tokens, user_id_from_identity
+
+class IdentityDecoderTestCase(unittest.TestCase):
+    """Test cases for user_id_from_identity"""
+
+    def test_every_identity_shape(self):
+        self.assertEqual(user_id_from_identity('42'), 42)
+        self.assertEqual(user_id_from_identity(42), 42)
+        self.assertEqual(user_id_from_identity({'id': 42, 'email': 'a@example.com'}), 42)
+        self.assertEqual(user_id_from_identity({'id': '42'}), 42)
+        for identity in (None, '', 'abc', '-1', True, {}, {'email': 'a@example.com'}, 4.2):
+            with self.subTest(identity):
+                self.assertIsNone(user_id_from_identity(identity))
+
+class TokenFormatTestCase(unittest.TestCase):
+    """Test cases for minting and accepting tokens"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'tokens.db')}",
+            'TESTING': True,
+        })
+        init_schema(self.app)
+        with self.app.app_context():
+            host = User(email='tokenhost@example.com', is_host=True)
+            guest = User(email='tokenguest@example.com', is_host=False)
+            db.session.add_all([host, guest])
+            db.session.commit()
+            self.host_id, self.guest_id = host.id, guest.id
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def test_compact_claims_and_lifetimes(self):
+        with self.app.app_context():
+            for user_id, access_days, refresh_days in ((self.host_id, 7, 30), (self.guest_id, 30, 60)):
+                access, refresh = issue_tokens(db.session.get(User, user_id))
+                access_claims, refresh_claims = decode_token(access), decode_token(refresh)
+                # csrf pairs the token with its cookie's CSRF double-submit value
+                self.assertEqual(set(access_claims), {'sub', 'type', 'exp', 'iat', 'jti', 'csrf', 'fresh'})
+                self.assertEqual(set(refresh_claims), {'sub', 'type', 'exp', 'iat', 'jti', 'csrf', 'fresh'})
+                self.assertEqual(access_claims['sub'], str(user_id))
+                self.assertEqual(access_claims['exp'] - access_claims['iat'], access_days * 86400)
+                self.assertEqual(refresh_claims['exp'] - refresh_claims['iat'], refresh_days * 86400)
+
+    def test_legacy_tokens_still_accepted(self):
+        with self.app.app_context():
+            legacy = [
+                create_access_token(identity={'id': self.guest_id, 'email': 'tokenguest@example.com'},
+                                    additional_claims={'is_host': False}, expires_delta=timedelta(days=30)),
+                create_access_token(identity=self.guest_id, expires_delta=timedelta(days=60)),
+            ]
+        for token in legacy:
+            response = self.client.get('/auth/verify-token', headers={'Authorization': f'Bearer {token}'})
+            self.assertTrue(response.json['valid'])
+            self.assertEqual(response.json['user_id'], self.guest_id)
+
+    def test_refresh_cookie_is_scoped_to_refresh(self):
+        with self.app.app_context():
+            _, refresh = issue_tokens(db.session.get(User, self.host_id))
+        response = self.client.post('/auth/token/refresh', headers={'Authorization': f'Bearer {refresh}'})
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            claims = decode_token(response.json['access_token'])
+        self.assertEqual(claims['sub'], str(self.host_id))
+        self.assertEqual(claims['exp'] - claims['iat'], 7 * 86400)
+
+        with self.app.test_request_context():
+            cookie_response = make_response('')
+            set_refresh_cookies(cookie_response, refresh)
+        cookies = [header for header in cookie_response.headers.getlist('Set-Cookie')
+                   if header.startswith('refresh_token_cookie=')]
+        self.assertIn('Path=/auth/token/refresh', cookies[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Tests for token revocation at logout and refresh token rotation.
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event as sa_event
+from app import create_app, init_schema
+from models import db, User, RevokedToken
+from revocation import RevocationList, revocation_list
+from tokens import issue_tokens
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class RevocationTestCase(unittest.TestCase):
+    """Test cases for revocation.py and the endpoints using it"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'revocation.db')}",
+            'TESTING': True,
+        })
+        init_schema(self.app)
+        with self.app.app_context():
+            user = User(email='revokeguest@example.com', is_host=False)
+            db.session.add(user)
+            db.session.commit()
+            self.access, self.refresh = issue_tokens(user)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def verify(self, token):
+        return self.client.get('/auth/verify-token', headers={'Authorization': f'Bearer {token}'})
+
+    def refresh_with(self, token):
+        return self.client.post('/auth/token/refresh', headers={'Authorization': f'Bearer {token}'})
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        self.assertEqual(self.verify(self.access).status_code, 200)
+        response = self.client.post('/auth/logout', json={'refresh_token': self.refresh},
+                                    headers={'Authorization': f'Bearer {self.access}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.verify(self.access).status_code, 401)
+        self.assertEqual(self.refresh_with(self.refresh).status_code, 401)
+        with self.app.app_context():
+            self.assertEqual(RevokedToken.query.count(), 2)
+
+    def test_refresh_tokens_are_single_use(self):
+        response = self.refresh_with(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json['refresh_token']
+        self.assertNotEqual(rotated, self.refresh)
+        self.assertEqual(self.verify(response.json['access_token']).status_code, 200)
+
+        self.assertEqual(self.refresh_with(self.refresh).status_code, 401)
+        self.assertEqual(self.refresh_with(rotated).status_code, 200)
+
+    def test_checks_read_the_table_only_when_due(self):
+        clock = FakeClock()
+        revocations = RevocationList(sync_seconds=10, prune_seconds=100, clock=clock)
+        statements = []
+        with self.app.app_context():
+            sa_event.listen(db.engine, 'before_cursor_execute',
+                            lambda conn, cursor, statement, *args: statements.append(statement))
+            self.assertFalse(revocations.is_revoked('a'))
+            self.assertTrue(statements)
+
+            # Revoked by another worker process, plus one already expired
+            db.session.add_all([
+                RevokedToken(jti='a', expires_at=datetime.utcnow() + timedelta(days=1)),
+                RevokedToken(jti='old', expires_at=datetime.utcnow() - timedelta(seconds=1)),
+            ])
+            db.session.commit()
+            del statements[:]
+            clock.now = 5
+            for _ in range(100):
+                self.assertFalse(revocations.is_revoked('a'))
+            self.assertEqual(statements, [])
+
+            clock.now = 10
+            self.assertTrue(revocations.is_revoked('a'))
+            self.assertFalse(revocations.is_revoked('old'))
+            self.assertEqual(len(revocations), 1)
+
+            clock.now = 100
+            revocations.is_revoked('a')
+            self.assertEqual([token.jti for token in RevokedToken.query.all()], ['a'])
+
+    def test_revocations_in_this_process_count_at_once(self):
+        with self.app.app_context():
+            revocation_list().is_revoked('warm up')
+        self.client.post('/auth/logout', headers={'Authorization': f'Bearer {self.access}'})
+        with self.app.app_context():
+            self.assertEqual(len(revocation_list()), 1)
+        self.assertEqual(self.verify(self.access).status_code, 401)
+
+if __name__ == '__main__':
+    unittest.main()
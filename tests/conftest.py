@@ -0,0 +1,13 @@
+"""
+Shared test setup.
+
+Importing the app no longer creates the schema, so the tables are created
+once per test session here.
+"""
+
+import pytest
+from app import app, init_schema
+
+@pytest.fixture(scope='session', autouse=True)
+def schema():
+    init_schema(app)
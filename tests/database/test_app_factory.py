@@ -0,0 +1,64 @@
+"""
+Tests for the application factory.
+"""
+
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, inspect, text
+from app import create_app, init_schema
+
+class AppFactoryTestCase(unittest.TestCase):
+    """Test cases for building apps without side effects"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.directory.name, 'factory.db')}"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def table_names(self):
+        engine = create_engine(self.url)
+        try:
+            return inspect(engine).get_table_names()
+        finally:
+            engine.dispose()
+
+    def test_building_an_app_leaves_the_schema_alone(self):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': self.url})
+        self.assertEqual(self.table_names(), [])
+
+        init_schema(app)
+        self.assertIn('user', self.table_names())
+        self.assertIn('event', self.table_names())
+        with app.app_context():
+            app.extensions['sqlalchemy'].engine.dispose()
+
+    def test_google_blueprint_needs_credentials(self):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': self.url,
+                          'GOOGLE_OAUTH_CLIENT_ID': None, 'GOOGLE_OAUTH_CLIENT_SECRET': None})
+        self.assertNotIn('google_auth', app.blueprints)
+        self.assertIn('api', app.blueprints)
+
+        app = create_app({'SQLALCHEMY_DATABASE_URI': self.url,
+                          'GOOGLE_OAUTH_CLIENT_ID': 'id', 'GOOGLE_OAUTH_CLIENT_SECRET': 'secret'})
+        self.assertIn('google_auth', app.blueprints)
+
+    def test_engine_options_follow_an_overridden_uri(self):
+        # Whatever DATABASE_URL was at import, an in-memory database gets no pool sizing
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+        self.assertEqual(app.config['SQLALCHEMY_ENGINE_OPTIONS'], {})
+        init_schema(app)
+        with app.app_context():
+            engine = app.extensions['sqlalchemy'].engine
+            with engine.connect() as connection:
+                self.assertEqual(connection.execute(text('SELECT 1')).scalar(), 1)
+            self.assertIn('user', inspect(engine).get_table_names())
+
+        # Options the caller passes are kept
+        app = create_app({'SQLALCHEMY_DATABASE_URI': self.url, 'SQLALCHEMY_ENGINE_OPTIONS': {'echo': False}})
+        self.assertEqual(app.config['SQLALCHEMY_ENGINE_OPTIONS'], {'echo': False})
+
+if __name__ == '__main__':
+    unittest.main()
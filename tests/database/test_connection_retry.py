@@ -0,0 +1,188 @@
+"""
+Tests for connection retries and the circuit breaker, with faults injected
+in front of the DBAPI connect call.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from sqlalchemy import create_engine, text
+import metrics
+from app import app
+from database import configure_engine, engine_options
+from resilience import CircuitBreaker, DatabaseUnavailable, backoff_delay, breaker_for, install_connect_retry
+
+class FaultInjector:
+    """Stands in for dialect.connect and fails the next `failures` connects"""
+
+    def __init__(self, connect):
+        self.connect = connect
+        self.failures = 0
+        self.calls = 0
+        self.error = None
+
+    def __call__(self, *cargs, **cparams):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError('connection refused')
+        return self.connect(*cargs, **cparams)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class ConnectRetryTestCase(unittest.TestCase):
+    """Test cases for retrying new connections"""
+
+    def setUp(self):
+        metrics.reset()
+        self.directory = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(self.directory.name, 'retry.db')}"
+        self.engine = create_engine(url, **engine_options(url))
+        self.sleeps = []
+        self.breaker = install_connect_retry(self.engine, {
+            'attempts': 3, 'base_delay': 0.01, 'max_delay': 0.05,
+            'breaker_threshold': 4, 'breaker_cooldown': 30,
+        }, sleep=self.sleeps.append)
+        self.name = self.breaker.name
+        self.faults = FaultInjector(self.engine.dialect.connect)
+        self.engine.dialect.connect = self.faults
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def connect(self):
+        with self.engine.connect() as connection:
+            return connection.execute(text('SELECT 1')).scalar()
+
+    def test_transient_failures_are_retried(self):
+        self.faults.failures = 2
+        self.assertEqual(self.connect(), 1)
+        self.assertEqual(self.faults.calls, 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(all(0 <= delay <= 0.05 for delay in self.sleeps))
+        self.assertEqual(metrics.value('db_connect_retries_total', engine=self.name), 2)
+        self.assertEqual(metrics.value('db_connect_failures_total', engine=self.name), 2)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_gives_up_after_the_attempts(self):
+        self.faults.failures = 3
+        with self.assertRaises(DatabaseUnavailable):
+            self.connect()
+        self.assertEqual(self.faults.calls, 3)
+
+    def test_breaker_opens_and_fails_fast(self):
+        self.faults.failures = 100
+        for _ in range(2):
+            with self.assertRaises(DatabaseUnavailable):
+                self.connect()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertEqual(metrics.value('db_circuit_state', engine=self.name), 2)
+
+        # Open: no connect is attempted at all
+        calls = self.faults.calls
+        with self.assertRaises(DatabaseUnavailable) as raised:
+            self.connect()
+        self.assertEqual(self.faults.calls, calls)
+        self.assertGreater(raised.exception.retry_after, 0)
+        self.assertEqual(metrics.value('db_circuit_rejections_total', engine=self.name), 1)
+
+    def test_deadline_stops_retries(self):
+        self.faults.failures = 1
+        with app.test_request_context('/'):
+            from flask import g
+            g.db_deadline = 0  # Already passed
+            with self.assertRaises(DatabaseUnavailable):
+                self.connect()
+        self.assertEqual(self.faults.calls, 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_probe_failing_with_an_unexpected_error_reopens(self):
+        clock = FakeClock()
+        self.breaker.clock = clock
+        self.faults.failures = 100
+        for _ in range(2):
+            with self.assertRaises(DatabaseUnavailable):
+                self.connect()
+        self.assertEqual(self.breaker.state, 'open')
+
+        # The half-open probe hits an error that isn't retried
+        clock.now = 30
+        self.faults.error = ValueError('bad connect arguments')
+        with self.assertRaises(ValueError):
+            self.connect()
+        self.assertEqual(self.breaker.state, 'open')
+
+        # After another cooldown the next probe is let through and closes it
+        clock.now = 60
+        self.faults.error, self.faults.failures = None, 0
+        self.assertEqual(self.connect(), 1)
+        self.assertEqual(self.breaker.state, 'closed')
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    """Test cases for the breaker states"""
+
+    def test_half_open_lets_one_probe_through(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker('test', threshold=2, cooldown=10, clock=clock)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+
+        clock.now = 10
+        self.assertTrue(breaker.available())
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, 'half_open')
+        self.assertFalse(breaker.allow())
+
+        # A failed probe reopens it, a successful one closes it
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        clock.now = 20
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_backoff_is_capped(self):
+        for attempt in range(1, 10):
+            self.assertLessEqual(backoff_delay(attempt, 0.05, 1.0), 1.0)
+
+class UnavailableResponseTestCase(unittest.TestCase):
+    """Test cases for the 503 response and the metrics endpoint"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def test_open_breaker_returns_503(self):
+        with app.app_context():
+            from models import db
+            db.engine.dispose()
+            breaker = breaker_for(db.engine)
+            breaker.record_failure()
+            breaker.state = 'open'
+            breaker.opened_at = breaker.clock()
+            try:
+                response = self.client.get('/api/events/code/NOPE1234')
+            finally:
+                breaker.record_success()
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_metrics_endpoint(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db_circuit_state', response.get_data(as_text=True))
+
+if __name__ == '__main__':
+    unittest.main()
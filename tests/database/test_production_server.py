@@ -0,0 +1,40 @@
+"""
+Tests for the production server entry point.
+"""
+
+import os
+import unittest
+from unittest import mock
+from serve import ProductionServer, server_options
+
+class ServerOptionsTestCase(unittest.TestCase):
+    """Test cases for configuring the pre-fork server"""
+
+    def test_workers_and_threads_from_the_environment(self):
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '3', 'WEB_THREADS': '6', 'PORT': '8123'}):
+            options = server_options()
+        self.assertEqual(options['workers'], 3)
+        self.assertEqual(options['threads'], 6)
+        self.assertEqual(options['worker_class'], 'gthread')
+        self.assertEqual(options['bind'], '0.0.0.0:8123')
+        self.assertTrue(options['preload_app'])
+
+    def test_single_threaded_workers_use_the_sync_worker(self):
+        with mock.patch.dict(os.environ, {'WEB_THREADS': '1'}):
+            self.assertEqual(server_options()['worker_class'], 'sync')
+
+    def test_preloaded_app_is_warm_and_holds_no_connections(self):
+        with mock.patch('sys.argv', ['serve.py']):
+            server = ProductionServer({'workers': 1, 'threads': 1})
+        app = server.load()
+        self.assertIs(server.load(), app)
+        self.assertEqual(server.cfg.workers, 1)
+        self.assertTrue(server.cfg.preload_app)
+        with app.app_context():
+            pool = app.extensions['sqlalchemy'].engine.pool
+            self.assertEqual(pool.checkedout(), 0)
+        # Templates were compiled before forking
+        self.assertIn('index.html', [name for _, name in app.jinja_env.cache.keys()])
+
+if __name__ == '__main__':
+    unittest.main()
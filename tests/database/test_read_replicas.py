@@ -0,0 +1,108 @@
+"""
+Tests for routing read-only endpoints to a replica, using two SQLite files.
+"""
+
+import os
+import tempfile
+import unittest
+import json
+from datetime import date
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app import app, db
+from models import User, Event
+from werkzeug.security import generate_password_hash
+
+def make_event(event_id, event_code, host_id, title, version=1):
+    return Event(
+        id=event_id,
+        event_code=event_code,
+        title=title,
+        host_id=host_id,
+        mother_name='Jane Doe',
+        event_date=date(2026, 1, 1),
+        due_date=date(2026, 2, 1),
+        version=version
+    )
+
+class ReadReplicaTestCase(unittest.TestCase):
+    """Test cases for read/write session routing"""
+
+    def setUp(self):
+        """Set up a primary and a lagging replica"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            host = User(
+                email='replicahost@example.com',
+                password_hash=generate_password_hash('password123', method='pbkdf2:sha256'),
+                is_host=True
+            )
+            db.session.add(host)
+            db.session.commit()
+            event = make_event(None, Event.generate_event_code(), host.id, 'Primary Shower', version=3)
+            db.session.add(event)
+            db.session.commit()
+            self.host_id = host.id
+            self.event_id = event.id
+            self.event_code = event.event_code
+            self.url = f'/api/events/{event.id}'
+
+        self.directory = tempfile.TemporaryDirectory()
+        replica_url = f"sqlite:///{os.path.join(self.directory.name, 'replica.db')}"
+        engine = create_engine(replica_url)
+        db.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(User(id=self.host_id, email='replicahost@example.com', is_host=True))
+            session.add(make_event(self.event_id, self.event_code, self.host_id, 'Replica Shower', version=2))
+            session.commit()
+        engine.dispose()
+
+        app.config['SQLALCHEMY_REPLICA_URLS'] = [replica_url]
+
+    def tearDown(self):
+        """Clean up after tests"""
+        app.config['SQLALCHEMY_REPLICA_URLS'] = []
+        for engines in app.extensions.pop('replica_engines', {}).values():
+            for engine in engines:
+                engine.dispose()
+        self.directory.cleanup()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_reads_use_the_replica(self):
+        response = self.client.get(self.url)
+        self.assertEqual(json.loads(response.data)['title'], 'Replica Shower')
+        self.assertEqual(response.headers['X-Read-Source'], 'replica')
+        self.assertEqual(response.headers['X-Event-Version'], '2')
+
+    def test_stale_replica_falls_back_to_primary(self):
+        response = self.client.get(self.url, headers={'X-Min-Event-Version': '3'})
+        self.assertEqual(json.loads(response.data)['title'], 'Primary Shower')
+        self.assertNotIn('X-Read-Source', response.headers)
+
+    def test_writers_read_their_own_writes(self):
+        login = self.client.post('/auth/host/login',
+            json={'email': 'replicahost@example.com', 'password': 'password123'})
+        token = json.loads(login.data)['access_token']
+
+        response = self.client.post(f'{self.url}/results', headers={'Authorization': f'Bearer {token}'},
+            json={'birth_datetime': '2026-02-01T10:00', 'baby_name': 'Olivia'})
+        self.assertEqual(response.status_code, 200)
+        # Recording the birth bumped the event on the primary only
+        self.assertEqual(response.headers['X-Event-Version'], '4')
+
+        response = self.client.get(self.url)
+        self.assertEqual(json.loads(response.data)['title'], 'Primary Shower')
+        self.assertNotIn('X-Read-Source', response.headers)
+
+        # Other clients still read the replica
+        response = app.test_client().get(self.url)
+        self.assertEqual(response.headers['X-Read-Source'], 'replica')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+"""
+Tests for coalesced board and dashboard builds and their stored bytes.
+"""
+
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date
+import metrics
+import routes
+from app import create_app, init_schema
+from cache import SingleFlight
+from models import db, User, Event, DateGuess, add_event_guest
+from tokens import issue_tokens
+
+class SingleFlightTestCase(unittest.TestCase):
+    """Test cases for cache.SingleFlight"""
+
+    def run_together(self, flights, function, callers=8):
+        outcomes = []
+        start = threading.Barrier(callers)
+
+        def call():
+            start.wait()
+            try:
+                outcomes.append(flights.do('board', function))
+            except ValueError as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_concurrent_callers_share_one_call(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'version': 2}
+
+        outcomes = self.run_together(SingleFlight(), build)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in outcomes], [{'version': 2}] * 8)
+        self.assertEqual(sorted(shared for _, shared in outcomes), [False] + [True] * 7)
+
+    def test_waiters_see_the_error(self):
+        def fail():
+            time.sleep(0.2)
+            raise ValueError('database went away')
+
+        flights = SingleFlight()
+        outcomes = self.run_together(flights, fail)
+        self.assertEqual([str(outcome) for outcome in outcomes], ['database went away'] * 8)
+        # The key is free again afterwards
+        self.assertEqual(flights.do('board', lambda: 'rebuilt'), ('rebuilt', False))
+
+class BoardCoalescingTestCase(unittest.TestCase):
+    """Test cases for the availability board, the guesses dashboard and the event summary"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'boards.db')}",
+            'TESTING': True,
+        })
+        init_schema(self.app)
+        with self.app.app_context():
+            host = User(email='boardhost@example.com', is_host=True)
+            ann = User(email='ann@example.com', first_name='Ann')
+            db.session.add_all([host, ann])
+            db.session.commit()
+            event = Event(event_code=Event.generate_event_code(), title='Board Shower', host_id=host.id,
+                          mother_name='Jane Doe', event_date=date(2026, 1, 1), due_date=date(2026, 2, 1))
+            db.session.add(event)
+            db.session.flush()
+            add_event_guest(event.id, ann.id)
+            db.session.commit()
+            self.event_id, self.ann_id = event.id, ann.id
+            self.token = issue_tokens(ann)[0]
+        self.client = self.app.test_client()
+        metrics.reset()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def poll(self, path, pollers=12):
+        responses = []
+        start = threading.Barrier(pollers)
+
+        def poller():
+            start.wait()
+            responses.append(self.client.get(path, headers={'Authorization': f'Bearer {self.token}'}))
+
+        threads = [threading.Thread(target=poller) for _ in range(pollers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def claim(self, day):
+        with self.app.app_context():
+            db.session.add(DateGuess(user_id=self.ann_id, event_id=self.event_id, guess_date=day))
+            db.session.commit()
+
+    def count_builds(self, name):
+        original = getattr(routes, name)
+        builds = []
+
+        def counted(*args):
+            builds.append(1)
+            # Slow enough that the pollers arrive while it runs
+            time.sleep(0.1)
+            return original(*args)
+
+        self.addCleanup(setattr, routes, name, original)
+        setattr(routes, name, counted)
+        return builds
+
+    def test_pollers_share_one_board_build_per_version(self):
+        builds = self.count_builds('build_availability')
+        path = f'/api/events/{self.event_id}/availability'
+        first = self.poll(path)
+        self.assertEqual([response.status_code for response in first], [200] * 12)
+        self.assertEqual(len({response.data for response in first}), 1)
+        self.assertEqual(len(builds), 1)
+
+        # A claim changes the version, and the next wave builds once more
+        self.claim(date(2026, 2, 3))
+        second = self.poll(path)
+        self.assertEqual(len(builds), 2)
+        self.assertEqual(second[0].json['version'], first[0].json['version'] + 1)
+        claimed = next(item for item in second[0].json['dates'] if item['date'] == '2026-02-03')
+        self.assertFalse(claimed['is_available'])
+
+        built = metrics.value('board_requests_total', board='availability', outcome='built')
+        shared = sum(metrics.value('board_requests_total', board='availability', outcome=outcome)
+                     for outcome in ('coalesced', 'cached'))
+        self.assertEqual((built, shared), (2, 22))
+
+    def test_distribution_parameters_are_separate_boards(self):
+        builds = self.count_builds('build_availability')
+        path = f'/api/events/{self.event_id}/availability'
+        self.client.get(path)
+        self.client.get(path + '?sd=3')
+        self.client.get(path + '?sd=3')
+        self.assertEqual(len(builds), 2)
+
+    def test_dashboard_pollers_share_one_build(self):
+        builds = self.count_builds('build_event_guesses')
+        self.claim(date(2026, 2, 3))
+        responses = self.poll(f'/api/events/{self.event_id}/guesses')
+        self.assertEqual([response.status_code for response in responses], [200] * 12)
+        self.assertEqual(responses[0].json['date_guesses'][0]['guess_date'], '2026-02-03')
+        self.assertEqual(len(builds), 1)
+
+    def test_hits_are_stored_bytes(self):
+        path = f'/api/events/{self.event_id}/availability'
+        first = self.client.get(path)
+        # Same encoding as jsonify
+        with self.app.test_request_context():
+            self.assertEqual(first.data, self.app.json.response(json.loads(first.data)).get_data())
+
+        # A hit builds nothing and reuses the stored body
+        builds = self.count_builds('build_availability')
+        self.assertEqual(self.client.get(path).data, first.data)
+        self.assertEqual(builds, [])
+
+        compressed = self.client.get(path, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed.headers['Vary'])
+        self.assertEqual(gzip.decompress(compressed.data), first.data)
+        self.assertNotIn('Content-Encoding', first.headers)
+
+    def test_small_bodies_are_not_compressed(self):
+        with self.app.app_context():
+            code = db.session.get(Event, self.event_id).event_code
+        response = self.client.get(f'/api/events/code/{code}', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.json['title'], 'Board Shower')
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_renamed_guest_refreshes_their_boards(self):
+        self.claim(date(2026, 2, 3))
+        path = f'/api/events/{self.event_id}/guesses'
+        headers = {'Authorization': f'Bearer {self.token}'}
+        self.assertEqual(self.client.get(path, headers=headers).json['date_guesses'][0]['user_name'], 'Ann')
+        with self.app.app_context():
+            db.session.get(User, self.ann_id).nickname = 'Annie'
+            db.session.commit()
+        self.assertEqual(self.client.get(path, headers=headers).json['date_guesses'][0]['user_name'], 'Annie')
+
+    def test_memory_is_bounded_by_event(self):
+        self.app.config['BOARD_CACHE_EVENTS'] = 2
+        with self.app.app_context():
+            host_id = db.session.get(Event, self.event_id).host_id
+            events = [Event(event_code=Event.generate_event_code(), title=f'Shower {number}', host_id=host_id,
+                            mother_name='Jane Doe', event_date=date(2026, 1, 1), due_date=date(2026, 2, 1))
+                      for number in range(3)]
+            db.session.add_all(events)
+            db.session.commit()
+            event_ids = [event.id for event in events]
+        for event_id in event_ids:
+            self.client.get(f'/api/events/{event_id}/availability')
+            self.client.get(f'/api/events/{event_id}/availability?sd=3')
+        stored = self.app.extensions['boards']['events']
+        self.assertEqual(len(stored), 2)
+        self.assertNotIn(event_ids[0], stored)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Tests for streaming CSV/NDJSON exports of guests, guesses and payments.
+"""
+
+import unittest
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from app import app, db
+from models import User, Event, DateGuess, HourGuess, MinuteGuess, NameGuess, Payment
+import exports
+from werkzeug.security import generate_password_hash
+
+class EventExportTestCase(unittest.TestCase):
+    """Test cases for host data exports"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+
+            host = User(
+                email='exporthost@example.com',
+                password_hash=generate_password_hash('password123', method='pbkdf2:sha256'),
+                first_name='Export',
+                last_name='Host',
+                is_host=True
+            )
+            db.session.add(host)
+            db.session.commit()
+
+            due_date = (datetime.now() + timedelta(days=60)).date()
+            events = []
+            for index in range(2):
+                event = Event(
+                    event_code=Event.generate_event_code(),
+                    title=f'Export Shower {index}',
+                    host_id=host.id,
+                    mother_name='Jane Doe',
+                    event_date=(datetime.now() + timedelta(days=30)).date(),
+                    due_date=due_date,
+                    guess_price=2.0,
+                    name_game_enabled=True
+                )
+                db.session.add(event)
+                events.append(event)
+            db.session.commit()
+
+            for index in range(5):
+                guest = User(email=f'guest{index}@example.com', first_name='Guest', last_name=str(index))
+                events[0].guests.append(guest)
+                db.session.add(guest)
+            db.session.commit()
+
+            guests = events[0].guests
+            db.session.add_all([
+                DateGuess(user_id=guests[0].id, event_id=events[0].id, guess_date=due_date),
+                HourGuess(user_id=guests[0].id, event_id=events[0].id, hour=3, am_pm='PM'),
+                MinuteGuess(user_id=guests[1].id, event_id=events[0].id, minute=7),
+                NameGuess(user_id=guests[2].id, event_id=events[0].id, name='Ada'),
+                Payment(user_id=guests[0].id, event_id=events[0].id, amount=4.0, status='paid'),
+            ])
+            events[1].guests.append(guests[3])
+            db.session.commit()
+
+            self.event_ids = [event.id for event in events]
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login_as_host(self):
+        response = self.client.post('/auth/host/login',
+            json={'email': 'exporthost@example.com', 'password': 'password123'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_export_guests_csv(self):
+        """The guest roster is exported as CSV with owed and paid totals"""
+        self.login_as_host()
+
+        response = self.client.get(f'/api/events/{self.event_ids[0]}/export/guests?format=csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(response.data.decode('utf-8'))))
+        self.assertEqual(len(rows), 5)
+        first = rows[0]
+        self.assertEqual(first['email'], 'guest0@example.com')
+        self.assertEqual(int(first['total_guesses']), 2)
+        self.assertEqual(float(first['amount_owed']), 4.0)
+        self.assertEqual(first['payment_status'], 'paid')
+
+    def test_export_guesses_ndjson(self):
+        """Guesses of every type are exported as NDJSON"""
+        self.login_as_host()
+
+        response = self.client.get(f'/api/events/{self.event_ids[0]}/export/guesses?format=ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        self.assertEqual([line['guess_type'] for line in lines], ['date', 'hour', 'minute', 'name'])
+        self.assertEqual(lines[1]['value'], '3 PM')
+        self.assertEqual(lines[2]['value'], '07')
+
+    def test_export_all_host_events_in_chunks(self):
+        """A host-wide export spans every event and is written in chunks"""
+        self.login_as_host()
+
+        original_chunk_rows = exports.CHUNK_ROWS
+        exports.CHUNK_ROWS = 2
+        try:
+            response = self.client.get('/api/events/export/guests?format=csv')
+            chunks = list(response.response)
+        finally:
+            exports.CHUNK_ROWS = original_chunk_rows
+
+        self.assertGreater(len(chunks), 2)
+        rows = list(csv.DictReader(io.StringIO(''.join(
+            chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk for chunk in chunks))))
+        self.assertEqual(sorted({int(row['event_id']) for row in rows}), sorted(self.event_ids))
+        self.assertEqual(len(rows), 6)
+
+    def test_export_rejects_unknown_format(self):
+        """Only csv and ndjson are supported"""
+        self.login_as_host()
+
+        response = self.client.get(f'/api/events/{self.event_ids[0]}/export/payments?format=xlsx')
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+"""
+Tests for the ASGI entry point: live update streams, the Flask fallback and
+the async Google sign-in against a stand-in Google.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from datetime import date
+from urllib.parse import parse_qs, urlparse
+import httpx
+from app import create_app, init_schema
+import oidc
+from asgi import Application
+from models import db, User, Event, bump_event_version
+
+def make_app(url, **config):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': url, 'TESTING': True,
+                      'LIVE_POLL_SECONDS': 0.05, 'LIVE_HEARTBEAT_SECONDS': 0.2, **config})
+    init_schema(app)
+    with app.app_context():
+        host = User(email='livehost@example.com', is_host=True)
+        db.session.add(host)
+        db.session.flush()
+        event = Event(event_code='5151', title='Live Shower', host_id=host.id, mother_name='Jane Doe',
+                      event_date=date(2026, 1, 1), due_date=date(2026, 2, 1))
+        db.session.add(event)
+        db.session.commit()
+        app.config['TEST_EVENT_ID'] = event.id
+    return app
+
+class StreamClient:
+    """Drives one ASGI request by hand and collects what the app sends"""
+
+    def __init__(self, application, path):
+        self.application = application
+        self.path = path
+        self.messages = asyncio.Queue()
+        self.disconnect = asyncio.Event()
+
+    async def receive(self):
+        await self.disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        await self.messages.put(message)
+
+    def start(self):
+        scope = {'type': 'http', 'method': 'GET', 'path': self.path, 'query_string': b'',
+                 'headers': [(b'host', b'testserver')], 'scheme': 'http', 'root_path': ''}
+        self.task = asyncio.create_task(self.application(scope, self.receive, self.send))
+
+    async def next_message(self, timeout=2):
+        return await asyncio.wait_for(self.messages.get(), timeout)
+
+    async def close(self):
+        self.disconnect.set()
+        await asyncio.wait_for(self.task, 2)
+
+class LiveUpdatesTestCase(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the server-sent event stream"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = make_app(f"sqlite:///{os.path.join(self.directory.name, 'live.db')}")
+        self.event_id = self.app.config['TEST_EVENT_ID']
+        self.application = Application(self.app)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    async def test_stream_sends_version_changes(self):
+        stream = StreamClient(self.application, f'/api/events/{self.event_id}/live')
+        stream.start()
+        start = await stream.next_message()
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), start['headers'])
+        self.assertEqual((await stream.next_message())['body'], b'event: version\ndata: {"version": 1}\n\n')
+
+        def bump():
+            with self.app.app_context():
+                bump_event_version(self.event_id)
+                db.session.commit()
+        await asyncio.to_thread(bump)
+
+        # Skip heartbeats until the change arrives
+        while True:
+            body = (await stream.next_message())['body']
+            if body != b': keep-alive\n\n':
+                break
+        self.assertEqual(body, b'event: version\ndata: {"version": 2}\n\n')
+        self.assertEqual(self.application.live.subscriber_count(), 1)
+
+        await stream.close()
+        self.assertEqual(self.application.live.subscriber_count(), 0)
+        self.assertEqual(self.application.live._pollers, {})
+
+    async def test_idle_stream_gets_heartbeats(self):
+        stream = StreamClient(self.application, f'/api/events/{self.event_id}/live')
+        stream.start()
+        await stream.next_message()
+        await stream.next_message()
+        self.assertEqual((await stream.next_message())['body'], b': keep-alive\n\n')
+        await stream.close()
+
+    async def test_unknown_event(self):
+        stream = StreamClient(self.application, '/api/events/999999/live')
+        stream.start()
+        self.assertEqual((await stream.next_message())['status'], 404)
+        await stream.close()
+
+    async def test_flask_routes_still_work(self):
+        transport = httpx.ASGITransport(app=self.application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            response = await client.get(f'/api/events/{self.event_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Live Shower')
+
+class AsyncGoogleLoginTestCase(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the event-loop Google sign-in"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = make_app(f"sqlite:///{os.path.join(self.directory.name, 'google.db')}",
+                            GOOGLE_OAUTH_CLIENT_ID='client-id', GOOGLE_OAUTH_CLIENT_SECRET='client-secret')
+        self.requests = []
+        oidc.documents.clear()
+        google = httpx.AsyncClient(transport=httpx.MockTransport(self.google))
+        self.application = Application(self.app, http_client=google)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def google(self, request):
+        """Stand-in for Google's discovery, token and userinfo endpoints"""
+        self.requests.append(request)
+        if request.url.path == '/.well-known/openid-configuration':
+            return httpx.Response(200, json={
+                'authorization_endpoint': 'https://accounts.google.com/o/oauth2/v2/auth',
+                'token_endpoint': 'https://oauth2.googleapis.com/token',
+                'userinfo_endpoint': 'https://openidconnect.googleapis.com/v1/userinfo',
+            })
+        if request.url.path == '/token':
+            self.assertEqual(parse_qs(request.content.decode())['code'], ['the-code'])
+            return httpx.Response(200, json={'access_token': 'access', 'token_type': 'Bearer', 'expires_in': 3600})
+        if request.url.path == '/v1/userinfo':
+            self.assertEqual(request.headers['Authorization'], 'Bearer access')
+            return httpx.Response(200, json={'email': 'googler@example.com', 'email_verified': True,
+                                             'given_name': 'Goo'})
+        return httpx.Response(404)
+
+    async def get(self, path):
+        transport = httpx.ASGITransport(app=self.application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            return await client.get(path)
+
+    async def test_login_redirects_to_google(self):
+        response = await self.get('/google_auth/google_login')
+        self.assertEqual(response.status_code, 302)
+        location = urlparse(response.headers['location'])
+        self.assertEqual(location.netloc, 'accounts.google.com')
+        self.assertEqual(parse_qs(location.query)['redirect_uri'],
+                         ['https://testserver/google_auth/google_login/callback'])
+
+    async def test_callback_signs_the_user_in(self):
+        response = await self.get('/google_auth/google_login/callback?code=the-code')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Login Successful', response.text)
+        self.assertIn('access_token_cookie', response.headers.get('set-cookie', ''))
+        self.assertEqual([request.url.path for request in self.requests],
+                         ['/.well-known/openid-configuration', '/token', '/v1/userinfo'])
+        with self.app.app_context():
+            self.assertEqual(User.query.filter_by(email='googler@example.com').one().first_name, 'Goo')
+
+if __name__ == '__main__':
+    unittest.main()
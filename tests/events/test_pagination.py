@@ -0,0 +1,137 @@
+"""
+Tests for cursor-based pagination of list endpoints.
+"""
+
+import unittest
+import json
+from datetime import datetime, timedelta
+from app import app, db
+from models import User, Event
+from werkzeug.security import generate_password_hash
+
+class PaginationTestCase(unittest.TestCase):
+    """Test cases for limit/cursor pagination"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+
+            host = User(
+                email='pagehost@example.com',
+                password_hash=generate_password_hash('password123', method='pbkdf2:sha256'),
+                first_name='Page',
+                last_name='Host',
+                is_host=True
+            )
+            db.session.add(host)
+            db.session.commit()
+
+            for index in range(7):
+                event = Event(
+                    event_code=Event.generate_event_code(),
+                    title=f'Shower {index}',
+                    host_id=host.id,
+                    mother_name='Paula Pager',
+                    event_date=(datetime.now() + timedelta(days=30)).date(),
+                    due_date=(datetime.now() + timedelta(days=60)).date()
+                )
+                db.session.add(event)
+            db.session.commit()
+
+            first_event = Event.query.order_by(Event.id).first()
+            for index in range(5):
+                first_event.guests.append(User(email=f'pageguest{index}@example.com'))
+            db.session.commit()
+            self.event_id = first_event.id
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login_as_host(self):
+        response = self.client.post('/auth/host/login',
+            json={'email': 'pagehost@example.com', 'password': 'password123'})
+        self.assertEqual(response.status_code, 200)
+
+    def collect_pages(self, url):
+        """Follow X-Next-Cursor headers until the last page"""
+        items = []
+        pages = 0
+        cursor = None
+        while True:
+            separator = '&' if '?' in url else '?'
+            response = self.client.get(url + (f'{separator}cursor={cursor}' if cursor else ''))
+            self.assertEqual(response.status_code, 200)
+            items.extend(json.loads(response.data))
+            pages += 1
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                return items, pages
+
+    def test_host_events_are_paged_in_stable_order(self):
+        """Host events are returned in id order across pages"""
+        self.login_as_host()
+
+        items, pages = self.collect_pages('/api/events?limit=3')
+
+        self.assertEqual(pages, 3)
+        ids = [item['id'] for item in items]
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(ids, sorted(ids))
+
+    def test_total_only_when_requested(self):
+        """X-Total-Count is only sent with include_total"""
+        self.login_as_host()
+
+        response = self.client.get('/api/events/find-by-mother?name=Paula&limit=2')
+        self.assertNotIn('X-Total-Count', response.headers)
+        self.assertIn('rel="next"', response.headers['Link'])
+
+        response = self.client.get('/api/events/find-by-mother?name=Paula&limit=2&include_total=true')
+        self.assertEqual(response.headers['X-Total-Count'], '7')
+        self.assertEqual(len(json.loads(response.data)), 2)
+
+    def test_event_guests_are_paged(self):
+        """The guest roster follows the same cursor contract"""
+        self.login_as_host()
+
+        items, pages = self.collect_pages(f'/api/events/{self.event_id}/guests?limit=2')
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(len({item['id'] for item in items}), 5)
+
+    def test_unpaged_lists_return_everything_unless_asked(self):
+        """Lists whose callers don't follow cursors only page with a limit or cursor"""
+        with app.app_context():
+            host_id = User.query.filter_by(email='pagehost@example.com').one().id
+            db.session.add_all([
+                Event(event_code=f'P{index:03d}', title=f'Extra {index}', host_id=host_id, mother_name='Paula Pager',
+                      event_date=(datetime.now() + timedelta(days=30)).date(),
+                      due_date=(datetime.now() + timedelta(days=60)).date())
+                for index in range(100)
+            ])
+            db.session.commit()
+
+        response = self.client.get('/api/events/find-by-mother?name=Paula')
+        self.assertEqual(len(json.loads(response.data)), 107)
+        self.assertNotIn('X-Next-Cursor', response.headers)
+
+        items, pages = self.collect_pages('/api/events/find-by-mother?name=Paula&limit=50')
+        self.assertEqual((len(items), pages), (107, 3))
+
+    def test_invalid_cursor_is_rejected(self):
+        """Malformed cursors and limits return 400"""
+        self.login_as_host()
+
+        self.assertEqual(self.client.get('/api/events?cursor=not-a-cursor').status_code, 400)
+        self.assertEqual(self.client.get('/api/events?limit=zero').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
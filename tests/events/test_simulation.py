@@ -0,0 +1,144 @@
+"""
+Tests for the Monte Carlo pool simulation.
+"""
+
+import unittest
+import json
+from datetime import date
+import numpy as np
+from app import app, db
+from models import User, Event, DateGuess, HourGuess, MinuteGuess
+from simulation import settle_samples, simulate_event, _simulation_cache
+from werkzeug.security import generate_password_hash
+
+class SettleSamplesTestCase(unittest.TestCase):
+    """Test cases for batched settlement of sampled births"""
+
+    def test_ties_split_per_guess(self):
+        # Slot 0 has one guess from user 0, slot 2 has two guesses from user 1
+        slots = np.array([0, 2])
+        counts = np.array([[1.0, 0.0], [0.0, 2.0]])
+        payouts = settle_samples(np.array([0, 1, 2]), slots, counts, 30.0)
+        np.testing.assert_allclose(payouts, [[30, 0], [10, 20], [0, 30]])
+
+    def test_wraps_around(self):
+        slots = np.array([1, 12])
+        counts = np.eye(2)
+        payouts = settle_samples(np.array([23]), slots, counts, 10.0, 24)
+        np.testing.assert_allclose(payouts, [[10, 0]])
+
+    def test_empty_pool_pays_nothing(self):
+        payouts = settle_samples(np.array([3, 4]), np.array([]), np.zeros((0, 2)), 0.0)
+        self.assertEqual(payouts.shape, (2, 2))
+        self.assertFalse(payouts.any())
+
+class SimulationEndpointTestCase(unittest.TestCase):
+    """Test cases for the host simulation endpoint"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+        _simulation_cache.clear()
+
+        with app.app_context():
+            db.create_all()
+
+            host = User(
+                email='simhost@example.com',
+                password_hash=generate_password_hash('password123', method='pbkdf2:sha256'),
+                first_name='Sim',
+                last_name='Host',
+                is_host=True
+            )
+            ann = User(email='ann@example.com', first_name='Ann', last_name='A')
+            bob = User(email='bob@example.com', first_name='Bob', last_name='B')
+            db.session.add_all([host, ann, bob])
+            db.session.commit()
+
+            event = Event(
+                event_code=Event.generate_event_code(),
+                title='Simulation Shower',
+                host_id=host.id,
+                mother_name='Jane Doe',
+                event_date=date(2026, 1, 1),
+                due_date=date(2026, 2, 1),
+                guess_price=1.0
+            )
+            event.guests.extend([ann, bob])
+            db.session.add(event)
+            db.session.commit()
+
+            db.session.add_all([
+                DateGuess(user_id=ann.id, event_id=event.id, guess_date=date(2026, 2, 1)),
+                DateGuess(user_id=bob.id, event_id=event.id, guess_date=date(2026, 3, 1)),
+                HourGuess(user_id=ann.id, event_id=event.id, hour=6, am_pm='AM'),
+                HourGuess(user_id=bob.id, event_id=event.id, hour=6, am_pm='PM'),
+                MinuteGuess(user_id=ann.id, event_id=event.id, minute=0),
+            ])
+            db.session.commit()
+
+            self.event_id = event.id
+            self.ann_id = ann.id
+            self.bob_id = bob.id
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def host_headers(self):
+        response = self.client.post('/auth/host/login',
+            json={'email': 'simhost@example.com', 'password': 'password123'})
+        self.assertEqual(response.status_code, 200)
+        return {'Authorization': f"Bearer {json.loads(response.data)['access_token']}"}
+
+    def test_expected_winnings_account_for_every_pot(self):
+        with app.app_context():
+            result = simulate_event(db.session.get(Event, self.event_id), samples=50000, seed=7)
+
+        guests = {guest['user_id']: guest for guest in result['guests']}
+        ann, bob = guests[self.ann_id], guests[self.bob_id]
+        # Ann's date is the due date; Bob's is four weeks late
+        self.assertGreater(ann['expected_winnings']['date'], 1.8)
+        # The hour pool is an even split and Ann holds the only minute
+        self.assertAlmostEqual(ann['expected_winnings']['hour'], 1.0, delta=0.05)
+        self.assertEqual(ann['expected_winnings']['minute'], 1.0)
+        # Ann wins the minute every time and the hour about half the time
+        self.assertAlmostEqual(ann['p_jackpot'], 0.5, delta=0.05)
+        self.assertEqual(bob['p_jackpot'], 0)
+        pots = sum(result['pots'].values())
+        paid = sum(guest['expected_total'] for guest in guests.values())
+        self.assertAlmostEqual(paid, pots, places=1)
+        self.assertEqual(ann['spent'], 3.0)
+
+    def test_expected_payouts_never_exceed_the_pot(self):
+        """The jackpot is a probability only and adds nothing to the expected totals"""
+        with app.app_context():
+            result = simulate_event(db.session.get(Event, self.event_id), samples=20000, seed=3)
+
+        pots = sum(result['pots'].values())
+        self.assertLessEqual(sum(guest['expected_total'] for guest in result['guests']), pots + 0.01)
+        self.assertNotIn('jackpot', result['guests'][0]['expected_winnings'])
+        spent = sum(guest['spent'] for guest in result['guests'])
+        net = sum(guest['expected_net'] for guest in result['guests'])
+        self.assertLessEqual(net, pots - spent + 0.01)
+
+    def test_endpoint_is_host_only_and_cached(self):
+        url = f'/api/events/{self.event_id}/simulation?samples=2000'
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        headers = self.host_headers()
+        first = self.client.get(url, headers=headers)
+        self.assertEqual(first.status_code, 200)
+        second = self.client.get(url, headers=headers)
+        self.assertEqual(json.loads(first.data), json.loads(second.data))
+        self.assertEqual(_simulation_cache.hits, 1)
+
+        response = self.client.get(f'/api/events/{self.event_id}/simulation?samples=0', headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Tests for slot win probabilities and the availability endpoint.
+"""
+
+import unittest
+import json
+from datetime import date
+import numpy as np
+import metrics
+from app import app, db
+from models import User, Event, DateGuess, HourGuess, MinuteGuess
+from probability import territory_probabilities, estimate_pool_probabilities, _probability_cache
+
+class TerritoryProbabilityTestCase(unittest.TestCase):
+    """Test cases for the vectorized territory arithmetic"""
+
+    def test_claimed_probabilities_sum_to_one(self):
+        outcomes = np.arange(24)
+        pmf = np.full(24, 1 / 24)
+        claimed, _ = territory_probabilities(outcomes, pmf, [0, 6, 6], [], 24)
+        self.assertAlmostEqual(claimed.sum(), 1.0)
+        # The two claimants of slot 6 share it equally
+        self.assertAlmostEqual(claimed[1], claimed[2])
+
+    def test_territory_wraps_around(self):
+        """Hour 23 is next to hour 0, so it takes outcomes across midnight"""
+        outcomes = np.arange(24)
+        pmf = np.full(24, 1 / 24)
+        _, candidates = territory_probabilities(outcomes, pmf, [12], [0, 23], 24)
+        # Either slot would take half the clock from the claim at noon
+        self.assertAlmostEqual(candidates[0], 12 / 24)
+        self.assertAlmostEqual(candidates[1], 12 / 24)
+
+    def test_empty_pool(self):
+        """With nothing claimed, any open slot would win everything"""
+        probabilities = estimate_pool_probabilities(date(2026, 2, 1), [], [], [])
+        self.assertAlmostEqual(probabilities['minute'][17], 1.0)
+        self.assertAlmostEqual(probabilities['date'][date(2026, 2, 1)], 1.0)
+
+    def test_due_date_neighbours_are_worth_more(self):
+        due = date(2026, 2, 1)
+        probabilities = estimate_pool_probabilities(due, [due], [], [])
+        near = probabilities['date'][date(2026, 2, 2)]
+        far = probabilities['date'][date(2026, 2, 25)]
+        self.assertGreater(near, far)
+        self.assertEqual(len(probabilities['hour']), 24)
+        self.assertEqual(len(probabilities['minute']), 60)
+
+class AvailabilityEndpointTestCase(unittest.TestCase):
+    """Test cases for the availability endpoint and its version-keyed cache"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+        _probability_cache.clear()
+        app.extensions.pop('boards', None)
+        metrics.reset()
+
+        with app.app_context():
+            db.create_all()
+
+            host = User(email='probhost@example.com', first_name='Prob', last_name='Host', is_host=True)
+            ann = User(email='ann@example.com', first_name='Ann', last_name='A')
+            db.session.add_all([host, ann])
+            db.session.commit()
+
+            event = Event(
+                event_code=Event.generate_event_code(),
+                title='Probability Shower',
+                host_id=host.id,
+                mother_name='Jane Doe',
+                event_date=date(2026, 1, 1),
+                due_date=date(2026, 2, 1)
+            )
+            db.session.add(event)
+            db.session.commit()
+
+            db.session.add_all([
+                DateGuess(user_id=ann.id, event_id=event.id, guess_date=date(2026, 2, 1)),
+                HourGuess(user_id=ann.id, event_id=event.id, hour=12, am_pm='AM'),
+                MinuteGuess(user_id=ann.id, event_id=event.id, minute=0),
+            ])
+            db.session.commit()
+
+            self.event_id = event.id
+            self.ann_id = ann.id
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_availability_reports_claims_and_probabilities(self):
+        response = self.client.get(f'/api/events/{self.event_id}/availability')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+
+        self.assertEqual(len(data['dates']), 61)
+        due = next(item for item in data['dates'] if item['is_due_date'])
+        self.assertFalse(due['is_available'])
+        self.assertEqual(due['user'], 'Ann A.')
+        # The only claimant holds the whole pool
+        self.assertAlmostEqual(due['win_probability'], 1.0, places=5)
+
+        midnight = data['hours'][0]
+        self.assertEqual((midnight['hour'], midnight['am_pm']), (12, 'AM'))
+        self.assertFalse(midnight['is_available'])
+        self.assertAlmostEqual(midnight['win_probability'], 1.0, places=5)
+        # Claiming the opposite minute would take half the hour
+        self.assertAlmostEqual(data['minutes'][30]['win_probability'], 0.5, places=5)
+
+    def test_guesses_bump_version_and_refresh_cache(self):
+        first = json.loads(self.client.get(f'/api/events/{self.event_id}/availability').data)
+        self.client.get(f'/api/events/{self.event_id}/availability')
+        # The repeat read is served from the board cache without recomputing
+        self.assertEqual(metrics.value('board_requests_total', board='availability', outcome='cached'), 1)
+        self.assertEqual(_probability_cache.hits, 0)
+
+        with app.app_context():
+            db.session.add(MinuteGuess(user_id=self.ann_id, event_id=self.event_id, minute=30))
+            db.session.commit()
+
+        second = json.loads(self.client.get(f'/api/events/{self.event_id}/availability').data)
+        self.assertEqual(second['version'], first['version'] + 1)
+        self.assertFalse(second['minutes'][30]['is_available'])
+        self.assertAlmostEqual(second['minutes'][0]['win_probability'], 0.5, places=5)
+
+    def test_invalid_distribution_parameters(self):
+        response = self.client.get(f'/api/events/{self.event_id}/availability?sd=abc')
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
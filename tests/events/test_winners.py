@@ -0,0 +1,181 @@
+"""
+Tests for settling the date, hour, minute and name pools.
+"""
+
+import unittest
+import json
+from datetime import date, datetime
+from app import app, db
+from models import User, Event, EventOutcome, PoolWinner, DateGuess, HourGuess, MinuteGuess, NameGuess
+from winners import signed_circular_offset, hour_slot, settle_events
+from werkzeug.security import generate_password_hash
+
+class CircularDistanceTestCase(unittest.TestCase):
+    """Test cases for wrap-around slot arithmetic"""
+
+    def test_hour_slot(self):
+        self.assertEqual(hour_slot(12, 'AM'), 0)
+        self.assertEqual(hour_slot(1, 'AM'), 1)
+        self.assertEqual(hour_slot(12, 'PM'), 12)
+        self.assertEqual(hour_slot(11, 'PM'), 23)
+
+    def test_signed_offset_wraps(self):
+        self.assertEqual(signed_circular_offset(23, 0, 24), -1)
+        self.assertEqual(signed_circular_offset(1, 23, 24), 2)
+        self.assertEqual(signed_circular_offset(58, 1, 60), -3)
+        self.assertEqual(signed_circular_offset(30, 0, 60), 30)
+
+class WinnerResolutionTestCase(unittest.TestCase):
+    """Test cases for the results endpoint and batch settlement"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+
+            host = User(
+                email='winnerhost@example.com',
+                password_hash=generate_password_hash('password123', method='pbkdf2:sha256'),
+                first_name='Winner',
+                last_name='Host',
+                is_host=True
+            )
+            ann = User(email='ann@example.com', first_name='Ann', last_name='A')
+            bob = User(email='bob@example.com', first_name='Bob', last_name='B')
+            db.session.add_all([host, ann, bob])
+            db.session.commit()
+
+            event = Event(
+                event_code=Event.generate_event_code(),
+                title='Winner Shower',
+                host_id=host.id,
+                mother_name='Jane Doe',
+                event_date=date(2026, 1, 1),
+                due_date=date(2026, 2, 1),
+                guess_price=2.0,
+                name_game_enabled=True
+            )
+            event.guests.extend([ann, bob])
+            db.session.add(event)
+            db.session.commit()
+
+            db.session.add_all([
+                DateGuess(user_id=ann.id, event_id=event.id, guess_date=date(2026, 2, 3),
+                          created_at=datetime(2026, 1, 1, 10)),
+                DateGuess(user_id=bob.id, event_id=event.id, guess_date=date(2026, 2, 7),
+                          created_at=datetime(2026, 1, 1, 9)),
+                HourGuess(user_id=ann.id, event_id=event.id, hour=11, am_pm='PM'),
+                HourGuess(user_id=bob.id, event_id=event.id, hour=3, am_pm='AM'),
+                MinuteGuess(user_id=ann.id, event_id=event.id, minute=58),
+                MinuteGuess(user_id=bob.id, event_id=event.id, minute=10),
+                NameGuess(user_id=bob.id, event_id=event.id, name=' olivia '),
+            ])
+            db.session.commit()
+
+            self.event_id = event.id
+            self.ann_id = ann.id
+            self.bob_id = bob.id
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def host_headers(self):
+        response = self.client.post('/auth/host/login',
+            json={'email': 'winnerhost@example.com', 'password': 'password123'})
+        self.assertEqual(response.status_code, 200)
+        return {'Authorization': f"Bearer {json.loads(response.data)['access_token']}"}
+
+    def test_record_birth_settles_all_pools(self):
+        """Nearest slots win, hours and minutes wrap, and jackpots are detected"""
+        headers = self.host_headers()
+
+        response = self.client.post(f'/api/events/{self.event_id}/results', headers=headers, json={
+            'birth_datetime': '2026-02-04T00:01',
+            'baby_name': 'Olivia'
+        })
+
+        self.assertEqual(response.status_code, 200)
+        winners = json.loads(response.data)['winners']
+        self.assertEqual([w['user_id'] for w in winners['date']], [self.ann_id])
+        self.assertEqual(winners['date'][0]['distance'], 1)
+        # 11 PM is one hour from 00:01; minute 58 is three minutes away
+        self.assertEqual([w['user_id'] for w in winners['hour']], [self.ann_id])
+        self.assertEqual([w['user_id'] for w in winners['minute']], [self.ann_id])
+        self.assertEqual(winners['minute'][0]['distance'], 3)
+        self.assertEqual([w['user_id'] for w in winners['name']], [self.bob_id])
+        self.assertEqual([w['user_id'] for w in winners['jackpot']], [self.ann_id])
+        # Two hour guesses at $2 each
+        self.assertEqual(winners['hour'][0]['payout'], 4.0)
+        # The jackpot only marks the double win; its money is the hour and minute payouts
+        self.assertEqual(winners['jackpot'][0]['payout'], 0.0)
+
+    def test_payouts_add_up_to_the_pot(self):
+        """Every guess's stake is paid out exactly once, jackpots and split ties included"""
+        headers = self.host_headers()
+        # Seven guesses at $2 each
+        pot = 7 * 2.0
+
+        for birth in ('2026-02-04T00:01', '2026-02-05T12:00'):
+            response = self.client.post(f'/api/events/{self.event_id}/results', headers=headers, json={
+                'birth_datetime': birth,
+                'baby_name': 'Olivia'
+            })
+            self.assertEqual(response.status_code, 200)
+            winners = json.loads(response.data)['winners']
+            paid = sum(w['payout'] for pool in winners.values() for w in pool)
+            self.assertAlmostEqual(paid, pot)
+
+    def test_tie_rules(self):
+        """Equidistant dates are split or broken by the configured rule"""
+        headers = self.host_headers()
+        url = f'/api/events/{self.event_id}/results'
+
+        response = self.client.post(url, headers=headers, json={'birth_datetime': '2026-02-05T12:00'})
+        split = json.loads(response.data)['winners']['date']
+        self.assertEqual(sorted(w['user_id'] for w in split), sorted([self.ann_id, self.bob_id]))
+        self.assertEqual(split[0]['share'], 0.5)
+
+        response = self.client.post(url, headers=headers, json={
+            'birth_datetime': '2026-02-05T12:00', 'tie_rule': 'later'})
+        self.assertEqual([w['user_id'] for w in json.loads(response.data)['winners']['date']], [self.bob_id])
+
+        response = self.client.post(url, headers=headers, json={
+            'birth_datetime': '2026-02-05T12:00', 'tie_rule': 'first_claimed'})
+        self.assertEqual([w['user_id'] for w in json.loads(response.data)['winners']['date']], [self.bob_id])
+
+        with app.app_context():
+            # Re-settling replaces the previous winners
+            self.assertEqual(PoolWinner.query.filter_by(event_id=self.event_id, pool='date').count(), 1)
+
+    def test_only_host_can_settle(self):
+        """Settling requires the host's token"""
+        response = self.client.post(f'/api/events/{self.event_id}/results',
+            json={'birth_datetime': '2026-02-04T00:01'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_batch_settlement(self):
+        """Recorded but unsettled outcomes are settled by the batch job"""
+        with app.app_context():
+            db.session.add(EventOutcome(event_id=self.event_id, birth_datetime=datetime(2026, 2, 7, 3, 9)))
+            db.session.commit()
+
+            results = settle_events()
+
+            self.assertEqual(list(results), [self.event_id])
+            outcome = EventOutcome.query.filter_by(event_id=self.event_id).first()
+            self.assertIsNotNone(outcome.settled_at)
+            hour_winner = PoolWinner.query.filter_by(event_id=self.event_id, pool='hour').one()
+            self.assertEqual(hour_winner.user_id, self.bob_id)
+
+            # Nothing left to settle on a second run
+            self.assertEqual(settle_events(), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Tests for batch guess submission.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date
+from sqlalchemy import event as sa_event
+from app import create_app, init_schema
+from models import db, User, Event, DateGuess, MinuteGuess, is_event_guest
+import guess_batch
+from tokens import issue_tokens
+
+class GuessBatchTestCase(unittest.TestCase):
+    """Test cases for POST /api/events/<id>/guesses/batch"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'batch.db')}",
+            'TESTING': True,
+        })
+        init_schema(self.app)
+        with self.app.app_context():
+            host = User(email='batchhost@example.com', is_host=True)
+            ann = User(email='ann@example.com', first_name='Ann')
+            bob = User(email='bob@example.com', first_name='Bob')
+            db.session.add_all([host, ann, bob])
+            db.session.commit()
+            event = Event(event_code=Event.generate_event_code(), title='Batch Shower', host_id=host.id,
+                          mother_name='Jane Doe', event_date=date(2026, 1, 1), due_date=date(2026, 2, 1),
+                          guess_price=2.0, name_game_enabled=False)
+            db.session.add(event)
+            db.session.commit()
+            db.session.add(DateGuess(user_id=bob.id, event_id=event.id, guess_date=date(2026, 2, 3)))
+            db.session.commit()
+            self.event_id, self.ann_id = event.id, ann.id
+            self.token = issue_tokens(ann)[0]
+            self.bob_token = issue_tokens(bob)[0]
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def submit(self, guesses, token=None):
+        return self.client.post(f'/api/events/{self.event_id}/guesses/batch', json={'guesses': guesses},
+                                headers={'Authorization': f'Bearer {token or self.token}'})
+
+    def test_per_item_results(self):
+        response = self.submit([
+            {'type': 'date', 'date': '2026-02-01'},
+            {'type': 'date', 'date': '2026-02-02'},
+            {'type': 'date', 'date': '2026-02-03'},  # Bob's
+            {'type': 'date', 'date': '2026-02-01'},  # Twice in the batch
+            {'type': 'hour', 'hour': 3, 'am_pm': 'PM'},
+            {'type': 'minute', 'minute': 61},
+            {'type': 'minute', 'minute': 12},
+            {'type': 'name', 'name': 'Olivia'},  # Name game is off
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([result['status'] for result in response.json['results']],
+                         ['created', 'created', 'conflict', 'conflict', 'created', 'invalid', 'created', 'invalid'])
+        self.assertEqual((response.json['created'], response.json['conflicts'], response.json['invalid']), (4, 2, 2))
+        self.assertEqual(response.json['results'][2]['error'], 'This date is already taken by Bob')
+        self.assertEqual(response.json['results'][3]['error'], 'You have already guessed this date')
+        with self.app.app_context():
+            self.assertEqual(DateGuess.query.filter_by(user_id=self.ann_id).count(), 2)
+            self.assertEqual(MinuteGuess.query.get(response.json['results'][6]['id']).minute, 12)
+            self.assertTrue(is_event_guest(self.event_id, self.ann_id))
+
+        # Nothing new: 200 with every item a conflict
+        response = self.submit([{'type': 'minute', 'minute': 12}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['results'][0]['status'], 'conflict')
+
+    def test_malformed_batches(self):
+        self.assertEqual(self.submit([]).status_code, 400)
+        self.assertEqual(self.submit({'type': 'date'}).status_code, 400)
+        self.assertEqual(self.submit([{'type': 'minute', 'minute': 1}] * 201).status_code, 400)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def statements_for(guesses):
+            statements = []
+            listener = lambda conn, cursor, statement, *args: statements.append(statement)
+            with self.app.app_context():
+                sa_event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                self.assertEqual(self.submit(guesses).status_code, 201)
+            finally:
+                with self.app.app_context():
+                    sa_event.remove(db.engine, 'before_cursor_execute', listener)
+            return len(statements)
+
+        # The first batch also adds Ann to the guest list
+        self.assertEqual(self.submit([{'type': 'hour', 'hour': 1, 'am_pm': 'AM'}]).status_code, 201)
+        small = statements_for([{'type': 'minute', 'minute': 0}, {'type': 'date', 'date': '2026-01-10'}])
+        large = statements_for([{'type': 'minute', 'minute': minute} for minute in range(1, 41)] +
+                               [{'type': 'date', 'date': f'2026-01-{day:02d}'} for day in range(11, 31)])
+        self.assertEqual(small, large)
+
+    def test_two_guests_racing_for_one_slot(self):
+        original = guess_batch.claimed_slots
+
+        def slow_check(*args):
+            claimed = original(*args)
+            # Give the other guest every chance to check the same slot meanwhile
+            time.sleep(0.2)
+            return claimed
+
+        self.addCleanup(setattr, guess_batch, 'claimed_slots', original)
+        guess_batch.claimed_slots = slow_check
+
+        responses = []
+        start = threading.Barrier(2)
+
+        def submit(token):
+            start.wait()
+            responses.append(self.submit([{'type': 'minute', 'minute': 30}], token))
+
+        threads = [threading.Thread(target=submit, args=(token,)) for token in (self.token, self.bob_token)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(response.json['results'][0]['status'] for response in responses),
+                         ['conflict', 'created'])
+        with self.app.app_context():
+            self.assertEqual(MinuteGuess.query.filter_by(event_id=self.event_id, minute=30).count(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+Tests for guess aggregates and the unified guess storage.
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from datetime import date
+from app import app, db
+from models import User, Event, DateGuess, HourGuess, NameGuess, count_guesses, has_guesses
+from utils import calculate_amount_owed
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class GuessAggregatesTestCase(unittest.TestCase):
+    """Test cases for the grouped guess queries"""
+
+    def setUp(self):
+        """Set up test database"""
+        with app.app_context():
+            db.create_all()
+
+            host = User(email='storagehost@example.com', is_host=True)
+            ann = User(email='ann@example.com')
+            bob = User(email='bob@example.com')
+            db.session.add_all([host, ann, bob])
+            db.session.commit()
+
+            event = Event(
+                event_code=Event.generate_event_code(),
+                title='Storage Shower',
+                host_id=host.id,
+                mother_name='Jane Doe',
+                event_date=date(2026, 1, 1),
+                due_date=date(2026, 2, 1),
+                guess_price=2.0
+            )
+            db.session.add(event)
+            db.session.commit()
+
+            db.session.add_all([
+                DateGuess(user_id=ann.id, event_id=event.id, guess_date=date(2026, 2, 1)),
+                DateGuess(user_id=ann.id, event_id=event.id, guess_date=date(2026, 2, 2)),
+                HourGuess(user_id=ann.id, event_id=event.id, hour=3, am_pm='PM'),
+                NameGuess(user_id=bob.id, event_id=event.id, name='Olivia'),
+            ])
+            db.session.commit()
+
+            self.event_id = event.id
+            self.ann_id = ann.id
+            self.bob_id = bob.id
+            self.host_id = host.id
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_count_guesses(self):
+        with app.app_context():
+            counts = count_guesses(self.event_id)
+            self.assertEqual(counts[self.ann_id], {'date': 2, 'hour': 1})
+            self.assertEqual(counts[self.bob_id], {'name': 1})
+            self.assertNotIn(self.host_id, counts)
+            self.assertEqual(list(count_guesses(self.event_id, [self.bob_id])), [self.bob_id])
+            self.assertEqual(calculate_amount_owed(self.ann_id, self.event_id, 2.0), 6.0)
+
+    def test_has_guesses(self):
+        with app.app_context():
+            self.assertTrue(has_guesses(self.event_id, self.bob_id))
+            self.assertFalse(has_guesses(self.event_id, self.host_id))
+
+class UnifiedStorageMigrationTestCase(unittest.TestCase):
+    """Test cases for switching an existing database to the unified guess table"""
+
+    def test_legacy_tables_are_copied(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'legacy.db')
+
+            # A database written by the per-pool storage
+            connection = sqlite3.connect(path)
+            connection.executescript(textwrap.dedent("""
+                CREATE TABLE date_guess (id INTEGER PRIMARY KEY, user_id INTEGER, event_id INTEGER,
+                    guess_date DATE, created_at DATETIME);
+                CREATE TABLE hour_guess (id INTEGER PRIMARY KEY, user_id INTEGER, event_id INTEGER,
+                    hour INTEGER, am_pm VARCHAR(2), created_at DATETIME);
+                CREATE TABLE minute_guess (id INTEGER PRIMARY KEY, user_id INTEGER, event_id INTEGER,
+                    minute INTEGER, created_at DATETIME);
+                CREATE TABLE name_guess (id INTEGER PRIMARY KEY, user_id INTEGER, event_id INTEGER,
+                    name VARCHAR(100), created_at DATETIME);
+                INSERT INTO date_guess VALUES (1, 7, 1, '2026-02-01', NULL), (2, 8, 1, '2026-02-03', NULL);
+                INSERT INTO hour_guess VALUES (1, 7, 1, 11, 'PM', NULL);
+                INSERT INTO name_guess VALUES (1, 8, 1, 'Olivia', NULL);
+            """))
+            connection.commit()
+            connection.close()
+
+            script = textwrap.dedent("""
+                from datetime import date
+                from app import app, init_schema
+                from sqlalchemy import inspect
+                from models import db, Guess, DateGuess, HourGuess, NameGuess, PoolWinner, count_guesses
+                from migrations import upgrade_schema
+                init_schema(app)
+                with app.app_context():
+                    assert Guess.query.count() == 4
+                    assert [g.guess_date for g in DateGuess.query.order_by(DateGuess.id)] == [date(2026, 2, 1), date(2026, 2, 3)]
+                    hour = HourGuess.query.one()
+                    assert (hour.id, hour.hour, hour.am_pm) == (3, 11, 'PM')
+                    assert NameGuess.query.one().name == 'Olivia'
+                    assert count_guesses(1) == {7: {'date': 1, 'hour': 1}, 8: {'date': 1, 'name': 1}}
+                    # Running the upgrade again does not copy twice
+                    upgrade_schema()
+                    assert Guess.query.count() == 4
+                    tables = inspect(db.engine).get_table_names()
+                    assert 'date_guess_legacy' in tables and 'date_guess' not in tables
+                    # Nor once every guess is gone, and settled winners keep their guess ids
+                    db.session.add(PoolWinner(event_id=1, pool='hour', user_id=7, guess_id=3))
+                    Guess.query.delete()
+                    db.session.commit()
+                    upgrade_schema()
+                    assert Guess.query.count() == 0
+                    assert PoolWinner.query.one().guess_id == 3
+                print('ok')
+            """)
+            env = dict(os.environ, GUESS_STORAGE='unified', DATABASE_URL=f'sqlite:///{path}')
+            result = subprocess.run([sys.executable, '-c', script], cwd=PROJECT_ROOT, env=env,
+                                    capture_output=True, text=True, timeout=120)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn('ok', result.stdout)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Tests for identifying returning guests through the normalized lookup keys.
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import date
+from sqlalchemy import event as sa_event, insert, text
+from app import create_app, init_schema
+from migrations import backfill_identity_keys
+from models import db, User, Event, event_guests, identify_guest
+
+class GuestIdentificationTestCase(unittest.TestCase):
+    """Test cases for identify_guest and the event code login"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'identify.db')}",
+            'TESTING': True,
+        })
+        init_schema(self.app)
+        with self.app.app_context():
+            host = User(email='identhost@example.com', is_host=True)
+            ann = User(email='Ann.Guest@Example.com', phone='(555) 123-4567', nickname='Annie',
+                       first_name='Ann', last_name='Guest')
+            jo1 = User(nickname='Jo', first_name='Jo', last_name='One')
+            jo2 = User(nickname=' jo ', first_name='Jo', last_name='Two')
+            stranger = User(nickname='Annie', first_name='Ann', last_name='Guest')
+            db.session.add_all([host, ann, jo1, jo2, stranger])
+            db.session.flush()
+            events = [Event(event_code=code, title='Shower', host_id=host.id, mother_name='Jane Doe',
+                            event_date=date(2026, 1, 1), due_date=date(2026, 2, 1)) for code in ('8181', '8282')]
+            db.session.add_all(events)
+            db.session.flush()
+            db.session.execute(insert(event_guests), [
+                {'event_id': events[0].id, 'user_id': user.id} for user in (ann, jo1, jo2)
+            ] + [{'event_id': events[1].id, 'user_id': stranger.id}])
+            db.session.commit()
+            self.event_id = events[0].id
+            self.ann_id, self.jo1_id, self.stranger_id = ann.id, jo1.id, stranger.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def test_keys_are_kept_in_step(self):
+        with self.app.app_context():
+            ann = db.session.get(User, self.ann_id)
+            self.assertEqual((ann.email_key, ann.phone_key, ann.nickname_key), ('ann.guest@example.com', '5551234567', 'annie'))
+            ann.nickname = '  Big   Annie '
+            db.session.commit()
+            self.assertEqual(db.session.get(User, self.ann_id).nickname_key, 'big annie')
+
+    def test_identify_by_email_phone_and_name(self):
+        with self.app.app_context():
+            self.assertEqual(identify_guest(self.event_id, email=' ann.guest@EXAMPLE.com')[0].id, self.ann_id)
+            self.assertEqual(identify_guest(self.event_id, phone='555.123.4567')[0].id, self.ann_id)
+            self.assertEqual(identify_guest(self.event_id, nickname='ANNIE')[0].id, self.ann_id)
+            self.assertEqual(identify_guest(self.event_id, first_name='jo', last_name='two')[0].nickname, ' jo ')
+            # Names only match this event's guests
+            self.assertEqual(identify_guest(self.event_id, first_name='Ann', last_name='Guest')[0].id, self.ann_id)
+            self.assertEqual(identify_guest(self.event_id, nickname='nobody'), (None, False))
+            # A shared nickname is ambiguous unless something better matches
+            self.assertEqual(identify_guest(self.event_id, nickname='Jo'), (db.session.get(User, self.jo1_id), True))
+            user, ambiguous = identify_guest(self.event_id, phone='5551234567', nickname='Jo')
+            self.assertEqual((user.id, ambiguous), (self.ann_id, False))
+
+    def test_lookup_uses_the_indexes(self):
+        with self.app.app_context():
+            statements = []
+            listener = lambda conn, cursor, statement, parameters, context, many: \
+                statements.append((statement, parameters))
+            sa_event.listen(db.engine, 'before_cursor_execute', listener)
+            identify_guest(self.event_id, email='a@example.com', phone='1', nickname='x', first_name='y', last_name='z')
+            sa_event.remove(db.engine, 'before_cursor_execute', listener)
+            queries = [entry for entry in statements if entry[0].startswith('SELECT')]
+            self.assertEqual(len(queries), 1)
+            statement, parameters = queries[0]
+            plan = ' '.join(row[-1] for row in db.session.connection().exec_driver_sql(
+                f'EXPLAIN QUERY PLAN {statement}', parameters).all())
+            self.assertNotIn('SCAN user', plan)
+            self.assertIn('ix_user_email_key', plan)
+
+    def test_event_code_login_finds_the_returning_guest(self):
+        response = self.app.test_client().post('/auth/guest/login', json={
+            'login_type': 'event_code', 'event_code': '8181', 'phone': '555-123-4567'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['user_id'], self.ann_id)
+        response = self.app.test_client().post('/auth/guest/login', json={
+            'login_type': 'event_code', 'event_code': '8181', 'nickname': 'jo'})
+        self.assertEqual(response.get_json()['status'], 'need_user_info')
+
+    def test_backfill(self):
+        with self.app.app_context():
+            db.session.execute(insert(User), [{'email': 'Old@Example.com', 'phone': '+1 555 000 1111'}])
+            db.session.execute(text("UPDATE user SET email_key = NULL, phone_key = NULL, nickname_key = NULL"))
+            db.session.commit()
+            self.assertEqual(backfill_identity_keys(db.engine), 6)
+            self.assertEqual(backfill_identity_keys(db.engine), 0)
+            old = User.query.filter_by(email='Old@Example.com').one()
+            self.assertEqual((old.email_key, old.phone_key), ('old@example.com', '15550001111'))
+            self.assertEqual(db.session.get(User, self.ann_id).nickname_key, 'annie')
+
+if __name__ == '__main__':
+    unittest.main()
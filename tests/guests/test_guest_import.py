@@ -0,0 +1,132 @@
+"""
+Tests for bulk guest import from pasted spreadsheet columns and CSV lists.
+"""
+
+import unittest
+import json
+from datetime import datetime, timedelta
+from app import app, db
+from models import User, Event
+from guest_import import parse_guest_rows, dedupe_emails
+from werkzeug.security import generate_password_hash
+
+class GuestImportParsingTestCase(unittest.TestCase):
+    """Test cases for parsing pasted guest lists"""
+
+    def test_parse_spreadsheet_column(self):
+        """A pasted column with a header yields one email per row"""
+        emails, invalid = parse_guest_rows("Email\nann@example.com\nbob@example.com\n")
+        self.assertEqual(emails, ['ann@example.com', 'bob@example.com'])
+        self.assertEqual(invalid, [])
+
+    def test_parse_tsv_with_names(self):
+        """Emails are found in any column of tab separated rows"""
+        text = "Ann Smith\tann@example.com\nBob Jones\tBob@Example.com\nCarl\tno email here"
+        emails, invalid = parse_guest_rows(text)
+        self.assertEqual(emails, ['ann@example.com', 'Bob@Example.com'])
+        self.assertEqual(len(invalid), 1)
+        self.assertEqual(invalid[0]['row'], 3)
+
+    def test_parse_comma_separated_list(self):
+        """A single comma-separated line is split into addresses"""
+        emails, invalid = parse_guest_rows("ann@example.com, bob@example.com,not-an-email")
+        self.assertEqual(emails, ['ann@example.com', 'bob@example.com'])
+        self.assertEqual(invalid, [])
+
+    def test_dedupe_normalizes_case(self):
+        """Duplicates are detected after normalization"""
+        self.assertEqual(
+            dedupe_emails([' Ann@Example.com', 'ann@example.com', 'bob@example.com']),
+            ['ann@example.com', 'bob@example.com']
+        )
+
+class GuestImportTestCase(unittest.TestCase):
+    """Test cases for the bulk guest import endpoint"""
+
+    def setUp(self):
+        """Set up test client and database"""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+
+            host = User(
+                email='importhost@example.com',
+                password_hash=generate_password_hash('password123', method='pbkdf2:sha256'),
+                first_name='Import',
+                last_name='Host',
+                is_host=True
+            )
+            existing = User(email='Existing@Example.com', first_name='Existing', is_host=False)
+            db.session.add_all([host, existing])
+            db.session.commit()
+
+            event = Event(
+                event_code=Event.generate_event_code(),
+                title='Import Shower',
+                host_id=host.id,
+                mother_name='Jane Doe',
+                event_date=(datetime.now() + timedelta(days=30)).date(),
+                due_date=(datetime.now() + timedelta(days=60)).date()
+            )
+            event.guests.append(existing)
+            db.session.add(event)
+            db.session.commit()
+
+            self.event_id = event.id
+            self.existing_id = existing.id
+
+    def tearDown(self):
+        """Clean up after tests"""
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login_as_host(self):
+        response = self.client.post('/auth/host/login',
+            json={'email': 'importhost@example.com', 'password': 'password123'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_import_pasted_column(self):
+        """Pasted rows are deduped, existing users reused and invalid rows reported"""
+        self.login_as_host()
+
+        text = "Email\nexisting@example.com\nnew1@example.com\nNEW1@example.com\nnew2@example.com\nbad row\n"
+        response = self.client.post(f'/api/events/{self.event_id}/guests/import', json={'text': text})
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['added'], ['new1@example.com', 'new2@example.com'])
+        self.assertEqual(data['created'], ['new1@example.com', 'new2@example.com'])
+        self.assertEqual(data['already_guests'], ['existing@example.com'])
+        self.assertEqual(len(data['invalid_rows']), 1)
+
+        with app.app_context():
+            event = db.session.get(Event, self.event_id)
+            self.assertEqual(len(event.guests), 3)
+            self.assertEqual(User.query.filter(User.email.like('new%')).count(), 2)
+
+    def test_import_raw_csv_body(self):
+        """A text/csv body is accepted and re-importing is a no-op"""
+        self.login_as_host()
+
+        body = "a@example.com,b@example.com\n"
+        for _ in range(2):
+            response = self.client.post(f'/api/events/{self.event_id}/guests/import',
+                data=body, content_type='text/csv')
+            self.assertEqual(response.status_code, 200)
+
+        data = json.loads(response.data)
+        self.assertEqual(data['added'], [])
+        self.assertEqual(data['already_guests'], ['a@example.com', 'b@example.com'])
+
+    def test_import_requires_host(self):
+        """Anonymous users cannot import guests"""
+        response = self.client.post(f'/api/events/{self.event_id}/guests/import',
+            json={'emails': ['x@example.com']})
+        self.assertIn(response.status_code, (302, 401))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Tests for the keyed guest list: membership queries, the upgrade of unkeyed
+event_guests tables, and routes that no longer load the whole guest list.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event as sa_event, inspect
+from app import create_app, init_schema
+from models import db, User, Event, event_guests, is_event_guest, is_event_member, add_event_guest, \
+    remove_event_guest
+
+class GuestMembershipTestCase(unittest.TestCase):
+    """Test cases for the guest list helpers and the routes using them"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'guests.db')}",
+            'TESTING': True,
+        })
+        init_schema(self.app)
+        with self.app.app_context():
+            host = User(email='memberhost@example.com', is_host=True)
+            guests = [User(email=f'member{number}@example.com') for number in range(200)]
+            db.session.add_all([host, *guests])
+            db.session.flush()
+            event = Event(event_code='7272', title='Keyed Shower', host_id=host.id, mother_name='Jane Doe',
+                          event_date=date(2026, 1, 1), due_date=date(2026, 2, 1), guess_price=1.0)
+            db.session.add(event)
+            db.session.flush()
+            db.session.execute(event_guests.insert(), [{'event_id': event.id, 'user_id': guest.id}
+                                                       for guest in guests[:-1]])
+            db.session.commit()
+            self.host_id, self.event_id = host.id, event.id
+            self.guest_id, self.newcomer_id = guests[0].id, guests[-1].id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def version(self):
+        return db.session.get(Event, self.event_id).version
+
+    def test_membership_helpers(self):
+        with self.app.app_context():
+            event = db.session.get(Event, self.event_id)
+            self.assertTrue(is_event_guest(self.event_id, self.guest_id))
+            self.assertFalse(is_event_guest(self.event_id, self.newcomer_id))
+            self.assertTrue(is_event_member(event, self.host_id))
+            self.assertFalse(is_event_member(event, self.newcomer_id))
+
+            version = self.version()
+            self.assertTrue(add_event_guest(self.event_id, self.newcomer_id))
+            self.assertFalse(add_event_guest(self.event_id, self.newcomer_id))
+            db.session.commit()
+            self.assertEqual(self.version(), version + 1)
+
+            self.assertTrue(remove_event_guest(self.event_id, self.newcomer_id))
+            self.assertFalse(remove_event_guest(self.event_id, self.newcomer_id))
+            db.session.commit()
+            self.assertFalse(is_event_guest(self.event_id, self.newcomer_id))
+
+    def test_claiming_a_slot_does_not_load_the_guest_list(self):
+        with self.app.app_context():
+            token = create_access_token(identity=str(self.newcomer_id))
+        loaded = []
+        listener = lambda target, context: loaded.append(target.id)
+        sa_event.listen(User, 'load', listener)
+        self.addCleanup(sa_event.remove, User, 'load', listener)
+
+        response = self.app.test_client().post(f'/api/events/{self.event_id}/guesses/date',
+                                               json={'guess_date': '2026-02-03'},
+                                               headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 201, response.get_json())
+        # Only the guest making the guess is loaded, not the 199 others
+        self.assertEqual(set(loaded), {self.newcomer_id})
+        with self.app.app_context():
+            self.assertTrue(is_event_guest(self.event_id, self.newcomer_id))
+
+    def test_removing_someone_who_is_not_a_guest(self):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.host_id)
+        response = client.delete(f'/api/events/{self.event_id}/guests/{self.newcomer_id}')
+        self.assertEqual(response.status_code, 400)
+        response = client.delete(f'/api/events/{self.event_id}/guests/{self.guest_id}')
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            self.assertFalse(is_event_guest(self.event_id, self.guest_id))
+
+class KeyEventGuestsTestCase(unittest.TestCase):
+    """Test cases for upgrading an event_guests table without a primary key"""
+
+    def test_unkeyed_table_is_rebuilt_without_duplicates(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'old.db')
+            connection = sqlite3.connect(path)
+            connection.execute('CREATE TABLE event_guests (event_id INTEGER, user_id INTEGER)')
+            connection.executemany('INSERT INTO event_guests VALUES (?, ?)', [(1, 1), (1, 1), (1, 2), (2, 1)])
+            connection.commit()
+            connection.close()
+
+            app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'TESTING': True})
+            init_schema(app)
+            # Idempotent
+            init_schema(app)
+            with app.app_context():
+                inspector = inspect(db.engine)
+                self.assertEqual(inspector.get_pk_constraint('event_guests')['constrained_columns'],
+                                 ['event_id', 'user_id'])
+                self.assertIn('ix_event_guests_user_id',
+                              {index['name'] for index in inspector.get_indexes('event_guests')})
+                rows = db.session.execute(event_guests.select().order_by('event_id', 'user_id')).all()
+                self.assertEqual([tuple(row) for row in rows], [(1, 1), (1, 2), (2, 1)])
+                db.engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Tests for Idempotency-Key support on guess and payment POSTs.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, datetime, timedelta
+from app import create_app, init_schema
+from models import db, User, Event, NameGuess, Payment, IdempotencyRecord, add_event_guest
+from idempotency import request_fingerprint
+from tokens import issue_tokens
+
+class IdempotencyKeyTestCase(unittest.TestCase):
+    """Test cases for idempotency.py"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'idempotency.db')}",
+            'TESTING': True,
+            'IDEMPOTENCY_WAIT_SECONDS': 1,
+        })
+        init_schema(self.app)
+        with self.app.app_context():
+            host = User(email='idemhost@example.com', is_host=True)
+            guest = User(email='idemguest@example.com', first_name='Ann')
+            db.session.add_all([host, guest])
+            db.session.commit()
+            event = Event(event_code=Event.generate_event_code(), title='Retry Shower', host_id=host.id,
+                          mother_name='Jane Doe', event_date=date(2026, 1, 1), due_date=date(2026, 2, 1),
+                          guess_price=2.0, name_game_enabled=True)
+            db.session.add(event)
+            db.session.flush()
+            add_event_guest(event.id, guest.id)
+            db.session.commit()
+            self.host_id, self.guest_id, self.event_id = host.id, guest.id, event.id
+            self.guest_token = issue_tokens(guest)[0]
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def guess_name(self, name, key=None):
+        headers = {'Authorization': f'Bearer {self.guest_token}'}
+        if key:
+            headers['Idempotency-Key'] = key
+        return self.client.post(f'/api/events/{self.event_id}/guesses/name', json={'name': name}, headers=headers)
+
+    def count(self, model):
+        with self.app.app_context():
+            return model.query.filter_by(event_id=self.event_id).count()
+
+    def test_retried_guess_runs_once(self):
+        first = self.guess_name('Olivia', key='guess-1')
+        self.assertEqual(first.status_code, 201)
+        retry = self.guess_name('Olivia', key='guess-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json, first.json)
+        self.assertEqual(retry.headers.get('Idempotent-Replayed'), 'true')
+        self.assertEqual(self.count(NameGuess), 1)
+
+        # Another key (or none) is another request
+        self.assertEqual(self.guess_name('Olivia', key='guess-2').status_code, 201)
+        self.assertEqual(self.guess_name('Olivia').status_code, 201)
+        self.assertEqual(self.count(NameGuess), 3)
+
+    def test_key_reused_for_another_request(self):
+        self.guess_name('Olivia', key='guess-1')
+        response = self.guess_name('Emma', key='guess-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.count(NameGuess), 1)
+
+    def test_double_clicked_payment_is_added_once(self):
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.host_id)
+        for _ in range(2):
+            response = self.client.post(f'/api/events/{self.event_id}/guests/{self.guest_id}/payment',
+                                        json={'action': 'add_payment', 'amount': 5},
+                                        headers={'Idempotency-Key': 'pay-1'})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.count(Payment), 1)
+
+    def test_duplicate_waits_for_the_first_attempt(self):
+        path = f'/api/events/{self.event_id}/guesses/name'
+        with self.app.test_request_context(path, method='POST', json={'name': 'Olivia'}):
+            fingerprint = request_fingerprint()
+        with self.app.app_context():
+            db.session.add(IdempotencyRecord(owner_id=self.guest_id, key='slow', fingerprint=fingerprint,
+                                             expires_at=datetime.utcnow() + timedelta(days=1)))
+            db.session.commit()
+
+        # Still running after IDEMPOTENCY_WAIT_SECONDS
+        started = time.monotonic()
+        response = self.guess_name('Olivia', key='slow')
+        self.assertGreaterEqual(time.monotonic() - started, 1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+        def finish():
+            time.sleep(0.2)
+            with self.app.app_context():
+                record = IdempotencyRecord.query.filter_by(key='slow').one()
+                record.status_code, record.content_type, record.body = 201, 'application/json', b'{"id": 7}'
+                db.session.commit()
+
+        finisher = threading.Thread(target=finish)
+        finisher.start()
+        response = self.guess_name('Olivia', key='slow')
+        finisher.join()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json, {'id': 7})
+        self.assertEqual(self.count(NameGuess), 0)
+
+    def test_concurrent_duplicates_run_once(self):
+        responses = []
+        start = threading.Barrier(4)
+
+        def send():
+            start.wait()
+            responses.append(self.guess_name('Olivia', key='burst'))
+
+        threads = [threading.Thread(target=send) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(response.status_code for response in responses), [201] * 4)
+        self.assertEqual(len({response.json['id'] for response in responses}), 1)
+        self.assertEqual(self.count(NameGuess), 1)
+
+if __name__ == '__main__':
+    unittest.main()
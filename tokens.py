@@ -0,0 +1,65 @@
+"""
+One JWT format for every sign-in.
+
+Tokens carry only what the server needs: the user id as a string subject,
+plus the standard type, expiry, issue time and token id claims (no `nbf`,
+no email or role copies). Hosts get 7-day access tokens and guests 30-day
+ones; refresh tokens last 30 and 60 days. The refresh cookie is scoped to
+the refresh endpoint, so ordinary requests don't carry it.
+
+Tokens minted before this format (dict or integer identities with extra
+claims) are still accepted until they expire; user_id_from_identity reads
+all of them.
+"""
+
+from datetime import timedelta
+
+from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt_identity
+
+from models import db, User
+
+ACCESS_LIFETIME = {True: timedelta(days=7), False: timedelta(days=30)}  # by is_host
+REFRESH_LIFETIME = {True: timedelta(days=30), False: timedelta(days=60)}
+
+REFRESH_PATH = '/auth/token/refresh'
+
+# flask-jwt-extended settings for this format
+JWT_SETTINGS = {
+    'JWT_TOKEN_LOCATION': ['headers', 'cookies'],
+    'JWT_ENCODE_NBF': False,
+    # Old tokens have dict or integer subjects
+    'JWT_VERIFY_SUB': False,
+    'JWT_REFRESH_COOKIE_PATH': REFRESH_PATH,
+    'JWT_REFRESH_CSRF_COOKIE_PATH': REFRESH_PATH,
+}
+
+
+def issue_tokens(user):
+    """(access token, refresh token) for a user"""
+    identity = str(user.id)
+    is_host = bool(user.is_host)
+    return (create_access_token(identity=identity, expires_delta=ACCESS_LIFETIME[is_host]),
+            create_refresh_token(identity=identity, expires_delta=REFRESH_LIFETIME[is_host]))
+
+
+def user_id_from_identity(identity):
+    """The user id in a token subject of any format, or None"""
+    if isinstance(identity, str):
+        return int(identity) if identity.isdigit() else None
+    if isinstance(identity, dict):
+        # Legacy Google sign-in tokens: {'id': ..., 'email': ..., ...}
+        return user_id_from_identity(identity.get('id'))
+    if isinstance(identity, int) and not isinstance(identity, bool):
+        return identity
+    return None
+
+
+def current_user_id():
+    """The user id of the verified token in this request, or None"""
+    return user_id_from_identity(get_jwt_identity())
+
+
+def current_token_user():
+    """The User of the verified token in this request, or None"""
+    user_id = current_user_id()
+    return db.session.get(User, user_id) if user_id is not None else None
@@ -1,15 +1,14 @@
-from models import DateGuess, HourGuess, MinuteGuess, NameGuess, Payment
-from datetime import datetime, timedelta
+from models import count_guesses
+from datetime import timedelta
+from urllib.parse import urlencode
+from flask import request
+import base64
+import json
 
 def calculate_amount_owed(user_id, event_id, guess_price):
     """Calculate the total amount owed by a user for an event"""
-    # Count all guesses
-    date_guesses = DateGuess.query.filter_by(user_id=user_id, event_id=event_id).count()
-    hour_guesses = HourGuess.query.filter_by(user_id=user_id, event_id=event_id).count()
-    minute_guesses = MinuteGuess.query.filter_by(user_id=user_id, event_id=event_id).count()
-    name_guesses = NameGuess.query.filter_by(user_id=user_id, event_id=event_id).count()
-    
-    total_guesses = date_guesses + hour_guesses + minute_guesses + name_guesses
+    # Count all guesses in one grouped query
+    total_guesses = sum(count_guesses(event_id, [user_id]).get(user_id, {}).values())
     return total_guesses * guess_price
 
 def format_date(date_obj):
@@ -56,3 +55,79 @@ def generate_available_dates(due_date, existing_guesses):
                 break
     
     return dates
+
+# Cursor pagination for list endpoints
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 500
+
+def encode_cursor(last_id):
+    """Encode the last id of a page as an opaque cursor string"""
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded.encode()))['id'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def get_page_args(args, default_limit=DEFAULT_PAGE_LIMIT):
+    """Read limit, cursor and include_total from request args.
+
+    With default_limit=None the endpoint stays unpaged (limit None) unless
+    the client passes a limit or cursor; for lists whose callers don't
+    follow X-Next-Cursor yet. Raises ValueError with a user-facing message
+    for bad values.
+    """
+    cursor = args.get('cursor')
+    if default_limit is None and 'limit' not in args and not cursor:
+        limit = None
+    else:
+        try:
+            limit = int(args.get('limit', default_limit or DEFAULT_PAGE_LIMIT))
+        except (TypeError, ValueError):
+            raise ValueError('limit must be an integer')
+        if limit < 1:
+            raise ValueError('limit must be at least 1')
+        limit = min(limit, MAX_PAGE_LIMIT)
+    
+    after_id = decode_cursor(cursor) if cursor else None
+    
+    include_total = str(args.get('include_total', '')).lower() in ('1', 'true', 'yes')
+    return limit, after_id, include_total
+
+def paginate_query(query, id_column, limit, after_id=None, include_total=False):
+    """Return one keyset page of a query ordered by id_column.
+
+    Returns (items, next_cursor, total). Fetches one extra row to know
+    whether another page exists; total is only counted when asked for.
+    A limit of None returns every row as a single page.
+    """
+    total = query.order_by(None).count() if include_total else None
+    
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    if limit is None:
+        return query.order_by(id_column).all(), None, total
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return rows, next_cursor, total
+
+def add_page_headers(response, next_cursor, total=None):
+    """Expose pagination state in headers so list bodies stay plain arrays"""
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{_next_page_url(next_cursor)}>; rel="next"'
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
+    return response
+
+def _next_page_url(next_cursor):
+    args = request.args.to_dict()
+    args['cursor'] = next_cursor
+    return f"{request.base_url}?{urlencode(args)}"
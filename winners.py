@@ -0,0 +1,261 @@
+"""
+Winner resolution for the date, hour, minute and name pools.
+
+Each pool has one winning slot: the guess nearest to the actual birth.
+Dates are linear; hours (24 per day) and minutes (60 per hour) wrap around,
+so 11 PM is one hour away from midnight and minute 59 is one minute away
+from minute 0. A guest who wins both the hour and minute pools also gets a
+jackpot entry; it is a marker with no payout of its own, since those
+winnings are already paid by the two pools.
+
+Nearest slots are found with indexed queries against the guess tables
+(range lookups for dates, the distinct occupied slots for hours and
+minutes) so settlement never loads a whole board into Python.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import func
+
+from models import db, Event, EventOutcome, PoolWinner, DateGuess, HourGuess, MinuteGuess, NameGuess
+
+# How ties between equally distant slots are broken:
+#   split         - every tied guess wins an equal share of the pool
+#   earlier       - the slot before the birth wins (then split)
+#   later         - the slot after the birth wins (then split)
+#   first_claimed - the guess made first wins outright
+TIE_RULES = ('split', 'earlier', 'later', 'first_claimed')
+DEFAULT_TIE_RULE = 'split'
+
+HOURS_PER_DAY = 24
+MINUTES_PER_HOUR = 60
+
+
+def hour_slot(hour, am_pm):
+    """Convert a 1-12 hour and AM/PM to an hour of the day (0-23)"""
+    return (hour % 12) + (12 if am_pm == 'PM' else 0)
+
+
+def signed_circular_offset(slot, actual, size):
+    """Offset from actual to slot on a circle, in the range (-size/2, size/2]"""
+    offset = (slot - actual) % size
+    return offset - size if offset > size // 2 else offset
+
+
+def _pick_offsets(offsets, tie_rule):
+    """Choose the winning offset(s) among the candidates at minimal distance"""
+    if not offsets:
+        return []
+    best = min(abs(offset) for offset in offsets)
+    tied = sorted({offset for offset in offsets if abs(offset) == best})
+    if len(tied) > 1 and tie_rule == 'earlier':
+        return [tied[0]]
+    if len(tied) > 1 and tie_rule == 'later':
+        return [tied[-1]]
+    return tied
+
+
+def _apply_first_claimed(guesses, tie_rule):
+    if tie_rule == 'first_claimed' and len(guesses) > 1:
+        return [min(guesses, key=lambda guess: (guess.created_at or datetime.max, guess.id))]
+    return guesses
+
+
+def _nearest_date_guesses(event_id, birth_date, tie_rule):
+    """Nearest date guesses using two index range lookups"""
+    before = db.session.query(DateGuess.guess_date) \
+        .filter(DateGuess.event_id == event_id, DateGuess.guess_date <= birth_date) \
+        .order_by(DateGuess.guess_date.desc()).limit(1).scalar()
+    after = db.session.query(DateGuess.guess_date) \
+        .filter(DateGuess.event_id == event_id, DateGuess.guess_date >= birth_date) \
+        .order_by(DateGuess.guess_date.asc()).limit(1).scalar()
+
+    offsets = {(candidate - birth_date).days: candidate for candidate in (before, after) if candidate}
+    winning_dates = [offsets[offset] for offset in _pick_offsets(list(offsets), tie_rule)]
+    if not winning_dates:
+        return [], None
+
+    guesses = DateGuess.query.filter(
+        DateGuess.event_id == event_id,
+        DateGuess.guess_date.in_(winning_dates)
+    ).order_by(DateGuess.id).all()
+    distance = abs((winning_dates[0] - birth_date).days)
+    return _apply_first_claimed(guesses, tie_rule), distance
+
+
+def _nearest_hour_guesses(event_id, birth_hour, tie_rule):
+    """Nearest hour guesses, wrapping around midnight"""
+    occupied = db.session.query(HourGuess.hour, HourGuess.am_pm) \
+        .filter(HourGuess.event_id == event_id).distinct().all()
+
+    offsets = {}
+    for hour, am_pm in occupied:
+        offset = signed_circular_offset(hour_slot(hour, am_pm), birth_hour, HOURS_PER_DAY)
+        offsets[offset] = (hour, am_pm)
+
+    winning_slots = [offsets[offset] for offset in _pick_offsets(list(offsets), tie_rule)]
+    if not winning_slots:
+        return [], None
+
+    guesses = HourGuess.query.filter(
+        HourGuess.event_id == event_id,
+        db.or_(*[db.and_(HourGuess.hour == hour, HourGuess.am_pm == am_pm) for hour, am_pm in winning_slots])
+    ).order_by(HourGuess.id).all()
+    distance = abs(signed_circular_offset(hour_slot(*winning_slots[0]), birth_hour, HOURS_PER_DAY))
+    return _apply_first_claimed(guesses, tie_rule), distance
+
+
+def _nearest_minute_guesses(event_id, birth_minute, tie_rule):
+    """Nearest minute guesses, wrapping around the top of the hour"""
+    occupied = db.session.query(MinuteGuess.minute) \
+        .filter(MinuteGuess.event_id == event_id).distinct().all()
+
+    offsets = {
+        signed_circular_offset(minute, birth_minute, MINUTES_PER_HOUR): minute
+        for (minute,) in occupied
+    }
+    winning_minutes = [offsets[offset] for offset in _pick_offsets(list(offsets), tie_rule)]
+    if not winning_minutes:
+        return [], None
+
+    guesses = MinuteGuess.query.filter(
+        MinuteGuess.event_id == event_id,
+        MinuteGuess.minute.in_(winning_minutes)
+    ).order_by(MinuteGuess.id).all()
+    distance = abs(signed_circular_offset(winning_minutes[0], birth_minute, MINUTES_PER_HOUR))
+    return _apply_first_claimed(guesses, tie_rule), distance
+
+
+def _matching_name_guesses(event, tie_rule):
+    """Name guesses that match the revealed baby name (case-insensitive)"""
+    if not event.name_game_enabled or not event.baby_name:
+        return [], None
+    guesses = NameGuess.query.filter(
+        NameGuess.event_id == event.id,
+        func.lower(func.trim(NameGuess.name)) == event.baby_name.strip().lower()
+    ).order_by(NameGuess.id).all()
+    return _apply_first_claimed(guesses, tie_rule), 0
+
+
+def _pool_size(model, event_id):
+    return db.session.query(func.count(model.id)).filter(model.event_id == event_id).scalar()
+
+
+def resolve_winners(event, birth_datetime, tie_rule=DEFAULT_TIE_RULE):
+    """Settle every pool of an event and persist the winners.
+
+    Replaces any previous result for the event. The caller commits.
+    Returns the list of PoolWinner rows.
+    """
+    if tie_rule not in TIE_RULES:
+        raise ValueError(f"Tie rule must be one of: {', '.join(TIE_RULES)}")
+
+    outcome = EventOutcome.query.filter_by(event_id=event.id).first()
+    if not outcome:
+        outcome = EventOutcome(event_id=event.id, birth_datetime=birth_datetime)
+        db.session.add(outcome)
+    outcome.birth_datetime = birth_datetime
+    outcome.tie_rule = tie_rule
+
+    PoolWinner.query.filter_by(event_id=event.id).delete()
+
+    pools = [
+        ('date', DateGuess, _nearest_date_guesses(event.id, birth_datetime.date(), tie_rule)),
+        ('hour', HourGuess, _nearest_hour_guesses(event.id, birth_datetime.hour, tie_rule)),
+        ('minute', MinuteGuess, _nearest_minute_guesses(event.id, birth_datetime.minute, tie_rule)),
+        ('name', NameGuess, _matching_name_guesses(event, tie_rule)),
+    ]
+
+    winners = []
+    payouts_by_pool = {}
+    for pool, model, (guesses, distance) in pools:
+        if not guesses:
+            continue
+        pot = _pool_size(model, event.id) * (event.guess_price or 0)
+        share = 1.0 / len(guesses)
+        payouts_by_pool[pool] = {}
+        for guess in guesses:
+            winner = PoolWinner(
+                event_id=event.id,
+                pool=pool,
+                user_id=guess.user_id,
+                guess_id=guess.id,
+                distance=distance,
+                share=share,
+                payout=round(pot * share, 2)
+            )
+            winners.append(winner)
+            payouts_by_pool[pool][guess.user_id] = payouts_by_pool[pool].get(guess.user_id, 0) + winner.payout
+
+    # Winning both the hour and the minute pool is a jackpot. The row only marks it:
+    # the hour and minute payouts already hold those winnings, and the pots are spent.
+    for user_id in set(payouts_by_pool.get('hour', {})) & set(payouts_by_pool.get('minute', {})):
+        winners.append(PoolWinner(
+            event_id=event.id,
+            pool='jackpot',
+            user_id=user_id,
+            share=1.0,
+            payout=0.0
+        ))
+
+    db.session.add_all(winners)
+    outcome.settled_at = datetime.utcnow()
+    return winners
+
+
+def settle_events(event_ids=None, tie_rule=None, resettle=False):
+    """Batch-settle events whose birth has been recorded.
+
+    Without event_ids, every recorded but unsettled outcome is processed
+    (or every recorded outcome when resettle is true). Each event is
+    committed on its own so one failure does not roll back the batch.
+    Returns a dict of event_id -> number of winners or error message.
+    """
+    query = EventOutcome.query
+    if event_ids:
+        query = query.filter(EventOutcome.event_id.in_(event_ids))
+    elif not resettle:
+        query = query.filter(EventOutcome.settled_at.is_(None))
+
+    outcome_ids = [(outcome.id, outcome.event_id) for outcome in query.order_by(EventOutcome.id).all()]
+
+    results = {}
+    for outcome_id, event_id in outcome_ids:
+        try:
+            outcome = db.session.get(EventOutcome, outcome_id)
+            event = db.session.get(Event, event_id)
+            winners = resolve_winners(event, outcome.birth_datetime, tie_rule or outcome.tie_rule)
+            db.session.commit()
+            results[event_id] = len(winners)
+        except Exception as e:
+            db.session.rollback()
+            results[event_id] = f'error: {str(e)}'
+    return results
+
+
+def serialize_results(event):
+    """Return the persisted results of an event as a JSON-friendly dict"""
+    outcome = EventOutcome.query.filter_by(event_id=event.id).first()
+    if not outcome:
+        return None
+
+    winners = PoolWinner.query.filter_by(event_id=event.id).order_by(PoolWinner.id).all()
+    pools = {'date': [], 'hour': [], 'minute': [], 'name': [], 'jackpot': []}
+    for winner in winners:
+        pools[winner.pool].append({
+            'user_id': winner.user_id,
+            'display_name': winner.user.get_display_name() if winner.user else 'Unknown User',
+            'guess_id': winner.guess_id,
+            'distance': winner.distance,
+            'share': winner.share,
+            'payout': winner.payout
+        })
+
+    return {
+        'event_id': event.id,
+        'birth_datetime': outcome.birth_datetime.strftime('%Y-%m-%dT%H:%M'),
+        'baby_name': event.baby_name if event.baby_name_revealed else None,
+        'tie_rule': outcome.tie_rule,
+        'settled_at': outcome.settled_at.strftime('%Y-%m-%d %H:%M:%S') if outcome.settled_at else None,
+        'winners': pools
+    }